@@ -1,6 +1,19 @@
 import yaml
+from functools import lru_cache
 from pathlib import Path
 
+@lru_cache(maxsize=None)
+def _load_config(config_file: Path) -> dict:
+    """Parsed agentprofiles.yaml, read once per process"""
+    with open(config_file, 'r', encoding='utf-8') as file:
+        return yaml.safe_load(file)
+
+@lru_cache(maxsize=None)
+def _read_prompt(filepath: Path) -> str:
+    """Contents of a description/instruction file, read once per process"""
+    with open(filepath, 'r', encoding='utf-8') as file:
+        return file.read()
+
 class AgentProfile:
     # Getting YAML Filepath
     BASE_DIR = Path(__file__).parent
@@ -10,8 +23,7 @@ class AgentProfile:
         if not agent_name:
             raise ValueError("Agent name is required.")
         
-        with open(self.CONFIG_FILE, 'r', encoding='utf-8') as file:
-            config = yaml.safe_load(file)
+        config = _load_config(self.CONFIG_FILE)
 
         if not config:
             raise ValueError("Agent config file not found.")
@@ -34,13 +46,9 @@ class AgentProfile:
         description_filepath = self.BASE_DIR / 'profiles' / agent_profile['description_filepath']
         instructions_filepath = self.BASE_DIR / 'profiles' / agent_profile['instructions_filepath']
 
-        # Load description from file
-        with open(description_filepath, 'r', encoding='utf-8') as file:
-            self.description = file.read()
-
-        # Load instruction from file
-        with open(instructions_filepath, 'r', encoding='utf-8') as file:
-            self.instruction = file.read()
+        # Load description and instruction from file
+        self.description = _read_prompt(description_filepath)
+        self.instruction = _read_prompt(instructions_filepath)
 
 if __name__ == "__main__":
     root_agent_profile = AgentProfile(agent_name='root_agent')
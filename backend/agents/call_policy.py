@@ -0,0 +1,310 @@
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableBinding
+
+from agents.llm_scheduler import llm_scheduler
+from core.settings import settings
+from utils.stats_utils import percentile
+
+logger = logging.getLogger(__name__)
+
+# Provider errors worth retrying (rate limits, overload, server errors), by class name
+# so the Google client libraries need not be imported
+TRANSIENT_ERROR_NAMES = {
+    "ResourceExhausted", "ServiceUnavailable", "InternalServerError", "DeadlineExceeded",
+    "TooManyRequests", "GatewayTimeout", "BadGateway", "RateLimitError", "APITimeoutError",
+    "APIConnectionError", "ConnectError", "ReadTimeout", "RemoteProtocolError",
+}
+TRANSIENT_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+
+
+class LLMTimeoutError(TimeoutError):
+    """A model call (with its hedge) did not finish within the policy timeout"""
+
+
+def is_transient(error: BaseException) -> bool:
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in TRANSIENT_ERROR_NAMES:
+        return True
+    code = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return isinstance(code, int) and code in TRANSIENT_STATUS_CODES
+
+
+@dataclass(frozen=True)
+class CallPolicy:
+    """How calls to one model are bounded, retried and hedged"""
+    timeout_s: float = 60.0  # per attempt, hedge included (0 = no timeout)
+    max_retries: int = 2
+    backoff_s: float = 0.5  # first retry waits up to this, doubling per retry ("full jitter")
+    max_backoff_s: float = 8.0
+    hedge: bool = False
+    hedge_percentile: float = 95.0
+    hedge_min_samples: int = 20  # latencies needed before the percentile is trusted
+    hedge_delay_s: float = 2.0  # used until then
+
+    def backoff(self, retry: int) -> float:
+        return random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** retry))
+
+
+def policy_for(model_id: str) -> CallPolicy:
+    """The call policy of a model from settings (per-model timeouts override LLM_TIMEOUT_S)"""
+    return CallPolicy(
+        timeout_s=settings.LLM_TIMEOUTS_BY_MODEL.get(model_id, settings.LLM_TIMEOUT_S),
+        max_retries=settings.LLM_MAX_RETRIES,
+        backoff_s=settings.LLM_RETRY_BACKOFF_S,
+        max_backoff_s=settings.LLM_RETRY_MAX_BACKOFF_S,
+        hedge=settings.LLM_HEDGE_ENABLED,
+        hedge_percentile=settings.LLM_HEDGE_PERCENTILE,
+        hedge_min_samples=settings.LLM_HEDGE_MIN_SAMPLES,
+        hedge_delay_s=settings.LLM_HEDGE_DELAY_S,
+    )
+
+
+COUNTERS = ("calls", "timeouts", "transient_errors", "retries", "failures", "hedges_fired", "hedges_won",
+            "hedges_skipped")
+
+
+class CallPolicyStats:
+    """Policy outcome counters and a window of recent call latencies, per model"""
+
+    def __init__(self, window: int = 500):
+        self.window = window
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._latencies: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def count(self, model_id: str, counter: str, n: int = 1):
+        with self._lock:
+            counters = self._counters.setdefault(model_id, dict.fromkeys(COUNTERS, 0))
+            counters[counter] += n
+
+    def observe(self, model_id: str, latency_s: float):
+        with self._lock:
+            self._latencies.setdefault(model_id, deque(maxlen=self.window)).append(latency_s)
+
+    def hedge_delay(self, model_id: str, policy: CallPolicy) -> float:
+        """The policy percentile of recent latencies, or the fixed delay while there are too few"""
+        with self._lock:
+            latencies = list(self._latencies.get(model_id, ()))
+        if len(latencies) < policy.hedge_min_samples:
+            return policy.hedge_delay_s
+        return percentile(latencies, policy.hedge_percentile)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            models = sorted(set(self._counters) | set(self._latencies))
+            snapshot = {}
+            for model_id in models:
+                latencies = list(self._latencies.get(model_id, ()))
+                snapshot[model_id] = {
+                    **self._counters.get(model_id, dict.fromkeys(COUNTERS, 0)),
+                    "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+                    "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+                }
+            return snapshot
+
+    def prometheus(self, metric: str = "chatbot_llm_policy_total") -> str:
+        """Counters in the Prometheus text exposition format"""
+        lines = [f"# HELP {metric} LLM call policy outcomes by model",
+                 f"# TYPE {metric} counter"]
+        for model_id, counters in self.snapshot().items():
+            for counter in COUNTERS:
+                lines.append(f'{metric}{{model="{model_id}",outcome="{counter}"}} {counters[counter]}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._latencies.clear()
+
+
+policy_stats = CallPolicyStats()
+
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Wraps a chat model with a CallPolicy: each attempt is bounded by the
+    timeout, transient errors and timeouts are retried with jittered
+    exponential backoff, and with hedging on, a duplicate request is sent
+    when the first one is slower than the model's recent latency percentile
+    (the first answer wins, the other is cancelled).
+
+    Every attempt holds a slot of the model's pool in llm_scheduler; a hedge
+    only fires when a slot is free right away, and backoff waits hold none.
+    Callbacks see one model run per call, whatever the retries and hedges.
+    Streaming calls are retried until the first chunk arrives and are never
+    hedged; sync calls are only retried (no timeout or hedge), sync streams
+    pass through.
+    """
+
+    inner: BaseChatModel
+    model_id: str
+    policy: CallPolicy = CallPolicy()
+
+    @property
+    def _llm_type(self) -> str:
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return self.inner._identifying_params
+
+    def _get_ls_params(self, stop: Optional[List[str]] = None, **kwargs: Any) -> Dict[str, Any]:
+        return self.inner._get_ls_params(stop=stop, **kwargs)
+
+    def _should_stream(self, *, async_api: bool, run_manager: Any = None, **kwargs: Any) -> bool:
+        return self.inner._should_stream(async_api=async_api, run_manager=run_manager, **kwargs)
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> Any:
+        # Let the wrapped model format the tools, then bind its kwargs to the wrapper
+        bound = self.inner.bind_tools(tools, **kwargs)
+        if bound is self.inner:
+            return self
+        if isinstance(bound, RunnableBinding) and bound.bound is self.inner:
+            return self.bind(**bound.kwargs)
+        logger.warning("Model %s binds tools in an unknown way: calls bypass the call policy", self.model_id)
+        return bound
+
+    async def _timed(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> ChatResult:
+        start = time.perf_counter()
+        result = await self.inner._agenerate(messages, stop=stop, **kwargs)
+        policy_stats.observe(self.model_id, time.perf_counter() - start)
+        return result
+
+    async def _hedge(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> ChatResult:
+        """The duplicate request, holding the slot try_slot took for it"""
+        try:
+            return await self._timed(messages, stop, **kwargs)
+        finally:
+            llm_scheduler.release(self.model_id)
+
+    async def _attempt(self, messages: List[BaseMessage], stop: Optional[List[str]], **kwargs: Any) -> ChatResult:
+        """One call within the timeout, plus a hedged duplicate when the first is slow"""
+        timeout = self.policy.timeout_s or None
+        deadline = time.monotonic() + timeout if timeout else None
+        primary = asyncio.ensure_future(self._timed(messages, stop, **kwargs))
+        tasks = {primary}
+        try:
+            if self.policy.hedge:
+                delay = policy_stats.hedge_delay(self.model_id, self.policy)
+                done, _ = await asyncio.wait(tasks, timeout=min(delay, timeout) if timeout else delay)
+                if not done and (deadline is None or time.monotonic() < deadline):
+                    # No hedging under load: a duplicate would only lengthen the queue
+                    if llm_scheduler.try_slot(self.model_id):
+                        tasks.add(asyncio.ensure_future(self._hedge(messages, stop, **kwargs)))
+                        policy_stats.count(self.model_id, "hedges_fired")
+                    else:
+                        policy_stats.count(self.model_id, "hedges_skipped")
+
+            error: Optional[BaseException] = None
+            while tasks:
+                remaining = max(0.0, deadline - time.monotonic()) if deadline else None
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            policy_stats.count(self.model_id, "hedges_won")
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not tasks:
+                raise error
+            policy_stats.count(self.model_id, "timeouts")
+            raise LLMTimeoutError(f"{self.model_id} did not answer within {timeout}s")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _retry_or_raise(self, error: BaseException, retry: int) -> float:
+        """Backoff before the next attempt, or re-raises when the error is final"""
+        transient = is_transient(error)
+        if transient and not isinstance(error, LLMTimeoutError):
+            policy_stats.count(self.model_id, "transient_errors")
+        if not transient or retry >= self.policy.max_retries:
+            policy_stats.count(self.model_id, "failures")
+            raise error
+        policy_stats.count(self.model_id, "retries")
+        delay = self.policy.backoff(retry)
+        logger.warning("LLM CALL RETRY | %s | %s: %s | retry %d in %.2fs", self.model_id,
+                       type(error).__name__, error, retry + 1, delay)
+        return delay
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        policy_stats.count(self.model_id, "calls")
+        retry = 0
+        while True:
+            async with llm_scheduler.slot(self.model_id):
+                try:
+                    return await self._attempt(messages, stop, **kwargs)
+                except Exception as e:
+                    delay = self._retry_or_raise(e, retry)
+            await asyncio.sleep(delay)
+            retry += 1
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        policy_stats.count(self.model_id, "calls")
+        retry = 0
+        while True:
+            try:
+                return self.inner._generate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                time.sleep(self._retry_or_raise(e, retry))
+                retry += 1
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        policy_stats.count(self.model_id, "calls")
+        timeout = self.policy.timeout_s or None
+        retry = 0
+        while True:
+            async with llm_scheduler.slot(self.model_id):
+                start = time.perf_counter()
+                stream = self.inner._astream(messages, stop=stop, run_manager=run_manager, **kwargs)
+                try:
+                    first = await asyncio.wait_for(stream.__anext__(), timeout)
+                except StopAsyncIteration:
+                    return
+                except Exception as e:
+                    await stream.aclose()
+                    if isinstance(e, asyncio.TimeoutError):
+                        policy_stats.count(self.model_id, "timeouts")
+                        e = LLMTimeoutError(f"{self.model_id} sent nothing within {timeout}s")
+                    delay = self._retry_or_raise(e, retry)
+                else:
+                    # The slot is held until the stream ends or is closed
+                    policy_stats.observe(self.model_id, time.perf_counter() - start)
+                    yield first
+                    async for chunk in stream:
+                        yield chunk
+                    return
+            await asyncio.sleep(delay)
+            retry += 1
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        yield from self.inner._stream(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+
+def with_call_policy(llm: BaseChatModel, model_id: str) -> BaseChatModel:
+    """
+    Wraps the model so its calls go through the scheduler and the settings' call
+    policy (a pass-through policy when LLM_CALL_POLICY_ENABLED is off)
+    """
+    if not settings.LLM_CALL_POLICY_ENABLED and not settings.LLM_SCHEDULER_ENABLED:
+        return llm
+    policy = policy_for(model_id) if settings.LLM_CALL_POLICY_ENABLED else CallPolicy(timeout_s=0, max_retries=0)
+    return ResilientChatModel(inner=llm, model_id=model_id, policy=policy)
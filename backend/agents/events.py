@@ -0,0 +1,63 @@
+import json
+import logging
+from typing import Any, Dict, Optional
+from langchain_core.callbacks.manager import adispatch_custom_event
+
+from utils.message_utils import content_text
+
+logger = logging.getLogger(__name__)
+
+# Custom event name used for node transition updates
+PROGRESS_EVENT = "progress"
+
+# Run tags: root model runs produce user-facing text, except routing calls
+ROOT_AGENT_TAG = "root_agent"
+ROUTING_TAG = "routing"
+
+
+async def emit_progress(stage: str, **data: Any):
+    """Dispatches a progress event, visible to graph.astream_events consumers"""
+    try:
+        await adispatch_custom_event(PROGRESS_EVENT, {"stage": stage, **data})
+    except RuntimeError:
+        # Outside of a graph run there is no parent run to attach the event to
+        logger.debug("Progress event '%s' dropped: no parent run", stage)
+
+
+def progress_from_event(event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Maps an astream_events (v2) event to a progress payload, or None"""
+    kind = event["event"]
+
+    if kind == "on_custom_event" and event["name"] == PROGRESS_EVENT:
+        return event["data"]
+
+    if kind == "on_tool_end" and event["name"] == "execute_query":
+        output = event["data"].get("output")
+        content = getattr(output, "content", output)
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                content = {}
+        if not isinstance(content, dict):
+            content = {}
+        return {
+            "stage": "sql_executed",
+            "query_successful": content.get("query_successful"),
+            "record_count": content.get("record_count"),
+            "execution_time_ms": content.get("execution_time_ms"),
+        }
+
+    return None
+
+
+def answer_token(event: Dict[str, Any]) -> str:
+    """Returns the answer text carried by an astream_events (v2) event, or an empty string"""
+    if event["event"] != "on_chat_model_stream":
+        return ""
+
+    tags = event.get("tags") or []
+    if ROOT_AGENT_TAG not in tags or ROUTING_TAG in tags:
+        return ""
+
+    return content_text(event["data"]["chunk"].content)
@@ -1,15 +1,24 @@
 import logging
-from typing import Literal
-from langchain_google_genai import ChatGoogleGenerativeAI
+from typing import List, Literal, Optional
 from langgraph.graph import StateGraph, END
 from langchain.agents import create_agent
-from langchain_core.messages import HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.tools import tool
 
 from .state import AgentState
 from .agentprofiles import AgentProfile
-from .profiles.query_agent.tools import execute_query
+from .events import emit_progress, ROOT_AGENT_TAG, ROUTING_TAG
+from .llm import create_llm
+from .router import KeywordRouter, Router, router_stats
+from .schema_prompt import schema_prompts
+from .speculation import Speculation
+from .profiles.query_agent.tools import execute_query, fetch_result_page
+from .sql_memo import answer_from_memo, remember_sql
+from .usage import UsageBudgetMiddleware
 from core.settings import settings
-from utils.logging_utils import boxed_log
+from utils.logging_utils import Preview, boxed_log
+from utils.message_utils import content_text
 
 logger = logging.getLogger(__name__)
 
@@ -18,86 +27,169 @@ root_profile = AgentProfile(agent_name="root_agent")
 query_profile = AgentProfile(agent_name="query_agent")
 
 # Initialize LLMs
-root_llm = ChatGoogleGenerativeAI(
-    model=root_profile.model_id,
-    google_api_key=settings.GOOGLE_API_KEY,)
-query_llm = ChatGoogleGenerativeAI(
-    model=query_profile.model_id,
-    google_api_key=settings.GOOGLE_API_KEY,)
+root_llm = create_llm(root_profile.model_id, tags=[ROOT_AGENT_TAG])
+query_llm = create_llm(query_profile.model_id)
+
+# Local router in front of the routing LLM call (None disables the fast path)
+fast_router: Router = KeywordRouter(threshold=settings.FAST_ROUTER_THRESHOLD) if settings.FAST_ROUTER_ENABLED else None
 
 # Create query agent with tools
 query_agent = create_agent(
     query_llm,
-    tools=[execute_query],
+    tools=[execute_query, fetch_result_page],
+    # Keeps one model call back for the root agent's answer
+    middleware=[UsageBudgetMiddleware(reserve_calls=1)],
 )
 
-def root_agent_node(state: AgentState) -> AgentState:
-    """Root agent decides routing or processes response"""
-    messages = state["messages"]
+async def root_system_prompt(messages: List[BaseMessage]) -> str:
+    """Root agent prompt with the overview of the tables the conversation is about"""
+    return await schema_prompts.arender(f"{root_profile.instruction}\n\n{root_profile.description}", messages)
 
-    logger.info("ROOT AGENT NODE ENTERED")
-    logger.info(f"Current next_agent state: {state.get('next_agent')}")
-    
-    if state.get("next_agent") == "process_query_result":
-        logger.info("ROOT AGENT: Processing query_agent results")
-        query_result = messages[-1].content[0]["text"]
-        logger.info(f"QUERY AGENT RESULT TEXT: {query_result}")
-        # Root agent interprets query results
-        system_prompt = f"{root_profile.instruction}\n\n{root_profile.description}"
-        post_procesing_prompt = f"""Based on the query results below, generate a natural, helpful response to answer the user's question.
+async def query_system_prompt(messages: List[BaseMessage]) -> str:
+    """Query agent prompt with the schema of the tables the conversation is about"""
+    return await schema_prompts.arender(f"{query_profile.instruction}\n\n{query_profile.description}", messages)
+
+async def route_locally(question: str) -> Optional[str]:
+    """
+    Returns the fast router's decision when it is confident enough, else None (ask the LLM).
+    Callers record the decision in router_stats only when they act on it.
+    """
+    if fast_router is None:
+        return None
+
+    routing = await fast_router.aroute(question)
+    if routing.confidence < fast_router.threshold:
+        logger.info("FAST ROUTER UNSURE (%s): %s", routing.confidence, routing.reason)
+        return None
+
+    logger.info("FAST ROUTER DECISION: %s (%s): %s", routing.next_agent, routing.confidence, routing.reason)
+    return routing.next_agent
+
+async def answer_query_result(query_message: BaseMessage, messages: List[BaseMessage]) -> AIMessage:
+    """Root agent turns the query agent's result into the final answer"""
+    logger.info("ROOT AGENT: Processing query_agent results")
+    await emit_progress("answering", source="query_result")
+    query_result = content_text(query_message.content)
+    encoded = query_result.encode("utf-8")
+    if len(encoded) > settings.TOOL_RESULT_MAX_BYTES:
+        # Cut on the byte budget; a character split at the cut is dropped
+        query_result = (encoded[:settings.TOOL_RESULT_MAX_BYTES].decode("utf-8", errors="ignore")
+                        + "\n... [query result truncated]")
+    logger.info("QUERY AGENT RESULT TEXT: %s", Preview(query_result))
+    # Root agent interprets query results
+    system_prompt = await root_system_prompt(messages)
+    post_procesing_prompt = f"""Based on the query results below, generate a natural, helpful response to answer the user's question.
 
 Query Results: 
 {query_result}
 
 Provide a clear, conversational answer with insights from the data."""
-        final_response = root_llm.invoke([{"role": "system", "content": system_prompt},
-                                          {"role": "user", "content": post_procesing_prompt}])
-        boxed_log(f"ROOT AGENT FINAL RESPONSE: {final_response.content}", logger, level="info")
+    final_response = await root_llm.ainvoke([{"role": "system", "content": system_prompt},
+                                            {"role": "user", "content": post_procesing_prompt}])
+    boxed_log("ROOT AGENT FINAL RESPONSE: %s", logger, "info", final_response.content)
+    return final_response
+
+async def root_agent_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """Root agent decides routing or processes response"""
+    messages = state["messages"]
+
+    logger.info("ROOT AGENT NODE ENTERED")
+    logger.info("Current next_agent state: %s", state.get("next_agent"))
+    
+    if state.get("next_agent") == "process_query_result":
+        final_response = await answer_query_result(messages[-1], messages)
         return {"messages": [final_response], "next_agent": "END"}
     
     # Initial routing decision
     logger.info("ROOT AGENT: Making routing decision")
-    system_prompt = f"{root_profile.instruction}\n\n{root_profile.description}"
-    routing_prompt = f"""Decide if you need query_agent for database access.
+    system_prompt = await root_system_prompt(messages)
+    decision = await route_locally(content_text(messages[-1].content))
+    speculation = None
+
+    if decision is None:
+        # Opt-in: run the query agent while the routing call is in flight
+        if settings.SPECULATIVE_QUERY_ENABLED:
+            speculation = Speculation(lambda speculative_config: run_query_agent(state, speculative_config), config)
+
+        routing_prompt = f"""Decide if you need query_agent for database access.
 Respond ONLY: "query_agent" or "answer_directly"
 
 User: {messages[-1].content}"""
 
-    response = root_llm.invoke([{"role": "system", "content": system_prompt}, 
-                                 {"role": "user", "content": routing_prompt}])
-    
-    decision = response.content.strip().lower()
-    logger.info(f"ROOT AGENT DECISION: {decision}")
+        try:
+            response = await root_llm.ainvoke([{"role": "system", "content": system_prompt}, 
+                                               {"role": "user", "content": routing_prompt}],
+                                              config={"tags": [ROUTING_TAG]})
+        except BaseException:
+            if speculation is not None:
+                await speculation.discard()
+            raise
+        decision = content_text(response.content).strip().lower()
+        router_stats.record("llm")
+    else:
+        router_stats.record(f"local_{decision}")
+
+    logger.info("ROOT AGENT DECISION: %s", decision)
     
     if "query_agent" in decision:
         logger.info("ROOT AGENT: Routing to query_agent")
-        return {"next_agent": "query_agent"}
+        await emit_progress("routing_decided", next_agent="query_agent")
+        if speculation is None:
+            return {"next_agent": "query_agent"}
+
+        # The speculative query agent run is the query_agent node's work
+        query_update = await speculation.take()
+        final_response = await answer_query_result(query_update["messages"][-1], messages)
+        return {"messages": [*query_update["messages"], final_response], "next_agent": "END"}
     else:
         logger.info("ROOT AGENT: Answering directly")
-        final_response = root_llm.invoke([{"role": "system", "content": system_prompt}] + list(messages))
-        boxed_log(f"ROOT AGENT FINAL DIRECT RESPONSE: {final_response.content}", logger, level="info")
+        if speculation is not None:
+            await speculation.discard()
+        await emit_progress("routing_decided", next_agent="answer_directly")
+        final_response = await root_llm.ainvoke([{"role": "system", "content": system_prompt}] + list(messages))
+        boxed_log("ROOT AGENT FINAL DIRECT RESPONSE: %s", logger, "info", final_response.content)
         return {"messages": [final_response], "next_agent": "__end__"}
 
-def query_agent_node(state: AgentState) -> AgentState:
+async def query_agent_node(state: AgentState) -> AgentState:
     """Query agent with system prompt"""
     logger.info("QUERY AGENT NODE ENTERED")
+    return await run_query_agent(state)
+
+async def run_query_agent(state: AgentState, config: Optional[RunnableConfig] = None) -> AgentState:
+    """Query agent step, also started speculatively by root_agent_node"""
+    await emit_progress("query_agent_started")
+
+    # Only first-turn questions are self-contained enough to memoize
+    # (a compacted history may hold a single HumanMessage after a summary)
+    first_message = state["messages"][0]
+    question = content_text(first_message.content) if (
+        len(state["messages"]) == 1 and isinstance(first_message, HumanMessage)) else None
+    if question:
+        memo_response = await answer_from_memo(question)
+        if memo_response is not None:
+            await emit_progress("query_agent_finished", source="sql_memo")
+            return {"messages": [AIMessage(content=memo_response)], "next_agent": "process_query_result"}
+
     # Inject system prompt into messages
     system_message = {
         "role": "system", 
-        "content": f"{query_profile.instruction}\n\n{query_profile.description}"
+        "content": await query_system_prompt(state["messages"])
     }
     messages_with_system = [system_message] + list(state["messages"])
     
     # Update state for agent
     agent_state = {**state, "messages": messages_with_system}
-    result = query_agent.invoke(agent_state)
+    result = await query_agent.ainvoke(agent_state, config=config)
+    if question:
+        remember_sql(question, result["messages"][len(messages_with_system):])
 
     # Log last AI message from query agent
     for msg in reversed(result['messages']):
         if hasattr(msg, 'content'):
-            logger.info(f"QUERY AGENT LAST RESPONSE: {str(msg.content)[:200]}...")
+            logger.info("QUERY AGENT LAST RESPONSE: %s", Preview(msg.content, 200))
             break
-    
+
+    await emit_progress("query_agent_finished")
     return {"messages": result["messages"], "next_agent": "process_query_result"}
 
 def route_after_root(state: AgentState) -> Literal["query_agent", "__end__"]:
@@ -122,4 +214,68 @@ workflow.add_conditional_edges(
 )
 workflow.add_edge("query_agent", "root_agent")
 
-graph = workflow.compile()
\ No newline at end of file
+graph = workflow.compile()
+
+# SINGLE-CALL VARIANT: one root call either answers or requests the query agent
+@tool("query_agent")
+def request_query_agent(user_request: str) -> str:
+    """
+    Retrieve data from the insurance policy database through the query_agent.
+    Call this instead of answering whenever the question needs policy, claim or customer data.
+
+    Args:
+        user_request: The data needed, self-contained (include context from earlier turns)
+    """
+    # Never executed: the graph routes to query_agent_node when the root model calls it
+    return user_request
+
+single_call_llm = root_llm.bind_tools([request_query_agent])
+
+async def single_call_root_node(state: AgentState, config: RunnableConfig) -> AgentState:
+    """
+    Root agent without a separate routing call: the answer and the routing
+    decision come from the same response (text answer or query_agent tool call)
+    """
+    if state.get("next_agent") == "process_query_result":
+        return await root_agent_node(state, config)
+
+    messages = state["messages"]
+    logger.info("ROOT AGENT (SINGLE CALL) NODE ENTERED")
+
+    # A confident local query decision skips the root call entirely
+    if await route_locally(content_text(messages[-1].content)) == "query_agent":
+        router_stats.record("local_query_agent")
+        await emit_progress("routing_decided", next_agent="query_agent")
+        return {"next_agent": "query_agent"}
+
+    system_prompt = await root_system_prompt(messages)
+    response = await single_call_llm.ainvoke([{"role": "system", "content": system_prompt}] + list(messages))
+
+    if response.tool_calls:
+        router_stats.record("single_call_query_agent")
+        logger.info("ROOT AGENT: Requested query_agent: %s", response.tool_calls[0]["args"])
+        await emit_progress("routing_decided", next_agent="query_agent")
+        return {"next_agent": "query_agent"}
+
+    router_stats.record("single_call_answer")
+    await emit_progress("routing_decided", next_agent="answer_directly")
+    boxed_log("ROOT AGENT FINAL DIRECT RESPONSE: %s", logger, "info", response.content)
+    return {"messages": [response], "next_agent": "__end__"}
+
+def build_single_call_graph():
+    single_call_workflow = StateGraph(AgentState)
+
+    single_call_workflow.add_node("root_agent", single_call_root_node)
+    single_call_workflow.add_node("query_agent", query_agent_node)
+
+    single_call_workflow.set_entry_point("root_agent")
+    single_call_workflow.add_conditional_edges(
+        "root_agent",
+        route_after_root,
+        {"query_agent": "query_agent", "__end__": END}
+    )
+    single_call_workflow.add_edge("query_agent", "root_agent")
+
+    return single_call_workflow.compile()
+
+single_call_graph = build_single_call_graph()
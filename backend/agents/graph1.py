@@ -1,14 +1,18 @@
 import logging
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langgraph.graph import StateGraph, END
 from langchain.agents import create_agent
 from langchain_core.tools import tool
 
 from .state import AgentState
 from .agentprofiles import AgentProfile
-from .profiles.query_agent.tools import execute_query
-from core.settings import settings
-from utils.logging_utils import boxed_log
+from .events import emit_progress, ROOT_AGENT_TAG
+from .llm import create_llm
+from .schema_prompt import SchemaPromptMiddleware
+from .usage import UsageBudgetMiddleware
+from .profiles.query_agent.tools import execute_query, fetch_result_page
+from .sql_memo import answer_from_memo, remember_sql
+from utils.logging_utils import Preview, boxed_log
+from utils.message_utils import content_text
 
 logger = logging.getLogger(__name__)
 
@@ -17,27 +21,23 @@ logger = logging.getLogger(__name__)
 root_profile = AgentProfile(agent_name="root_agent")
 query_profile = AgentProfile(agent_name="query_agent")
 
-root_llm = ChatGoogleGenerativeAI(
-    model=root_profile.model_id,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+root_llm = create_llm(root_profile.model_id, tags=[ROOT_AGENT_TAG])
 
-query_llm = ChatGoogleGenerativeAI(
-    model=query_profile.model_id,
-    google_api_key=settings.GOOGLE_API_KEY
-)
+query_llm = create_llm(query_profile.model_id)
 
 # QUERY AGENT CREATION
 query_agent = create_agent(
     query_llm,
-    tools=[execute_query],
-    system_prompt=f"{query_profile.instruction}\n\n{query_profile.description}"
+    tools=[execute_query, fetch_result_page],
+    system_prompt=f"{query_profile.instruction}\n\n{query_profile.description}",
+    # Schema of the tables the request is about; keeps one model call back for the root agent's answer
+    middleware=[SchemaPromptMiddleware(), UsageBudgetMiddleware(reserve_calls=1)],
 )
 
 
 # QUERY AGENT AS TOOL
 @tool
-def query_agent_tool(user_request: str) -> str:
+async def query_agent_tool(user_request: str) -> str:
     """
     Execute database queries and return results.
     Use this when you need to retrieve data from the database.
@@ -48,17 +48,26 @@ def query_agent_tool(user_request: str) -> str:
     Returns:
         Query results as a formatted string
     """
-    logger.info(f"QUERY AGENT TOOL CALLED with request: {user_request}")
+    logger.info("QUERY AGENT TOOL CALLED with request: %s", user_request)
+    await emit_progress("query_agent_started", user_request=user_request)
+
+    # Repeated requests reuse the SQL that answered them before, skipping the LLM
+    memo_response = await answer_from_memo(user_request)
+    if memo_response is not None:
+        await emit_progress("query_agent_finished", source="sql_memo")
+        return memo_response
     
-    result = query_agent.invoke({
+    result = await query_agent.ainvoke({
         "messages": [{"role": "user", "content": user_request}]
     })
+    remember_sql(user_request, result["messages"])
     
     # Extract the final response
     final_message = result["messages"][-1]
-    response_text = final_message.content[0]["text"]
+    response_text = content_text(final_message.content)
     
-    logger.info(f"QUERY AGENT TOOL RESPONSE: {response_text}")
+    logger.info("QUERY AGENT TOOL RESPONSE: %s", Preview(response_text))
+    await emit_progress("query_agent_finished")
     
     return response_text
 
@@ -67,21 +76,22 @@ def query_agent_tool(user_request: str) -> str:
 root_agent = create_agent(
     root_llm,
     tools=[query_agent_tool],
-    system_prompt=f"{root_profile.instruction}\n\n{root_profile.description}"
+    system_prompt=f"{root_profile.instruction}\n\n{root_profile.description}",
+    middleware=[SchemaPromptMiddleware(), UsageBudgetMiddleware()],
 )
 
 
 # GRAPH NODES
-def root_agent_node(state: AgentState) -> AgentState:
+async def root_agent_node(state: AgentState) -> AgentState:
     logger.info("ROOT AGENT NODE ENTERED")
+    await emit_progress("root_agent_started")
 
-    result = root_agent.invoke(state)
+    result = await root_agent.ainvoke(state)
     
     final_message = result["messages"][-1]
     if isinstance(final_message.content, list):
-        text = final_message.content[0].get("text", "")
-        final_message.content = text
-    boxed_log(f"ROOT AGENT FINAL RESPONSE: {final_message.content}", logger, level="info")
+        final_message.content = content_text(final_message.content)
+    boxed_log("ROOT AGENT FINAL RESPONSE: %s", logger, "info", final_message.content)
     
     return {
         "messages": [final_message],
@@ -0,0 +1,49 @@
+from typing import Any, Callable, Dict, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from agents.call_policy import with_call_policy
+from core.settings import settings
+
+# Factory signature: model_id -> chat model
+LLMFactory = Callable[[str], BaseChatModel]
+
+_llm_factory: Optional[LLMFactory] = None
+
+
+def set_llm_factory(factory: Optional[LLMFactory]):
+    """
+    Overrides how agent LLMs are created (e.g. with a fake model for benchmarks).
+    Must be called before the agent graphs are built. Pass None to restore Gemini.
+    """
+    global _llm_factory
+    _llm_factory = factory
+
+
+def create_llm(model_id: str, tags: Optional[List[str]] = None) -> BaseChatModel:
+    """
+    Creates the chat model for an agent profile's model_id.
+    Tags are attached to every run of the model (used to pick answer tokens out of event streams).
+    """
+    if _llm_factory is not None:
+        llm = _llm_factory(model_id)
+    else:
+        # Imported on first use: the Gemini client adds ~0.7s to cold start
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        llm = ChatGoogleGenerativeAI(
+            model=model_id,
+            google_api_key=settings.GOOGLE_API_KEY,
+        )
+
+    # Timeouts, retries and hedging (agents/call_policy.py)
+    llm = with_call_policy(llm, model_id)
+
+    if tags:
+        llm.tags = [*(llm.tags or []), *tags]
+    return llm
+
+
+def run_model_id(metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> str:
+    """Model id of a chat model run, from the callback metadata or invocation params"""
+    params = kwargs.get("invocation_params") or {}
+    return ((metadata or {}).get("ls_model_name") or params.get("model") or params.get("model_name")
+            or params.get("model_id") or "unknown")
@@ -0,0 +1,258 @@
+import math
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from core.settings import settings
+from core.tracing import LatencyHistograms
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class SchedulerRejected(Exception):
+    """An LLM call (or a whole request) was turned away to keep queues bounded"""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(SchedulerRejected):
+    """The model's wait queue is full: the caller should back off and retry later"""
+    status_code = 429
+
+
+class QueueTimeout(SchedulerRejected):
+    """No slot freed up before the waiter's deadline"""
+    status_code = 503
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+
+
+def _granted(future: asyncio.Future) -> bool:
+    return future.done() and not future.cancelled() and future.exception() is None
+
+
+class ModelPool:
+    """
+    At most `capacity` concurrent calls to one model. Callers beyond that wait
+    in a priority queue (FIFO within a priority) of at most `max_depth`
+    waiters, each until its own deadline. When the queue is full, a newcomer
+    takes the place of the last waiter of a lower priority, if any.
+    """
+
+    def __init__(self, model_id: str, capacity: int, max_depth: int):
+        self.model_id = model_id
+        self.capacity = capacity
+        self.max_depth = max_depth
+        self.active = 0
+        self.waiting = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.counters = {"acquired": 0, "queued": 0, "rejected": 0, "timeouts": 0}
+        self._hold_s = 1.0  # moving average of how long a call holds its slot
+
+    def try_acquire(self) -> bool:
+        """Takes a free slot without waiting (never ahead of queued callers)"""
+        if self.active < self.capacity and not self.waiting:
+            self.active += 1
+            self.counters["acquired"] += 1
+            return True
+        return False
+
+    def waiting_ahead(self, priority: int) -> int:
+        """Waiters that would be served before a new caller of this priority"""
+        return sum(1 for waiter in self._queue if not waiter.future.done() and waiter.priority <= priority)
+
+    def _shed(self, priority: int) -> bool:
+        """Rejects the last waiter of a lower priority than `priority`, if there is one"""
+        live = [waiter for waiter in self._queue if not waiter.future.done() and waiter.priority > priority]
+        if not live:
+            return False
+        victim = max(live, key=lambda waiter: (waiter.priority, waiter.seq))
+        self.waiting -= 1
+        self.counters["rejected"] += 1
+        victim.future.set_exception(QueueFull(f"{self.model_id} queue is full: shed for a higher priority call",
+                                              self.retry_after()))
+        return True
+
+    async def acquire(self, priority: int, timeout_s: float):
+        if self.try_acquire():
+            return
+        if self.waiting >= self.max_depth and not self._shed(priority):
+            self.counters["rejected"] += 1
+            raise QueueFull(f"{self.model_id} queue is full ({self.waiting} waiting)", self.retry_after())
+
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._queue, waiter)
+        self.waiting += 1
+        self.counters["queued"] += 1
+        try:
+            # A slot handed over at the deadline still counts (wait_for returns the result)
+            await asyncio.wait_for(waiter.future, timeout_s)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise QueueTimeout(f"No {self.model_id} slot within {timeout_s:.0f}s", self.retry_after()) from None
+        except asyncio.CancelledError:
+            if _granted(waiter.future):
+                self.release()  # granted as the caller went away: pass it on
+            raise
+        finally:
+            # Granted and shed waiters were already taken off the count
+            if not waiter.future.done() or waiter.future.cancelled():
+                self.waiting -= 1
+        self.counters["acquired"] += 1
+
+    def release(self, held_s: Optional[float] = None):
+        if held_s is not None:
+            self._hold_s += 0.1 * (held_s - self._hold_s)
+        # Hand the slot to the first live waiter (timed out ones are skipped)
+        while self._queue:
+            waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                self.waiting -= 1
+                waiter.future.set_result(None)
+                return
+        self.active -= 1
+
+    def retry_after(self) -> int:
+        """Seconds until the current queue is likely drained, at least 1"""
+        return max(1, min(60, math.ceil((self.waiting + 1) / self.capacity * self._hold_s)))
+
+
+_priority: ContextVar[int] = ContextVar("llm_priority", default=INTERACTIVE)
+
+
+class LLMScheduler:
+    """
+    Per-model concurrency pools all agent LLM calls go through (see
+    ResilientChatModel), with interactive calls ahead of batch ones, plus
+    request admission: new requests are rejected at once while a model's
+    queue is full of calls they would wait behind (batch requests already at
+    half of the queue).
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._pools: Dict[str, ModelPool] = {}
+        self.wait_histograms = LatencyHistograms()
+        self.admission_rejections = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def pool(self, model_id: str) -> ModelPool:
+        pool = self._pools.get(model_id)
+        if pool is None:
+            capacity = settings.LLM_MAX_CONCURRENCY_BY_MODEL.get(model_id, settings.LLM_MAX_CONCURRENCY)
+            pool = self._pools[model_id] = ModelPool(model_id, capacity, settings.LLM_QUEUE_MAX_DEPTH)
+        return pool
+
+    @staticmethod
+    @contextmanager
+    def priority(priority: int) -> Iterator[None]:
+        """LLM calls made in this context (and tasks started from it) wait with this priority"""
+        token = _priority.set(priority)
+        try:
+            yield
+        finally:
+            try:
+                _priority.reset(token)
+            except ValueError:
+                # An async generator (streaming turn) was closed from another context
+                pass
+
+    def admit(self, priority: int = INTERACTIVE):
+        """Raises QueueFull when a new request of this priority would only pile up"""
+        if not self.enabled:
+            return
+        for pool in self._pools.values():
+            if priority == INTERACTIVE:
+                full = pool.waiting_ahead(priority) >= pool.max_depth
+            else:
+                full = pool.waiting >= pool.max_depth // 2
+            if full:
+                self.admission_rejections[PRIORITY_NAMES[priority]] += 1
+                raise QueueFull(f"{pool.model_id} is overloaded ({pool.waiting} calls waiting)", pool.retry_after())
+
+    @asynccontextmanager
+    async def slot(self, model_id: str) -> AsyncIterator[None]:
+        """Holds one of the model's concurrency slots for the block"""
+        if not self.enabled:
+            yield
+            return
+        pool = self.pool(model_id)
+        priority = _priority.get()
+        timeout_s = settings.LLM_QUEUE_MAX_WAIT_S if priority == INTERACTIVE else settings.LLM_BATCH_QUEUE_MAX_WAIT_S
+        start = time.perf_counter()
+        await pool.acquire(priority, timeout_s)
+        acquired = time.perf_counter()
+        # Waits of granted calls only: rejections and timeouts are counted by the pool
+        self.wait_histograms.observe("queue", f"{model_id}/{PRIORITY_NAMES.get(priority, priority)}",
+                                     (acquired - start) * 1000)
+        try:
+            yield
+        finally:
+            pool.release(time.perf_counter() - acquired)
+
+    def try_slot(self, model_id: str) -> bool:
+        """Takes a slot only if one is free right now (release it with release())"""
+        return not self.enabled or self.pool(model_id).try_acquire()
+
+    def release(self, model_id: str):
+        if self.enabled:
+            self.pool(model_id).release()
+
+    def reset(self):
+        """Drops the pools and metrics (pools are rebuilt from settings); only while no call is in flight"""
+        self._pools.clear()
+        self.wait_histograms.reset()
+        self.admission_rejections = {name: 0 for name in PRIORITY_NAMES.values()}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "admission_rejections": dict(self.admission_rejections),
+            "models": {model_id: {"capacity": pool.capacity, "active": pool.active, "waiting": pool.waiting,
+                                  "max_depth": pool.max_depth, **pool.counters}
+                       for model_id, pool in self._pools.items()},
+            "wait": self.wait_histograms.snapshot(),
+        }
+
+    def prometheus(self) -> str:
+        """Queue gauges, counters and wait time histograms in the Prometheus text format"""
+        lines = [
+            "# HELP chatbot_llm_queue_depth LLM calls waiting for a concurrency slot",
+            "# TYPE chatbot_llm_queue_depth gauge",
+            *(f'chatbot_llm_queue_depth{{model="{m}"}} {p.waiting}' for m, p in self._pools.items()),
+            "# HELP chatbot_llm_active_calls LLM calls holding a concurrency slot",
+            "# TYPE chatbot_llm_active_calls gauge",
+            *(f'chatbot_llm_active_calls{{model="{m}"}} {p.active}' for m, p in self._pools.items()),
+            "# HELP chatbot_llm_scheduler_total LLM scheduler outcomes by model",
+            "# TYPE chatbot_llm_scheduler_total counter",
+            *(f'chatbot_llm_scheduler_total{{model="{m}",outcome="{outcome}"}} {count}'
+              for m, p in self._pools.items() for outcome, count in p.counters.items()),
+            "# HELP chatbot_admission_rejections_total Requests rejected on arrival because a queue was full",
+            "# TYPE chatbot_admission_rejections_total counter",
+            *(f'chatbot_admission_rejections_total{{priority="{name}"}} {count}'
+              for name, count in self.admission_rejections.items()),
+        ]
+        return "\n".join(lines) + "\n" + self.wait_histograms.prometheus(metric="chatbot_llm_queue_wait_ms",
+                                                                          errors_metric=None)
+
+
+llm_scheduler = LLMScheduler(enabled=settings.LLM_SCHEDULER_ENABLED)
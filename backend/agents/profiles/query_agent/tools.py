@@ -1,41 +1,148 @@
+import json
 import time
 import logging
-from typing import Dict, Any
-from langchain_core.tools import tool
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_core.tools import StructuredTool, tool
+from core.settings import settings
 from database.database import db
+from database.sql_guard import QueryRejectedError
+from database.result_store import ResultStore
 
 logger = logging.getLogger(__name__)
 
-@tool
-def execute_query(sql_query: str) -> Dict[str, Any]:
+# Full results of truncated queries, paged through with fetch_result_page
+result_store = ResultStore(
+    max_entries=settings.RESULT_STORE_MAX_ENTRIES,
+    ttl_s=settings.RESULT_STORE_TTL_S,
+    max_bytes=settings.RESULT_STORE_MAX_BYTES,
+)
+
+def _row_budget(columns: Tuple[str, ...], rows: List[tuple], max_rows: int, max_bytes: int) -> int:
+    """Number of leading rows that fit in both the row and the (JSON) byte budget"""
+    records = settings.TOOL_RESULT_FORMAT == "records"
+    size = 0
+    for count, row in enumerate(rows[:max_rows]):
+        size += len(json.dumps(dict(zip(columns, row)) if records else row, default=str)) + 1
+        if size > max_bytes:
+            # Always return at least one row so paging makes progress
+            return max(count, 1)
+    return min(len(rows), max_rows)
+
+def _encode_rows(columns: Tuple[str, ...], rows: List[tuple]) -> Dict[str, Any]:
+    """Rows in the configured wire format: columnar (columns + row lists) or records (list of dicts)"""
+    if settings.TOOL_RESULT_FORMAT == "records":
+        return {"data": [dict(zip(columns, row)) for row in rows]}
+    return {"columns": list(columns), "rows": rows}
+
+def _bounded_result(columns: Tuple[str, ...], rows: List[tuple], offset: int = 0,
+                    handle: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Caps rows[offset:] to TOOL_RESULT_MAX_ROWS / TOOL_RESULT_MAX_BYTES. When rows are
+    left out, the full result is kept server-side and a result_handle is returned
+    (None when the result is too large for the result store's byte budget).
+    """
+    page = rows[offset:]
+    returned = _row_budget(columns, page, settings.TOOL_RESULT_MAX_ROWS, settings.TOOL_RESULT_MAX_BYTES)
+    truncated = offset + returned < len(rows)
+    if truncated and handle is None:
+        handle = result_store.put(columns, rows)
+
+    return {
+        **_encode_rows(columns, page[:returned]),
+        "record_count": len(rows),
+        "returned_count": returned,
+        "offset": offset,
+        "truncated": truncated,
+        "result_handle": handle if truncated else None,
+    }
+
+def _query_succeeded(columns: Tuple[str, ...], rows: List[tuple], metadata: Dict[str, Any],
+                     start_time: float) -> Dict[str, Any]:
+    execution_time = (time.time() - start_time) * 1000
+    return {
+        "query_successful": True,
+        **_bounded_result(columns, rows),
+        "execution_time_ms": round(execution_time, 2),
+        "metadata": metadata,
+        "error": None
+    }
+
+def _query_failed(sql_query: str, e: Exception) -> Dict[str, Any]:
+    if isinstance(e, QueryRejectedError):
+        # Guard rejections carry a code and a rewrite hint for the agent
+        return {
+            "query_successful": False,
+            "data": [],
+            "record_count": 0,
+            "execution_time_ms": 0,
+            "error": f"Query rejected: {e.message}",
+            "error_code": e.code,
+            "hint": e.hint,
+        }
+
+    logger.error("SQL query execution error: %s", e)
+    logger.error("Query: %s", sql_query)
+    return {
+        "query_successful": False,
+        "data": [],
+        "record_count": 0,
+        "execution_time_ms": 0,
+        "error": f"Query execution failed: {str(e)}"
+    }
+
+def _execute_query(sql_query: str) -> Dict[str, Any]:
     """
     Execute a SQL query against the insurance database.
-    
+    Large results are truncated: check `truncated`, `record_count` and page
+    through the rest with fetch_result_page(result_handle, offset).
+
     Args:
         sql_query: The SQL query string to execute
-        
+
     Returns:
-        Dictionary containing query results, execution time, and status
+        Dictionary containing query results, execution time, cache hit metadata and status
     """
     try:
         start_time = time.time()
-        results = db.execute_query(sql_query)
-        execution_time = (time.time() - start_time) * 1000
-        
-        return {
-            "query_successful": True,
-            "data": results,
-            "record_count": len(results),
-            "execution_time_ms": round(execution_time, 2),
-            "error": None
-        }
+        columns, rows, metadata = db.execute_query_columnar(sql_query)
+        return _query_succeeded(columns, rows, metadata, start_time)
+    except Exception as e:
+        return _query_failed(sql_query, e)
+
+async def _aexecute_query(sql_query: str) -> Dict[str, Any]:
+    # Waits for a pooled read connection and runs SQLite in a worker thread
+    try:
+        start_time = time.time()
+        columns, rows, metadata = await db.aexecute_query_columnar(sql_query)
+        return _query_succeeded(columns, rows, metadata, start_time)
     except Exception as e:
-        logger.error("SQL query execution error: %s", e)
-        logger.error("Query: %s", sql_query)
+        return _query_failed(sql_query, e)
+
+# Sync and async implementations: agents running via ainvoke use the pooled async path
+execute_query = StructuredTool.from_function(
+    func=_execute_query,
+    coroutine=_aexecute_query,
+    name="execute_query",
+)
+
+@tool
+def fetch_result_page(result_handle: str, offset: int) -> Dict[str, Any]:
+    """
+    Fetch more rows of a truncated execute_query result.
+
+    Args:
+        result_handle: The result_handle returned by execute_query
+        offset: Index of the first row to return (use offset + returned_count of the previous page)
+
+    Returns:
+        Dictionary with the next page of rows, in the same format as execute_query
+    """
+    stored = result_store.get(result_handle)
+    if stored is None:
         return {
             "query_successful": False,
-            "data": [],
-            "record_count": 0,
-            "execution_time_ms": 0,
-            "error": f"Query execution failed: {str(e)}"
-        }
\ No newline at end of file
+            "error": f"Result handle '{result_handle}' is unknown or expired, run the query again"
+        }
+
+    columns, rows = stored
+    return {"query_successful": True, **_bounded_result(columns, rows, max(offset, 0), result_handle), "error": None}
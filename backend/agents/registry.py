@@ -0,0 +1,50 @@
+import time
+import asyncio
+import logging
+import importlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Graph name -> (module whose import builds it, attribute holding the compiled graph)
+GRAPH_MODULES: Dict[str, Tuple[str, str]] = {
+    "graph": ("agents.graph", "graph"),
+    "graph1": ("agents.graph1", "graph"),
+    "graph_single_call": ("agents.graph", "single_call_graph"),
+}
+
+_graphs: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def get_graph(name: Optional[str] = None) -> Any:
+    """
+    Compiled graph by name (default: settings.ACTIVE_GRAPH).
+    Graph modules build their LLMs and agents at import time, so they are only
+    imported on first use and only for the graphs that are actually requested.
+    """
+    name = name or settings.ACTIVE_GRAPH
+    graph = _graphs.get(name)
+    if graph is not None:
+        return graph
+
+    if name not in GRAPH_MODULES:
+        raise ValueError(f"Unknown graph '{name}', expected one of {sorted(GRAPH_MODULES)}")
+
+    with _lock:
+        if name not in _graphs:
+            start = time.perf_counter()
+            module, attribute = GRAPH_MODULES[name]
+            _graphs[name] = getattr(importlib.import_module(module), attribute)
+            logger.info("Graph '%s' built in %.0f ms", name, (time.perf_counter() - start) * 1000)
+        return _graphs[name]
+
+
+async def warm_up(name: Optional[str] = None):
+    """Builds the graph and loads the schema catalog off the event loop (called from the app lifespan)"""
+    await asyncio.to_thread(get_graph, name)
+    from agents.schema_prompt import schema_prompts
+    await schema_prompts.catalog.atables()
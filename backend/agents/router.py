@@ -0,0 +1,166 @@
+import re
+import logging
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Protocol, Set
+
+from database.database import InsuranceDatabase, db
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+QUERY_AGENT = "query_agent"
+ANSWER_DIRECTLY = "answer_directly"
+
+# Low-cardinality columns whose values are useful routing terms ('Active', 'North', ...)
+VALUE_COLUMNS = ("Status", "Region", "Policy_Type", "Claim_Type", "Payment_Frequency")
+# Column name parts too generic to signal a database question on their own
+GENERIC_TERMS = {"id", "date", "name", "type", "amount", "last", "end", "start", "count", "day", "insurance"}
+
+DATA_CUES = {
+    "how many", "how much", "total", "sum", "average", "avg", "count", "number of", "list", "show",
+    "top", "highest", "lowest", "most", "least", "which", "per", "by", "expiring", "breakdown",
+    "rate", "distribution", "compare",
+}
+DIRECT_CUES = {
+    "hello", "hi", "hey", "thanks", "thank you", "good morning", "good afternoon", "who are you",
+    "what can you do", "explain", "define", "definition", "what is a", "what is an", "what does",
+    "mean", "difference between", "tips", "advice", "best practice",
+}
+
+
+@dataclass
+class RoutingDecision:
+    next_agent: str  # "query_agent" or "answer_directly"
+    confidence: float
+    reason: str = ""
+
+
+class Router(Protocol):
+    threshold: float
+
+    def route(self, question: str) -> RoutingDecision:
+        ...
+
+    async def aroute(self, question: str) -> RoutingDecision:
+        ...
+
+
+class RouterStats:
+    """Thread-safe counters for which routing path fired"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    def record(self, path: str):
+        with self._lock:
+            self._counts[path] = self._counts.get(path, 0) + 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+def _normalize(token: str) -> str:
+    """Crude singularization so 'policies'/'policy' and 'claims'/'claim' match"""
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def _tokens(text: str) -> Set[str]:
+    return {_normalize(token) for token in re.findall(r"[a-z0-9]+", text.lower())}
+
+
+def _has_cue(text: str, tokens: Set[str], cues: Iterable[str]) -> int:
+    hits = 0
+    for cue in cues:
+        if " " in cue:
+            hits += cue in text
+        else:
+            hits += _normalize(cue) in tokens
+    return hits
+
+
+def schema_vocabulary(database: InsuranceDatabase = db, tables: Optional[Iterable[str]] = None) -> Set[str]:
+    """
+    Routing terms from table/column names and low-cardinality column values of
+    the live database (every table unless `tables` is given). Reads a connection
+    of its own, never a pooled one.
+    """
+    vocabulary: Set[str] = set()
+    with closing(database.connect_readonly()) as conn:
+        if tables is None:
+            tables = [name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        for table in tables:
+            vocabulary |= _tokens(table.replace("_", " "))
+            columns = [row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')]
+            for column in columns:
+                vocabulary |= _tokens(column.replace("_", " "))
+                if column in VALUE_COLUMNS:
+                    for row in conn.execute(f'SELECT DISTINCT "{column}" FROM "{table}" LIMIT 50'):
+                        if row[0]:
+                            vocabulary |= _tokens(str(row[0]))
+    return vocabulary - GENERIC_TERMS
+
+
+class KeywordRouter:
+    """
+    Local routing classifier: matches the question against the database schema vocabulary
+    and data/direct-answer cue phrases. Decisions below the threshold go to the LLM.
+    Without a fixed vocabulary, it is read from the database on first use (so importing
+    the graph does not touch the database) and again whenever its data version changes.
+    Use aroute() on the event loop: it never reads the database there.
+    """
+
+    def __init__(self, vocabulary: Optional[Set[str]] = None, threshold: float = 0.8,
+                 database: InsuranceDatabase = db):
+        self._vocabulary = vocabulary
+        self._cache = VersionedCache(lambda: schema_vocabulary(database), database.data_version,
+                                     name="routing vocabulary")
+        self.threshold = threshold
+
+    @property
+    def vocabulary(self) -> Set[str]:
+        return self._vocabulary if self._vocabulary is not None else self._cache.get()
+
+    def route(self, question: str) -> RoutingDecision:
+        return self._route(question, self.vocabulary)
+
+    async def aroute(self, question: str) -> RoutingDecision:
+        vocabulary = self._vocabulary if self._vocabulary is not None else await self._cache.aget()
+        return self._route(question, vocabulary)
+
+    @staticmethod
+    def _route(question: str, vocabulary: Set[str]) -> RoutingDecision:
+        text = " ".join(question.lower().split())
+        tokens = _tokens(text)
+
+        schema_hits = len(tokens & vocabulary)
+        data_cues = _has_cue(text, tokens, DATA_CUES)
+        direct_cues = _has_cue(text, tokens, DIRECT_CUES)
+
+        if schema_hits and data_cues and not direct_cues:
+            confidence = round(min(1.0, 0.6 + 0.15 * schema_hits + 0.1 * data_cues), 2)
+            return RoutingDecision(QUERY_AGENT, confidence, f"schema_terms={schema_hits} data_cues={data_cues}")
+
+        if not schema_hits and direct_cues and not data_cues:
+            return RoutingDecision(ANSWER_DIRECTLY, 0.9, f"direct_cues={direct_cues}")
+
+        return RoutingDecision(
+            QUERY_AGENT if schema_hits else ANSWER_DIRECTLY,
+            0.5,
+            f"ambiguous: schema_terms={schema_hits} data_cues={data_cues} direct_cues={direct_cues}",
+        )
+
+
+router_stats = RouterStats()
@@ -0,0 +1,334 @@
+import re
+import sqlite3
+import logging
+from contextlib import closing
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from langchain.agents.middleware import AgentMiddleware
+from langchain_core.messages import HumanMessage
+
+from agents.router import GENERIC_TERMS, _tokens
+from core.settings import settings
+from database.database import InsuranceDatabase, db
+from database.db_tool import SCHEMA_FILE, schema_from_file
+from utils.message_utils import content_text
+from utils.versioned_cache import VersionedCache
+
+logger = logging.getLogger(__name__)
+
+# Placeholders in the agents' instruction files
+SCHEMA_MARKER = "{{DATABASE_SCHEMA}}"  # query agent: CREATE TABLE statements
+OVERVIEW_MARKER = "{{DATA_OVERVIEW}}"  # root agent: one line per table plus known values
+
+# Question words that say nothing about which table or column is meant
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "by", "per", "for", "in", "on", "to", "from", "with", "vs", "is", "are",
+    "was", "be", "it", "its", "this", "that", "these", "those", "what", "which", "who", "how", "many", "much",
+    "show", "list", "give", "me", "we", "our", "us", "do", "does", "have", "has", "all", "each", "any", "than",
+    "over", "under", "when", "whenever", "never", "where", "whose", "most", "least", "top", "total", "number",
+    "data", "table", "row", "column", "value", "can", "you", "please", "about", "between", "rebuilt", "loaded",
+}
+_VALUE_LIST = re.compile(r"^'[^']*'(\s*,\s*'[^']*')*$")
+_LINK = re.compile(r"Links to (\w+)\.(\w+)")
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    type: str
+    primary_key: bool = False
+    comment: str = ""
+    values: Optional[List[str]] = None  # every distinct value of a low-cardinality text column
+    tokens: Set[str] = field(default_factory=set)
+    value_tokens: Set[str] = field(default_factory=set)
+
+    def note(self) -> str:
+        """Column comment, with the live values in place of a hand-written value list"""
+        if not self.values:
+            return self.comment
+        values = ", ".join(f"'{value}'" for value in self.values)
+        if not self.comment or _VALUE_LIST.match(self.comment):
+            return values
+        return f"{self.comment}: {values}"
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: List[ColumnInfo]
+    description: str = ""
+    links: List[Tuple[str, str, str]] = field(default_factory=list)  # (column, table, column) it joins to
+    tokens: Set[str] = field(default_factory=set)  # name tokens
+    description_tokens: Set[str] = field(default_factory=set)
+
+    def summary(self) -> str:
+        """First clause of the description (or the table name)"""
+        text = " ".join(self.description.split())
+        return re.split(r"\(|\. ", text, maxsplit=1)[0].strip().rstrip(".,") if text else self.name
+
+
+def _words(text: str) -> Set[str]:
+    return _tokens(text.replace("_", " ")) - STOPWORDS
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SchemaCatalog:
+    """
+    Tables and columns of the live database (sqlite_master and PRAGMA
+    table_info), annotated with the descriptions and column comments of
+    schema.sql where it has them, and the distinct values of low-cardinality
+    text columns. Rebuilt whenever the database's data version changes, so
+    tables added by db_tool show up without a restart.
+
+    Loads read a connection of their own, never a pooled one. On the event
+    loop use atables(): the first load runs in a worker thread, and after a
+    data version change the previous catalog is served while a background
+    refresh loads the new one.
+    """
+
+    def __init__(self, database: InsuranceDatabase = db, schema_file: Path = SCHEMA_FILE,
+                 max_distinct: int = 12, max_value_length: int = 40):
+        self.database = database
+        self.schema_file = schema_file
+        self.max_distinct = max_distinct
+        self.max_value_length = max_value_length
+        self._cache = VersionedCache(self._load, database.data_version, name="schema catalog")
+
+    def tables(self) -> Dict[str, TableInfo]:
+        """The catalog of the current data version, loaded in the calling thread when stale"""
+        return self._cache.get()
+
+    async def atables(self) -> Dict[str, TableInfo]:
+        """The catalog without blocking the event loop (the previous one while a refresh runs)"""
+        return await self._cache.aget()
+
+    def _load(self) -> Dict[str, TableInfo]:
+        specs = schema_from_file(self.schema_file)
+        tables = {}
+        with closing(self.database.connect_readonly()) as conn:
+            names = [name for (name,) in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid")]
+            for name in names:
+                spec = specs.get(name)
+                columns = []
+                for _, column_name, declared, _, _, pk in conn.execute(f"PRAGMA table_info({_quote(name)})"):
+                    column_spec = spec.column(column_name) if spec else None
+                    column = ColumnInfo(
+                        name=column_name,
+                        type=declared or (column_spec.type if column_spec else ""),
+                        primary_key=bool(pk) or bool(spec and spec.primary_key == column_name),
+                        comment=column_spec.comment if column_spec else "",
+                        tokens=_words(column_name),
+                    )
+                    column.values = self._sample(conn, name, column)
+                    if column.values:
+                        column.value_tokens = set().union(*(_words(value) for value in column.values))
+                    columns.append(column)
+                description = spec.description if spec else ""
+                tables[name] = TableInfo(
+                    name=name, columns=columns, description=description,
+                    links=[(column.name, *match.groups()) for column in columns
+                           for match in [_LINK.search(column.comment)] if match],
+                    tokens=_words(name), description_tokens=_words(description),
+                )
+        _link_shared_ids(tables)
+        logger.info("Schema catalog loaded: %d tables", len(tables))
+        return tables
+
+    def _sample(self, conn: sqlite3.Connection, table: str, column: ColumnInfo) -> Optional[List[str]]:
+        """All distinct values of a text column with at most max_distinct of them, else None"""
+        if column.name.upper().endswith("_ID") or column.type.upper() not in ("", "TEXT"):
+            return None
+        try:
+            values = [value for (value,) in conn.execute(
+                f"SELECT DISTINCT {_quote(column.name)} FROM {_quote(table)} "
+                f"WHERE {_quote(column.name)} IS NOT NULL LIMIT ?", (self.max_distinct + 1,))]
+        except sqlite3.Error as e:
+            logger.warning("Could not sample %s.%s: %s", table, column.name, e)
+            return None
+        if not values or len(values) > self.max_distinct:
+            return None
+        if not all(isinstance(value, str) and len(value) <= self.max_value_length for value in values):
+            return None
+        return sorted(values)
+
+
+def _link_shared_ids(tables: Dict[str, TableInfo]):
+    """Joins both ways on *_ID columns with the same name (covers tables schema.sql does not describe)"""
+    ids: Dict[str, List[str]] = {}
+    for table in tables.values():
+        for column in table.columns:
+            if column.name.upper().endswith("_ID"):
+                ids.setdefault(column.name, []).append(table.name)
+    for column, names in ids.items():
+        for name in names:
+            known = {(own, target) for own, target, _ in tables[name].links}
+            tables[name].links += [(column, other, column) for other in names
+                                   if other != name and (column, other) not in known]
+
+
+def _relevant_columns(table: TableInfo, words: Set[str], subjects: Set[str]) -> List[ColumnInfo]:
+    """
+    Columns the question names: a specific word of the column name (words of
+    table names like 'claim' and generic ones like 'amount' only count in
+    pairs, e.g. 'claim amount'), or one of the column's values ('Active', 'North')
+    """
+    relevant = []
+    for column in table.columns:
+        hits = words & column.tokens
+        specific = hits - GENERIC_TERMS - subjects
+        if specific or len(hits) >= 2 or (words & column.value_tokens) - GENERIC_TERMS:
+            relevant.append(column)
+    return relevant
+
+
+def select_schema(tables: Dict[str, TableInfo], text: str) -> List[Tuple[TableInfo, Optional[List[ColumnInfo]]]]:
+    """
+    Local matcher: the tables relevant to `text` with their relevant columns
+    (None = all of them). A table matches through its name, its description
+    or its columns. Tables scoring half of the best one or less are left out,
+    unless they are joined to a selected table and have a matching column
+    (claims by region: Region comes from the policies). Without any match
+    every table is returned whole.
+    """
+    words = _words(text)
+    subjects = set().union(*(table.tokens for table in tables.values()))
+    scored = []
+    for table in tables.values():
+        columns = _relevant_columns(table, words, subjects)
+        name_hits = len((words & table.tokens) - GENERIC_TERMS)
+        score = 3 * name_hits + 2 * len(columns) + len((words & table.description_tokens) - GENERIC_TERMS - subjects)
+        if score:
+            # Named as a whole ("show all claims"): every column
+            scored.append((score, table, columns or None))
+    if not scored:
+        return [(table, None) for table in tables.values()]
+
+    best = max(score for score, _, _ in scored)
+    names = {table.name for score, table, _ in scored if score * 2 > best}
+    joined = {target for name in names for _, target, _ in tables[name].links}
+    joined |= {table.name for table in tables.values() for _, target, _ in table.links if target in names}
+    names |= {table.name for _, table, columns in scored if columns and table.name in joined}
+    selected = [(table, columns) for _, table, columns in scored if table.name in names]
+    result = []
+    for table, columns in selected:
+        if columns is not None:
+            # Keys to look rows up and join on come along with the matched columns
+            keys = {column.name for column in table.columns if column.primary_key}
+            keys |= {column for column, target, _ in table.links if target in names}
+            keys |= {target_column for other, _ in selected for _, target, target_column in other.links
+                     if target == table.name}
+            columns = [column for column in table.columns if column in columns or column.name in keys]
+        result.append((table, columns))
+    return result
+
+
+def render_schema(selection: List[Tuple[TableInfo, Optional[List[ColumnInfo]]]], sliced: bool) -> str:
+    """CREATE TABLE statements of the selected tables and columns (other columns by name only), then the joins"""
+    names = {table.name for table, _ in selection}
+    joins: List[str] = []
+    header = ("Generated from the live database and limited to the tables and columns relevant to this "
+              "request; other columns of a table are listed by name." if sliced
+              else "Generated from the live database.")
+    parts = [header]
+    for table, columns in selection:
+        shown = columns if columns is not None else table.columns
+        lines = []
+        for i, column in enumerate(shown):
+            line = f"    {column.name} {column.type}".rstrip() + (" PRIMARY KEY" if column.primary_key else "")
+            line += "," if i < len(shown) - 1 else ""
+            note = column.note()
+            lines.append(f"{line}  -- {note}" if note else line)
+        block = [f"### {table.name}"]
+        if table.description:
+            block.append(table.description)
+        block.append("```sql\nCREATE TABLE " + table.name + " (\n" + "\n".join(lines) + "\n);\n```")
+        others = [column.name for column in table.columns if column not in shown]
+        if others:
+            block.append(f"Other columns: {', '.join(others)}")
+        parts.append("\n".join(block))
+        for column, target, target_column in table.links:
+            join = f"{table.name}.{column} = {target}.{target_column}"
+            if target in names and f"{target}.{target_column} = {table.name}.{column}" not in joins:
+                joins.append(join)
+    if joins:
+        parts.append("Joins: " + "; ".join(joins))
+    return "\n\n".join(parts)
+
+
+def render_overview(selection: List[Tuple[TableInfo, Optional[List[ColumnInfo]]]]) -> str:
+    """One line per selected table, plus the known values of its relevant columns"""
+    lines = []
+    for table, columns in selection:
+        lines.append(f"- {table.name}: {table.summary()}")
+        values = [f"{column.name} {column.note()}" for column in (columns or []) if column.values]
+        if values:
+            lines.append(f"  Values: {'; '.join(values)}")
+    return "\n".join(lines)
+
+
+def context_text(messages: Iterable[Any], max_messages: int) -> str:
+    """The last user messages, oldest first: follow-ups like 'and for that region?' keep their context"""
+    texts = [content_text(message.content) for message in messages if isinstance(message, HumanMessage)]
+    return "\n".join(texts[-max_messages:])
+
+
+class SchemaPrompts:
+    """Fills the schema placeholders of agent prompts for the conversation at hand"""
+
+    def __init__(self, catalog: Optional[SchemaCatalog] = None):
+        self._catalog = catalog
+
+    @property
+    def catalog(self) -> SchemaCatalog:
+        # Built lazily so importing the graph does not touch the database
+        if self._catalog is None:
+            self._catalog = SchemaCatalog(max_distinct=settings.SCHEMA_VALUE_MAX_DISTINCT)
+        return self._catalog
+
+    def selection(self, text: str) -> List[Tuple[TableInfo, Optional[List[ColumnInfo]]]]:
+        return self._select(self.catalog.tables(), text)
+
+    @staticmethod
+    def _select(tables: Dict[str, TableInfo], text: str) -> List[Tuple[TableInfo, Optional[List[ColumnInfo]]]]:
+        if not settings.SCHEMA_PROMPT_SLICING:
+            return [(table, None) for table in tables.values()]
+        return select_schema(tables, text)
+
+    def render(self, prompt: str, messages: Iterable[Any]) -> str:
+        if SCHEMA_MARKER not in prompt and OVERVIEW_MARKER not in prompt:
+            return prompt
+        return self._fill(prompt, messages, self.catalog.tables())
+
+    async def arender(self, prompt: str, messages: Iterable[Any]) -> str:
+        """render for the event loop: never loads the catalog on it"""
+        if SCHEMA_MARKER not in prompt and OVERVIEW_MARKER not in prompt:
+            return prompt
+        return self._fill(prompt, messages, await self.catalog.atables())
+
+    def _fill(self, prompt: str, messages: Iterable[Any], tables: Dict[str, TableInfo]) -> str:
+        selection = self._select(tables, context_text(messages, settings.SCHEMA_CONTEXT_MESSAGES))
+        logger.debug("Schema prompt tables: %s", [table.name for table, _ in selection])
+        sliced = len(selection) < len(tables) or any(columns is not None for _, columns in selection)
+        return (prompt.replace(SCHEMA_MARKER, render_schema(selection, sliced))
+                .replace(OVERVIEW_MARKER, render_overview(selection)))
+
+
+class SchemaPromptMiddleware(AgentMiddleware):
+    """Fills the schema placeholders of the agent's system prompt before every model call"""
+
+    def wrap_model_call(self, request: Any, handler: Callable) -> Any:
+        prompt = schema_prompts.render(request.system_prompt or "", request.messages)
+        return handler(replace(request, system_prompt=prompt))
+
+    async def awrap_model_call(self, request: Any, handler: Callable) -> Any:
+        prompt = await schema_prompts.arender(request.system_prompt or "", request.messages)
+        return await handler(replace(request, system_prompt=prompt))
+
+
+schema_prompts = SchemaPrompts()
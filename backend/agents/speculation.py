@@ -0,0 +1,126 @@
+import time
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from langchain_core.callbacks import AsyncCallbackHandler, BaseCallbackManager
+from langchain_core.runnables import RunnableConfig, ensure_config, patch_config
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCallCounter(AsyncCallbackHandler):
+    """Counts chat model calls made under the runs it is attached to"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, **kwargs: Any):
+        self.calls += 1
+
+
+def with_callback(config: Optional[RunnableConfig], handler: Any) -> RunnableConfig:
+    """`config` (the current run's when None) with `handler` added to its callbacks"""
+    config = ensure_config(config)
+    callbacks = config.get("callbacks")
+    if isinstance(callbacks, BaseCallbackManager):
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler)
+    else:
+        callbacks = [*(callbacks or []), handler]
+    return patch_config(config, callbacks=callbacks)
+
+
+class SpeculationStats:
+    """
+    Thread-safe counters for speculative work: how often it was used or thrown
+    away, the LLM calls wasted on discarded work and the latency it saved
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.started = 0
+            self.used = 0
+            self.cancelled = 0
+            self.wasted_completed = 0  # finished before being discarded
+            self.wasted_llm_calls = 0
+            self.wasted_s = 0.0
+            self.saved_s = 0.0
+
+    def record_start(self):
+        with self._lock:
+            self.started += 1
+
+    def record_used(self, saved_s: float):
+        with self._lock:
+            self.used += 1
+            self.saved_s += saved_s
+
+    def record_wasted(self, completed: bool, llm_calls: int, elapsed_s: float):
+        with self._lock:
+            self.cancelled += 1
+            self.wasted_completed += int(completed)
+            self.wasted_llm_calls += llm_calls
+            self.wasted_s += elapsed_s
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started": self.started,
+                "used": self.used,
+                "cancelled": self.cancelled,
+                "wasted_completed": self.wasted_completed,
+                "wasted_llm_calls": self.wasted_llm_calls,
+                "wasted_s": round(self.wasted_s, 3),
+                "saved_s": round(self.saved_s, 3),
+            }
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    """
+    Work started before it is known to be needed. The coroutine receives the
+    parent run's config (its usage, tracing and streaming callbacks) with a
+    counter of its LLM calls added; take() waits for and returns its result,
+    discard() cancels it and records the waste.
+    """
+
+    def __init__(self, run: Callable[[RunnableConfig], Awaitable[Any]], config: Optional[RunnableConfig] = None,
+                 stats: SpeculationStats = speculation_stats):
+        self.stats = stats
+        self.counter = LLMCallCounter()
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+        self.task = asyncio.create_task(run(with_callback(config, self.counter)))
+        self.task.add_done_callback(self._finished)
+        stats.record_start()
+
+    def _finished(self, task: asyncio.Task):
+        self.finished_at = time.perf_counter()
+
+    async def take(self) -> Any:
+        # Latency saved: the part of the speculative work that overlapped the decision
+        overlap = (self.finished_at or time.perf_counter()) - self.started_at
+        result = await self.task
+        self.stats.record_used(overlap)
+        return result
+
+    async def discard(self):
+        completed = self.task.done()
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug("Discarded speculative work failed: %s", e)
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        self.stats.record_wasted(completed, self.counter.calls, elapsed)
+        logger.info("Speculative work discarded after %.0f ms (%d LLM calls)", elapsed * 1000, self.counter.calls)
@@ -0,0 +1,285 @@
+import os
+import re
+import json
+import math
+import time
+import atexit
+import logging
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Protocol, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage
+
+from core.settings import settings
+from database.database import InsuranceDatabase, db
+from .profiles.query_agent.tools import execute_query
+
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# String literals and numbers in SQL, used to guard similarity matches
+_SQL_LITERAL = re.compile(r"'((?:[^']|'')*)'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation (except in numbers) and collapse whitespace"""
+    text = question.lower().replace("$", "").replace(",", "")
+    text = re.sub(r"[^\w\s.]|(?<!\d)\.|\.(?!\d)", " ", text)
+    return " ".join(text.split())
+
+
+@dataclass
+class MemoHit:
+    question: str
+    sql: str
+    score: float  # 1.0 for exact matches
+
+
+class SqlMemo(Protocol):
+    def lookup(self, question: str) -> Optional[MemoHit]:
+        ...
+
+    def remember(self, question: str, sql: str):
+        ...
+
+    def forget(self, question: str):
+        ...
+
+
+def _char_ngrams(text: str, n: int = 3) -> Counter:
+    padded = f" {text} "
+    return Counter(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+class JsonSqlMemo:
+    """
+    Maps normalized questions to the SQL that last answered them, persisted to a JSON file.
+    Lookups are exact after normalization, with optional character n-gram TF-IDF
+    similarity matching. Entries recorded under a different schema are discarded.
+    Changes are written to the file by a background timer `flush_delay_s` after
+    the first unsaved change (and at exit), never by the caller.
+    """
+
+    def __init__(self, path: Path, database: InsuranceDatabase = db, max_entries: int = 2000,
+                 similarity: bool = False, similarity_threshold: float = 0.9, flush_delay_s: float = 2.0):
+        self.path = Path(path)
+        self.database = database
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.similarity_threshold = similarity_threshold
+        self.flush_delay_s = flush_delay_s
+        self._lock = threading.Lock()
+        self._flush_timer: Optional[threading.Timer] = None
+        self._file_lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._vectors: Optional[Dict[str, Dict[str, float]]] = None
+        self._idf: Dict[str, float] = {}
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._load()
+        atexit.register(self.flush)
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                self._entries = json.load(file).get("entries", {})
+            logger.info("SQL memo loaded %d entries from %s", len(self._entries), self.path)
+        except (OSError, ValueError) as e:
+            logger.warning("SQL memo file %s unreadable, starting empty: %s", self.path, e)
+            self._entries = {}
+
+    def _save_locked(self):
+        """Schedules a background flush of the entries (one per flush_delay_s at most)"""
+        if self._flush_timer is None:
+            self._flush_timer = threading.Timer(self.flush_delay_s, self.flush)
+            self._flush_timer.daemon = True
+            self._flush_timer.start()
+
+    def flush(self):
+        """Writes pending changes to the file"""
+        with self._lock:
+            if self._flush_timer is None:
+                return
+            self._flush_timer.cancel()
+            self._flush_timer = None
+            # Entries are replaced, never mutated: a shallow copy is a consistent snapshot
+            entries = dict(self._entries)
+
+        tmp_path = self.path.with_suffix(".tmp")
+        with self._file_lock:
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as file:
+                    json.dump({"entries": entries}, file, separators=(",", ":"))
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning("SQL memo could not be saved to %s: %s", self.path, e)
+
+    def _build_index_locked(self):
+        ngrams = {key: _char_ngrams(key) for key in self._entries}
+        document_frequency = Counter(gram for grams in ngrams.values() for gram in grams)
+        total = len(ngrams)
+        self._idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        self._vectors = {key: self._vectorize(grams) for key, grams in ngrams.items()}
+
+    def _vectorize(self, grams: Counter) -> Dict[str, float]:
+        vector = {gram: count * self._idf.get(gram, 1.0) for gram, count in grams.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values())) or 1.0
+        return {gram: value / norm for gram, value in vector.items()}
+
+    @staticmethod
+    def _literals_match(question: str, sql: str) -> bool:
+        """A similar question may only reuse SQL whose filter values and numbers it mentions itself"""
+        literals = {literal.replace("''", "'").lower() for literal in _SQL_LITERAL.findall(sql)}
+        if any(normalize_question(literal) not in question for literal in literals):
+            return False
+        return set(_NUMBER.findall(question)) <= set(_NUMBER.findall(sql))
+
+    def lookup(self, question: str) -> Optional[MemoHit]:
+        key = normalize_question(question)
+        schema = self.database.schema_fingerprint()
+
+        with self._lock:
+            stale = [k for k, entry in self._entries.items() if entry["schema"] != schema]
+            if stale:
+                for k in stale:
+                    del self._entries[k]
+                self._vectors = None
+                self._save_locked()
+                logger.info("SQL memo dropped %d entries after a schema change", len(stale))
+
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.hits += 1
+                return MemoHit(question=key, sql=entry["sql"], score=1.0)
+
+            if self.similarity and self._entries:
+                if self._vectors is None:
+                    self._build_index_locked()
+                vector = self._vectorize(_char_ngrams(key))
+                best_key, best_score = None, 0.0
+                for candidate, candidate_vector in self._vectors.items():
+                    score = sum(value * candidate_vector.get(gram, 0.0) for gram, value in vector.items())
+                    if score > best_score:
+                        best_key, best_score = candidate, score
+                if best_score >= self.similarity_threshold:
+                    sql = self._entries[best_key]["sql"]
+                    if self._literals_match(key, sql):
+                        self.similar_hits += 1
+                        return MemoHit(question=best_key, sql=sql, score=round(best_score, 3))
+
+            self.misses += 1
+            return None
+
+    def remember(self, question: str, sql: str):
+        key = normalize_question(question)
+        entry = {"sql": sql, "schema": self.database.schema_fingerprint(), "updated_at": time.time()}
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            # Dicts keep insertion order: drop the least recently stored entries
+            while len(self._entries) > self.max_entries:
+                del self._entries[next(iter(self._entries))]
+            self._vectors = None
+            self._save_locked()
+
+    def forget(self, question: str):
+        key = normalize_question(question)
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._vectors = None
+                self._save_locked()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "similar_hits": self.similar_hits,
+                "misses": self.misses,
+            }
+
+
+def _tool_output(message: ToolMessage) -> Dict[str, Any]:
+    content = message.content
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            return {}
+    return content if isinstance(content, dict) else {}
+
+
+def last_successful_sql(messages: Sequence[BaseMessage]) -> Optional[str]:
+    """SQL of the last execute_query call in an agent run that returned query_successful"""
+    calls: Dict[str, str] = {}
+    sql = None
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for call in message.tool_calls:
+                if call["name"] == "execute_query":
+                    calls[call["id"]] = call["args"].get("sql_query")
+        elif isinstance(message, ToolMessage) and message.tool_call_id in calls:
+            if _tool_output(message).get("query_successful"):
+                sql = calls[message.tool_call_id]
+    return sql
+
+
+async def answer_from_memo(question: str) -> Optional[str]:
+    """
+    Runs the memoized SQL for a question through execute_query and returns the
+    query agent's JSON envelope, or None when there is no usable memo entry.
+    """
+    if sql_memo is None:
+        return None
+
+    hit = sql_memo.lookup(question)
+    if hit is None:
+        return None
+
+    result = await execute_query.ainvoke({"sql_query": hit.sql})
+    if not result["query_successful"]:
+        logger.info("SQL MEMO entry failed, forgetting it: %s", result["error"])
+        sql_memo.forget(hit.question)
+        return None
+
+    logger.info("SQL MEMO HIT (score %s): %s", hit.score, hit.sql)
+    output = {key: value for key, value in result.items()
+              if key not in ("query_successful", "execution_time_ms", "metadata", "error")}
+    return json.dumps({
+        "question": question,
+        "sql_query": hit.sql,
+        "output": output if result["record_count"] else "No data found",
+    }, default=str)
+
+
+def remember_sql(question: str, messages: List[BaseMessage]):
+    """Stores the SQL that answered a question, taken from the query agent's messages"""
+    if sql_memo is None:
+        return
+
+    sql = last_successful_sql(messages)
+    if sql:
+        sql_memo.remember(question, sql)
+
+
+def _memo_path() -> Path:
+    path = Path(settings.SQL_MEMO_PATH)
+    return path if path.is_absolute() else BACKEND_DIR / path
+
+
+sql_memo: Optional[SqlMemo] = JsonSqlMemo(
+    _memo_path(),
+    max_entries=settings.SQL_MEMO_MAX_ENTRIES,
+    similarity=settings.SQL_MEMO_SIMILARITY_ENABLED,
+    similarity_threshold=settings.SQL_MEMO_SIMILARITY_THRESHOLD,
+    flush_delay_s=settings.SQL_MEMO_FLUSH_DELAY_S,
+) if settings.SQL_MEMO_ENABLED else None
@@ -0,0 +1,110 @@
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+
+from agents.llm import run_model_id
+from core.tracing import RequestContext, tracer
+
+# Pending span: kind, name, span id, parent span id, wall-clock start, perf counter start, attributes, request
+_Pending = Tuple[str, str, str, Optional[str], float, float, Dict[str, Any], Optional[RequestContext]]
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Turns graph runs into tracer spans: one per graph node invocation, per chat
+    model call (named by model id) and per tool call. The request context is
+    captured when the run starts, so spans stay tied to their request even if
+    the run ends elsewhere. Spans nest through the run tree: every run maps to
+    the span of its nearest traced ancestor, the top-level run to the span open
+    in the caller's context (the turn).
+    """
+
+    run_inline = True
+
+    def __init__(self):
+        self._pending: Dict[UUID, _Pending] = {}
+        # Every live run -> span id its children nest under
+        self._span_of: Dict[UUID, Optional[str]] = {}
+
+    def _parent_span(self, parent_run_id: Optional[UUID]) -> Optional[str]:
+        if parent_run_id is None:
+            return tracer.current_span_id()
+        return self._span_of.get(parent_run_id)
+
+    def _enter(self, run_id: UUID, parent_run_id: Optional[UUID]):
+        """Tracks an untraced run, so its children nest under its nearest traced ancestor"""
+        self._span_of[run_id] = self._parent_span(parent_run_id)
+
+    def _start(self, run_id: UUID, parent_run_id: Optional[UUID], kind: str, name: str, **attributes: Any):
+        span_id = uuid.uuid4().hex[:16]
+        parent_id = self._parent_span(parent_run_id)
+        self._span_of[run_id] = span_id
+        self._pending[run_id] = (kind, name, span_id, parent_id, time.time(), time.perf_counter(),
+                                 attributes, tracer.current_request())
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any):
+        self._span_of.pop(run_id, None)
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        kind, name, span_id, parent_id, start, started, span_attributes, request = pending
+        span_attributes.update(attributes)
+        if error is not None:
+            span_attributes["error"] = f"{type(error).__name__}: {error}"
+        tracer.record(kind, name, start, (time.perf_counter() - started) * 1000,
+                      status="error" if error is not None else "ok", attributes=span_attributes,
+                      span_id=span_id, parent_id=parent_id, request=request)
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                       **kwargs: Any):
+        # A node invocation is the chain run named after the graph node it runs in
+        name = kwargs.get("name")
+        if metadata and name and metadata.get("langgraph_node") == name:
+            self._start(run_id, parent_run_id, "node", name, step=metadata.get("langgraph_step"))
+        else:
+            self._enter(run_id, parent_run_id)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, metadata: Optional[Dict[str, Any]] = None,
+                            tags: Optional[List[str]] = None, **kwargs: Any):
+        self._start(run_id, parent_run_id, "llm", run_model_id(metadata, kwargs),
+                    node=(metadata or {}).get("langgraph_node"), tags=tags or [],
+                    messages=sum(len(batch) for batch in messages))
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        usage = {}
+        generations = getattr(response, "generations", None) or []
+        if generations and generations[0]:
+            message = getattr(generations[0][0], "message", None)
+            usage = getattr(message, "usage_metadata", None) or {}
+        self._end(run_id, **({"usage": dict(usage)} if usage else {}))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, error)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any):
+        self._start(run_id, parent_run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, error)
+
+
+tracing_handler = TracingCallbackHandler()
+
+
+def tracing_config() -> Dict[str, Any]:
+    """Run config that attaches the tracing callbacks (empty when tracing is off)"""
+    return {"callbacks": [tracing_handler]} if tracer.enabled else {}
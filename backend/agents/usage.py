@@ -0,0 +1,215 @@
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import replace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain.agents.middleware import AgentMiddleware, hook_config
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import AIMessage, ToolMessage
+
+from agents.llm import run_model_id
+from utils.message_utils import message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Appended to the system prompt once tool calls are no longer affordable
+BUDGET_NOTE = ("The usage budget for this request is nearly spent: do not call any more tools, "
+               "answer now with the information gathered so far.")
+# Model calls kept back when tools are cut off: the query agent's and the root agent's final answers
+TOOL_RESERVE_CALLS = 2
+
+
+class UsageBudgetExceeded(Exception):
+    """A model call was attempted after the request's budget was spent"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TurnUsage:
+    """
+    LLM usage of one chat turn across every model it calls (root agent,
+    query agent and the nested query_agent_tool run), with optional budgets
+    on model calls and tokens (0 = unlimited).
+    """
+
+    def __init__(self, max_calls: int = 0, max_tokens: int = 0):
+        self.max_calls = max_calls
+        self.max_tokens = max_tokens
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.estimated_calls = 0  # calls whose model reported no token counts
+        self.by_model: Dict[str, Dict[str, int]] = {}
+        self.budget_stop: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def start_call(self, model_id: str):
+        with self._lock:
+            self.calls += 1
+            self.by_model.setdefault(model_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0})["calls"] += 1
+
+    def add_tokens(self, model_id: str, input_tokens: int, output_tokens: int, estimated: bool = False):
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.estimated_calls += estimated
+            model = self.by_model.setdefault(model_id, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+            model["input_tokens"] += input_tokens
+            model["output_tokens"] += output_tokens
+
+    def exhausted(self, reserve_calls: int = 0) -> Optional[str]:
+        """Why the budget does not allow another call while keeping `reserve_calls` back, or None"""
+        if self.max_calls and self.calls >= self.max_calls - reserve_calls:
+            return f"{self.calls} of {self.max_calls} LLM calls used"
+        if self.max_tokens and self.total_tokens >= self.max_tokens:
+            return f"{self.total_tokens} of {self.max_tokens} tokens used"
+        return None
+
+    def stop(self, reason: str):
+        if self.budget_stop is None:
+            self.budget_stop = reason
+            logger.warning("USAGE BUDGET REACHED | %s", reason)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.total_tokens,
+                "estimated_calls": self.estimated_calls,
+                "by_model": {model: dict(counts) for model, counts in self.by_model.items()},
+                "budget_stop": self.budget_stop,
+            }
+
+
+def budget_answer(reason: str) -> str:
+    return ("I had to stop working on this request because it reached its usage limit "
+            f"({reason}). Please try a narrower or simpler question.")
+
+
+_usage: ContextVar[Optional[TurnUsage]] = ContextVar("turn_usage", default=None)
+
+
+def current_usage() -> Optional[TurnUsage]:
+    return _usage.get()
+
+
+@contextmanager
+def usage_scope(usage: TurnUsage) -> Iterator[TurnUsage]:
+    """Makes `usage` the turn usage seen by UsageBudgetMiddleware in this context"""
+    token = _usage.set(usage)
+    try:
+        yield usage
+    finally:
+        try:
+            _usage.reset(token)
+        except ValueError:
+            # An async generator (streaming turn) was closed from another context
+            pass
+
+
+class UsageCallbackHandler(BaseCallbackHandler):
+    """
+    Counts model calls and tokens of every run it is attached to into a TurnUsage.
+    Token counts come from the models' usage metadata, estimated from text when
+    a model reports none. Starting a call beyond the budget raises
+    UsageBudgetExceeded (a backstop for model calls outside agent loops).
+    """
+
+    run_inline = True
+    raise_error = True
+
+    def __init__(self, usage: TurnUsage):
+        self.usage = usage
+        self._pending: Dict[UUID, tuple] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        reason = self.usage.exhausted()
+        if reason:
+            self.usage.stop(reason)
+            raise UsageBudgetExceeded(reason)
+        model_id = run_model_id(metadata, kwargs)
+        self.usage.start_call(model_id)
+        prompt_tokens = sum(message_tokens(m) for batch in messages for m in batch)
+        self._pending[run_id] = (model_id, prompt_tokens)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        pending = self._pending.pop(run_id, None)
+        if pending is None:
+            return
+        model_id, prompt_tokens = pending
+        generations = getattr(response, "generations", None) or []
+        message = getattr(generations[0][0], "message", None) if generations and generations[0] else None
+        usage = getattr(message, "usage_metadata", None)
+        if usage:
+            self.usage.add_tokens(model_id, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+            return
+        output_tokens = message_tokens(message) if message is not None else 0
+        self.usage.add_tokens(model_id, prompt_tokens, output_tokens, estimated=True)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._pending.pop(run_id, None)
+
+
+class UsageBudgetMiddleware(AgentMiddleware):
+    """
+    Stops an agent's model/tool loop gracefully when the turn's budget runs low:
+    - tool calls are answered with a budget note instead of running, and the
+      model is told to answer with what it has
+    - once no model call is left (keeping `reserve_calls` back for the agents
+      that still have to answer), the agent ends with a budget answer
+    """
+
+    def __init__(self, reserve_calls: int = 0):
+        super().__init__()
+        self.reserve_calls = reserve_calls
+
+    @hook_config(can_jump_to=["end"])
+    def before_model(self, state: Any, runtime: Any) -> Optional[Dict[str, Any]]:
+        usage = current_usage()
+        reason = usage.exhausted(self.reserve_calls) if usage else None
+        if not reason:
+            return None
+        usage.stop(reason)
+        return {"messages": [AIMessage(content=budget_answer(reason))], "jump_to": "end"}
+
+    @staticmethod
+    def _tools_exhausted() -> Optional[str]:
+        usage = current_usage()
+        return usage.exhausted(TOOL_RESERVE_CALLS) if usage else None
+
+    def _with_note(self, request: Any) -> Any:
+        if not self._tools_exhausted():
+            return request
+        return replace(request, system_prompt=f"{request.system_prompt or ''}\n\n{BUDGET_NOTE}".strip())
+
+    def wrap_model_call(self, request: Any, handler: Callable) -> Any:
+        return handler(self._with_note(request))
+
+    async def awrap_model_call(self, request: Any, handler: Callable) -> Any:
+        return await handler(self._with_note(request))
+
+    def _skipped_tool(self, request: Any) -> Optional[ToolMessage]:
+        reason = self._tools_exhausted()
+        if not reason:
+            return None
+        current_usage().stop(reason)
+        call = request.tool_call
+        return ToolMessage(content=f"Tool call skipped: {BUDGET_NOTE}", tool_call_id=call["id"], name=call["name"])
+
+    def wrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        return self._skipped_tool(request) or handler(request)
+
+    async def awrap_tool_call(self, request: Any, handler: Callable) -> Any:
+        return self._skipped_tool(request) or await handler(request)
@@ -0,0 +1,78 @@
+"""
+Load check for POST /api/chatbot/chat/batch, in-process with a fake LLM.
+
+Sends one batch of distinct-session questions through the ASGI app and prints
+the per-item results count and the summary line (throughput, p50/p95 latency).
+
+Run from the backend directory:
+    python -m benchmarks.batch --items 500 --concurrency 32 --latency 0.1
+"""
+import os
+import sys
+import json
+import asyncio
+import logging
+import argparse
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import httpx
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory
+
+QUESTIONS = [
+    "How many policies do we have per region?",
+    "What is the total premium revenue by policy type?",
+    "Hello, what can you do?",
+]
+
+
+async def run(items: int, concurrency: int) -> dict:
+    import main
+
+    payload = {
+        "items": [
+            {"session_id": f"batch-{i}", "user_id": "bench_user", "input_query": QUESTIONS[i % len(QUESTIONS)]}
+            for i in range(items)
+        ],
+        "concurrency": concurrency,
+    }
+    results, summary = [], None
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async with client.stream("POST", "/api/chatbot/chat/batch", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                record = json.loads(line)
+                if "summary" in record:
+                    summary = record["summary"]
+                else:
+                    results.append(record)
+
+    assert len(results) == items, f"expected {items} results, got {len(results)}"
+    assert sorted(r["index"] for r in results) == list(range(items))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch endpoint throughput and latency")
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency))
+
+    summary = asyncio.run(run(args.items, args.concurrency))
+    print(json.dumps(summary, indent=2))
+    sys.exit(0 if summary and summary["failed"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
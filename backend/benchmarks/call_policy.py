@@ -0,0 +1,136 @@
+"""
+Benchmark for the LLM call policy (agents/call_policy.py): timeouts, retries and hedging.
+
+Calls a fake model whose latency has a slow tail (--slow-rate of calls take
+--slow-latency seconds) and that fails a share of calls with a transient
+503 error, under three policies:
+1. none: the bare model (errors reach the caller, slow calls are waited out)
+2. retry: per-attempt timeout plus retries with jittered backoff
+3. hedge: retry plus a duplicate request after the recent p90 latency
+
+Prints latency percentiles, failures and the policy counters of each run.
+
+Run from the backend directory:
+    python -m benchmarks.call_policy --calls 400 --concurrency 20 --slow-rate 0.05 --failure-rate 0.03
+"""
+import os
+import sys
+import time
+import random
+import asyncio
+import logging
+import argparse
+from dataclasses import replace
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+# The policy alone: with the LLM scheduler on, hedges would also need a free slot
+os.environ["LLM_SCHEDULER_ENABLED"] = "false"
+
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from agents.call_policy import CallPolicy, ResilientChatModel, policy_stats
+from benchmarks.fake_llm import FakeChatModel
+from utils.stats_utils import percentile
+
+MODEL_ID = "gemini-2.5-flash"
+
+
+class ServiceUnavailable(Exception):
+    """Stand-in for the provider's 503 error"""
+    code = 503
+
+
+class FlakyChatModel(FakeChatModel):
+    """FakeChatModel with a slow latency tail and injected transient failures"""
+    slow_rate: float = 0.0
+    slow_latency: float = 2.0
+    failure_rate: float = 0.0
+    seed: int = 0
+    rng: Any = None
+
+    def model_post_init(self, context: Any):
+        self.rng = random.Random(self.seed)
+
+    def _delay(self, messages: List[BaseMessage]) -> float:
+        if self.rng.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency * self.rng.uniform(0.7, 1.3)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        delay = self._delay(messages)
+        fails = self.rng.random() < self.failure_rate
+        await asyncio.sleep(delay / 4 if fails else delay)
+        if fails:
+            raise ServiceUnavailable("503 The model is overloaded. Please try again later.")
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+
+async def run(model, calls: int, concurrency: int) -> Dict[str, Any]:
+    pending = iter(range(calls))
+    latencies: List[float] = []
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        for i in pending:
+            start = time.perf_counter()
+            try:
+                await model.ainvoke(f"Hello, call {i}")
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {"elapsed_s": time.perf_counter() - start, "latencies": latencies, "failures": failures}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM call policy: timeouts, retries and hedging")
+    parser.add_argument("--calls", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.05, help="Typical seconds per call")
+    parser.add_argument("--slow-rate", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--failure-rate", type=float, default=0.03)
+    parser.add_argument("--timeout", type=float, default=0.5, help="Policy timeout per attempt")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+
+    retry = CallPolicy(timeout_s=args.timeout, max_retries=3, backoff_s=0.05, max_backoff_s=0.5)
+    policies = {
+        "none": None,
+        "retry": retry,
+        "hedge": replace(retry, hedge=True, hedge_percentile=90.0, hedge_min_samples=20,
+                         hedge_delay_s=args.latency * 2),
+    }
+    print(f"{args.calls} calls, concurrency {args.concurrency}: {args.latency * 1000:.0f} ms typical, "
+          f"{args.slow_rate:.0%} at {args.slow_latency}s, {args.failure_rate:.0%} failing with 503")
+    print(f"{'policy':<7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'failed':>7}  counters")
+    results = {}
+    for name, policy in policies.items():
+        flaky = FlakyChatModel(model_id=MODEL_ID, latency=args.latency, slow_rate=args.slow_rate,
+                               slow_latency=args.slow_latency, failure_rate=args.failure_rate, seed=7)
+        model = flaky if policy is None else ResilientChatModel(inner=flaky, model_id=MODEL_ID, policy=policy)
+        policy_stats.reset()
+        result = results[name] = asyncio.run(run(model, args.calls, args.concurrency))
+        latencies = result["latencies"]
+        counters = {k: v for k, v in policy_stats.snapshot().get(MODEL_ID, {}).items()
+                    if k in ("timeouts", "transient_errors", "retries", "failures", "hedges_fired", "hedges_won")}
+        print(f"{name:<7} {percentile(latencies, 50) * 1000:>8.1f} {percentile(latencies, 95) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {max(latencies) * 1000:>8.1f} {result['failures']:>7}  "
+              f"{counters if policy else ''}")
+
+    p99 = {name: percentile(result["latencies"], 99) for name, result in results.items()}
+    ok = (results["retry"]["failures"] < results["none"]["failures"]
+          and p99["retry"] < p99["none"] and p99["hedge"] <= p99["retry"])
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Concurrency check for the async chat path, using a fake LLM with artificial latency.
+
+Runs the turns with the LLM scheduler off, then on with its pools and queue
+sized for the load: the default pools (LLM_MAX_CONCURRENCY_BY_MODEL) cap the
+calls in flight per model and reject turns beyond LLM_QUEUE_MAX_DEPTH waiting
+calls, which is the provider-limit protection, not a limit of the chat path.
+
+Run from the backend directory:
+    python -m benchmarks.concurrency --requests 200 --latency 0.2
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+
+from agents.llm import set_llm_factory
+from agents.llm_scheduler import llm_scheduler
+from benchmarks.fake_llm import fake_llm_factory
+from core.settings import settings
+
+# graph1 data turn: root -> query_agent_tool(query -> execute_query -> query) -> root
+LLM_CALLS_PER_TURN = 4
+
+
+async def run(requests: int, latency: float) -> float:
+    from services.chatbot_service import ChatbotService
+
+    service = ChatbotService()
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(
+        service.process_message(
+            session_id=f"session-{i}",
+            user_id="bench_user",
+            user_input="How many policies do we have per region?",
+        )
+        for i in range(requests)
+    ))
+    elapsed = time.perf_counter() - start
+
+    assert len(responses) == requests
+    assert all(response.startswith("Here is what the data shows") for response in responses)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent chat turns against a fake LLM")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency))
+
+    single_turn = LLM_CALLS_PER_TURN * args.latency
+    serial = single_turn * args.requests
+    print(f"requests:          {args.requests}")
+    print(f"single turn (min): {single_turn:.2f}s")
+    print(f"serial estimate:   {serial:.2f}s")
+
+    # Unmeasured turn: graph build, database and schema catalog loads
+    asyncio.run(run(1, args.latency))
+
+    ok = True
+    for scheduler in (False, True):
+        llm_scheduler.enabled = scheduler
+        if scheduler:
+            # Every turn may have one call in flight per model
+            settings.LLM_MAX_CONCURRENCY_BY_MODEL = {model_id: args.requests
+                                                     for model_id in settings.LLM_MAX_CONCURRENCY_BY_MODEL}
+            settings.LLM_QUEUE_MAX_DEPTH = args.requests
+        llm_scheduler.reset()
+
+        elapsed = asyncio.run(run(args.requests, args.latency))
+        label = "scheduler on " if scheduler else "scheduler off"
+        print(f"{label}:     {elapsed:.2f}s concurrent, {args.requests / elapsed:.1f} turns/s")
+        # Turns must overlap: allow generous scheduling overhead but far less than serial execution
+        ok &= elapsed <= single_turn * 5
+
+    if not ok:
+        print("FAIL: chat turns did not run concurrently")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Stress benchmark for the InsuranceDatabase read pool.
+
+Runs many concurrent queries through aexecute_query_with_metadata (result cache
+disabled) for several pool sizes and reports throughput and latency percentiles.
+
+Run from the backend directory:
+    python -m benchmarks.db_pool --queries 400 --concurrency 64 --pool-sizes 1 4 8
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from database.database import BASE_DIR, InsuranceDatabase
+
+# Mix of agent-style aggregates plus a CPU-heavy statement so parallelism is visible
+QUERIES = [
+    "SELECT Region, COUNT(*) AS policy_count, SUM(Premium_Amount) AS total_premium "
+    "FROM insurance_policies WHERE Status = 'Active' GROUP BY Region",
+    "SELECT c.Claim_Type, COUNT(*) AS claims, SUM(c.Approved_Amount) AS approved "
+    "FROM insurance_claims c JOIN insurance_policies p ON c.Policy_ID = p.Policy_ID GROUP BY c.Claim_Type",
+    "SELECT Adjuster_ID, AVG(Processing_Days) AS avg_days FROM insurance_claims GROUP BY Adjuster_ID",
+    "WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n WHERE x < 50000) "
+    "SELECT COUNT(*) AS rows_scanned FROM n JOIN insurance_policies p ON p.Claim_Count = x % 4",
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run(pool_size: int, queries: int, concurrency: int):
+    database = InsuranceDatabase(BASE_DIR / "insurance.db")
+    database.cache = None
+    database.pool.size = pool_size
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await database.aexecute_query_with_metadata(QUERIES[i % len(QUERIES)])
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    elapsed = time.perf_counter() - start
+    database.pool.close()
+
+    print(f"pool={pool_size:<3} queries={queries} concurrency={concurrency} "
+          f"throughput={queries / elapsed:8.1f} q/s  "
+          f"p50={statistics.median(latencies):7.1f}ms  p95={percentile(latencies, 95):7.1f}ms  "
+          f"max={max(latencies):7.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent query stress test against insurance.db")
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    for pool_size in args.pool_sizes:
+        asyncio.run(run(pool_size, args.queries, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import re
+import time
+import json
+import uuid
+import zlib
+import asyncio
+from typing import Any, AsyncIterator, Callable, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from utils.message_utils import content_text, message_tokens
+
+# Responder signature: (model_id, messages) -> AIMessage
+Responder = Callable[[str, List[BaseMessage]], AIMessage]
+
+QUERY_MODEL_MARKER = "pro"
+FIXED_SQL = "SELECT Region, COUNT(*) AS policy_count FROM insurance_policies GROUP BY Region"
+# Canned SQL for questions containing the keyword (first match wins), FIXED_SQL otherwise
+CANNED_SQL = [
+    ("premium", "SELECT Policy_Type, SUM(Premium_Amount) AS total_premium FROM insurance_policies GROUP BY Policy_Type"),
+    ("agent", "SELECT Agent_ID, COUNT(*) AS active_policies FROM insurance_policies "
+              "WHERE Status = 'Active' GROUP BY Agent_ID ORDER BY active_policies DESC LIMIT 5"),
+    ("approval", "SELECT Claim_Type, SUM(CASE WHEN Status = 'Approved' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) "
+                 "AS approval_rate FROM insurance_claims GROUP BY Claim_Type"),
+    ("claim", "SELECT p.Region, SUM(c.Claim_Amount) AS total_claims FROM insurance_claims c "
+              "JOIN insurance_policies p ON p.Policy_ID = c.Policy_ID GROUP BY p.Region"),
+]
+ROUTING_MARKER = 'Respond ONLY: "query_agent" or "answer_directly"'
+POST_PROCESSING_MARKER = "Based on the query results below"
+DIRECT_ANSWER_PREFIXES = ("hello", "hi", "thanks", "thank you", "explain", "what is a ", "what does")
+
+
+def is_data_question(text: str) -> bool:
+    return not text.strip().lower().startswith(DIRECT_ANSWER_PREFIXES)
+
+
+def sql_for(question: str) -> str:
+    lowered = question.lower()
+    return next((sql for keyword, sql in CANNED_SQL if keyword in lowered), FIXED_SQL)
+
+
+def _last_user_text(messages: List[BaseMessage]) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return content_text(msg.content)
+    return ""
+
+
+def _tool_call(name: str, args: dict) -> AIMessage:
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": name, "args": args, "id": f"call_{uuid.uuid4().hex[:12]}"}],
+    )
+
+
+def insurance_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    """
+    Deterministic stand-in for the Gemini agents in graph.py / graph1.py.
+    Query model (gemini-2.5-pro): calls execute_query once with the canned SQL for the question
+    (sql_for), then returns the JSON envelope.
+    Root model: answers routing prompts, delegates data questions to query_agent_tool and summarizes tool results.
+    """
+    last = messages[-1]
+    last_text = content_text(last.content)
+    question = _last_user_text(messages)
+
+    if QUERY_MODEL_MARKER in model_id:
+        if isinstance(last, ToolMessage):
+            return AIMessage(content=json.dumps({
+                "question": question,
+                "sql_query": sql_for(question),
+                "output": last_text,
+            }))
+        return _tool_call("execute_query", {"sql_query": sql_for(question)})
+
+    if ROUTING_MARKER in last_text:
+        routed_question = last_text.split("User:", 1)[-1]
+        return AIMessage(content="query_agent" if is_data_question(routed_question) else "answer_directly")
+
+    if isinstance(last, ToolMessage) or POST_PROCESSING_MARKER in last_text:
+        results = last_text.split("Query Results:", 1)[-1].strip()
+        return AIMessage(content=f"Here is what the data shows: {results[:200]}")
+
+    if is_data_question(question):
+        return _tool_call("query_agent_tool", {"user_request": question})
+
+    return AIMessage(content="Hello! I can help you explore insurance policies and claims.")
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Scripted chat model with artificial latency.
+    Stands in for ChatGoogleGenerativeAI so graphs can run offline.
+    latency is paid before the first token, token_latency between streamed tokens.
+    jitter adds up to +/- that fraction of latency, derived from the prompt so
+    identical runs wait identically.
+    """
+    model_id: str
+    latency: float = 0.0
+    jitter: float = 0.0
+    token_latency: float = 0.0
+    responder: Responder = insurance_script
+    call_count: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        # Reported as invocation params, so traces and callbacks see the model id
+        return {"model_id": self.model_id}
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "FakeChatModel":
+        # The script decides which tool to call, bound tools are not needed
+        return self
+
+    def _delay(self, messages: List[BaseMessage]) -> float:
+        if not self.jitter or not self.latency:
+            return self.latency
+        seed = zlib.crc32("".join(content_text(m.content) for m in messages[-2:]).encode("utf-8"))
+        return self.latency * (1 + self.jitter * ((seed % 2001) / 1000 - 1))
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        self.call_count += 1
+        message = self.responder(self.model_id, messages)
+        # Token counts as a provider would report them (estimated from text)
+        input_tokens = sum(message_tokens(m) for m in messages)
+        output_tokens = message_tokens(message)
+        message.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                  "total_tokens": input_tokens + output_tokens}
+        return message
+
+    @staticmethod
+    def _chunks(message: AIMessage) -> List[AIMessageChunk]:
+        if message.tool_calls:
+            chunks = [AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ])]
+        else:
+            chunks = [AIMessageChunk(content=token) for token in re.split(r"(\s)", message.content) if token]
+        # Usage is reported once, on the last chunk
+        chunks = chunks or [AIMessageChunk(content="")]
+        chunks[-1].usage_metadata = message.usage_metadata
+        return chunks
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay(messages))
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._delay(messages))
+        for chunk in self._chunks(self._next_message(messages)):
+            if run_manager and chunk.content:
+                run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._delay(messages))
+        for chunk in self._chunks(self._next_message(messages)):
+            if run_manager and chunk.content:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
+            await asyncio.sleep(self.token_latency)
+
+
+def fake_llm_factory(latency: float = 0.0, token_latency: float = 0.0,
+                     responder: Responder = insurance_script, jitter: float = 0.0):
+    """Returns an LLM factory for agents.llm.set_llm_factory"""
+    def factory(model_id: str) -> FakeChatModel:
+        return FakeChatModel(model_id=model_id, latency=latency, token_latency=token_latency,
+                             responder=responder, jitter=jitter)
+    return factory
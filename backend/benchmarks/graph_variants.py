@@ -0,0 +1,98 @@
+"""
+Compares LLM calls and end-to-end latency of the agent graphs on a fixed question
+set, using the scripted fake LLM with a fixed latency per call.
+
+    graph              route call + answer call (or query agent + post-processing call)
+    graph1             root agent with the query agent as a tool
+    graph_single_call  one root call that answers or requests the query agent
+
+The SQL memo is disabled so every run does the same work.
+
+Run from the backend directory:
+    python -m benchmarks.graph_variants --latency 0.1
+    python -m benchmarks.graph_variants --no-fast-router
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Dict, List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory, insurance_script, is_data_question
+
+GRAPHS = ("graph", "graph1", "graph_single_call")
+
+QUESTIONS = [
+    "How many policies do we have per region?",
+    "What is the total premium revenue by policy type?",
+    "Which agents manage the most active policies?",
+    "Show me policies expiring in the next 30 days",
+    "What is the average claim amount by claim type?",
+    "Hello, what can you do?",
+    "Thanks, that was helpful",
+    "Explain the difference between premium and coverage",
+    "What is a deductible?",
+    "Hi there",
+]
+
+llm_calls = 0
+
+
+def counting_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    global llm_calls
+    llm_calls += 1
+    return insurance_script(model_id, messages)
+
+
+async def run_graph(name: str) -> Dict[str, List[float]]:
+    global llm_calls
+    from agents.registry import get_graph
+
+    graph = get_graph(name)
+    results: Dict[str, List[float]] = {"data_calls": [], "data_ms": [], "direct_calls": [], "direct_ms": []}
+    for question in QUESTIONS:
+        kind = "data" if is_data_question(question) else "direct"
+        llm_calls = 0
+        start = time.perf_counter()
+        await graph.ainvoke({
+            "messages": [HumanMessage(content=question)],
+            "session_id": "bench", "user_id": "bench_user", "next_agent": "",
+        })
+        results[f"{kind}_ms"].append((time.perf_counter() - start) * 1000)
+        results[f"{kind}_calls"].append(llm_calls)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM calls and latency per agent graph")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per fake LLM call")
+    parser.add_argument("--no-fast-router", action="store_true", help="Disable the local router in graph.py")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency, responder=counting_script))
+    if args.no_fast_router:
+        import agents.graph
+        agents.graph.fast_router = None
+
+    print(f"{len(QUESTIONS)} questions, {args.latency * 1000:.0f} ms per LLM call, "
+          f"fast router {'off' if args.no_fast_router else 'on'}")
+    print(f"{'graph':<18} {'data calls':>10} {'data ms':>8} {'direct calls':>12} {'direct ms':>9} {'total calls':>11}")
+    for name in GRAPHS:
+        results = asyncio.run(run_graph(name))
+        total_calls = sum(results["data_calls"]) + sum(results["direct_calls"])
+        print(f"{name:<18} {statistics.mean(results['data_calls']):>10.1f} {statistics.mean(results['data_ms']):>8.0f} "
+              f"{statistics.mean(results['direct_calls']):>12.1f} {statistics.mean(results['direct_ms']):>9.0f} "
+              f"{total_calls:>11}")
+
+
+if __name__ == "__main__":
+    main()
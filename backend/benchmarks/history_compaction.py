@@ -0,0 +1,103 @@
+"""
+Prompt-token report for history compaction over a synthetic 50-turn conversation.
+
+Plays the same conversation through ChatbotService (graph1, fake LLM) with
+compaction disabled and enabled (SQL memo off), and reports the approximate
+prompt tokens sent to the LLM on each turn.
+
+Run from the backend directory:
+    python -m benchmarks.history_compaction --turns 50
+"""
+import os
+import asyncio
+import logging
+import argparse
+from collections import defaultdict
+from typing import Dict, List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import QUERY_MODEL_MARKER, fake_llm_factory, insurance_script
+from utils.message_utils import message_tokens
+
+QUESTIONS = [
+    "How many policies do we have per region (report {n})?",
+    "Show the total premium by policy type for quarter {n}",
+    "Thanks, that helps with item {n}",
+    "Which adjusters processed the most claims in batch {n}?",
+    "Explain what a deductible means for case {n}",
+]
+
+# Prompt tokens per turn, filled by the recording responder
+prompt_tokens: Dict[int, int] = defaultdict(int)
+current_turn = 0
+
+
+# Gemini answers run to a few paragraphs; the scripted ones are padded to this length
+answer_tokens = 250
+FILLER = "The breakdown above is grouped by region and status, with totals rounded to two decimals. "
+
+
+def recording_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    prompt_tokens[current_turn] += sum(message_tokens(message) for message in messages)
+    response = insurance_script(model_id, messages)
+    if QUERY_MODEL_MARKER not in model_id and not response.tool_calls and len(response.content) > 20:
+        padding = max(0, answer_tokens * 4 - len(response.content))
+        response.content += " " + (FILLER * (padding // len(FILLER) + 1))[:padding]
+    return response
+
+
+async def play(turns: int, compaction: bool) -> List[int]:
+    global current_turn
+    import agents.sql_memo
+    from services.chatbot_service import ChatbotService
+
+    # Memo hits would skip LLM calls in whichever run goes second
+    agents.sql_memo.sql_memo = None
+
+    service = ChatbotService()
+    if not compaction:
+        service.compactor = None
+
+    prompt_tokens.clear()
+    for turn in range(turns):
+        current_turn = turn
+        await service.process_message(
+            session_id="history-bench",
+            user_id="bench_user",
+            user_input=QUESTIONS[turn % len(QUESTIONS)].format(n=turn),
+        )
+    return [prompt_tokens[turn] for turn in range(turns)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prompt tokens per turn with and without history compaction")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--every", type=int, default=1, help="Print every Nth turn")
+    parser.add_argument("--answer-tokens", type=int, default=250, help="Length of the scripted answers")
+    args = parser.parse_args()
+
+    global answer_tokens
+    answer_tokens = args.answer_tokens
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(responder=recording_script))
+
+    raw = asyncio.run(play(args.turns, compaction=False))
+    compacted = asyncio.run(play(args.turns, compaction=True))
+
+    print(f"{'turn':>5} {'full history':>13} {'compacted':>10} {'saved':>7}")
+    for turn in range(args.turns):
+        if turn % args.every == args.every - 1 or turn == args.turns - 1:
+            saved = 1 - compacted[turn] / raw[turn] if raw[turn] else 0
+            print(f"{turn + 1:>5} {raw[turn]:>13} {compacted[turn]:>10} {saved:>6.0%}")
+
+    print(f"total prompt tokens: full={sum(raw)} compacted={sum(compacted)} "
+          f"({1 - sum(compacted) / sum(raw):.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
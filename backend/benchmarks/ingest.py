@@ -0,0 +1,102 @@
+"""
+Bulk ingest benchmark for database/db_tool.py.
+
+Generates synthetic insurance_policies CSVs of increasing size and loads each
+into a fresh database in its own process, reporting rows/s and peak RSS. With
+the streaming ingest, peak memory stays flat as the row count grows; pass
+--pandas to compare with the read_csv/to_sql path of add_table.
+
+Run from the backend directory:
+    python -m benchmarks.ingest --rows 250000 1000000 2000000
+"""
+import os
+import sys
+import csv
+import json
+import time
+import random
+import resource
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+HEADER = ["Policy_ID", "Customer_ID", "Customer_Name", "Policy_Type", "Coverage_Amount", "Premium_Amount",
+          "Start_Date", "End_Date", "Status", "Agent_ID", "Region", "Payment_Frequency", "Claim_Count",
+          "Last_Claim_Date"]
+POLICY_TYPES = ["Auto Insurance", "Health Insurance", "Home Insurance", "Life Insurance"]
+
+
+def write_csv(path: Path, rows: int):
+    rng = random.Random(rows)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            claims = rng.randint(0, 4)
+            writer.writerow([
+                f"POL{i:08d}", f"CUST{rng.randint(0, rows // 3):08d}", f"Customer {i}",
+                rng.choice(POLICY_TYPES), rng.randrange(10000, 500000, 1000), rng.randrange(300, 8000, 50),
+                f"2023-{rng.randint(1, 12):02d}-15", f"2024-{rng.randint(1, 12):02d}-15",
+                rng.choice(["Active", "Expired", "Cancelled"]), f"AGT{rng.randint(100, 199)}",
+                rng.choice(["North", "South", "East", "West"]), rng.choice(["Monthly", "Quarterly", "Annual"]),
+                claims, f"2023-{rng.randint(1, 12):02d}-01" if claims else "",
+            ])
+
+
+def child(csv_file: str, db_file: str, mode: str):
+    """Runs in a fresh process: one ingest, timings and peak RSS as JSON"""
+    from database.db_tool import add_table, ingest_csv
+
+    start = time.perf_counter()
+    if mode == "stream":
+        stats = ingest_csv(csv_file, db_file, "insurance_policies")
+        rows = stats["rows"]
+    else:
+        add_table(csv_file, db_file, "insurance_policies")
+        rows = sum(1 for _ in open(csv_file, encoding="utf-8")) - 1
+    elapsed = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"rows": rows, "seconds": elapsed, "rows_per_s": rows / elapsed, "peak_rss_mb": peak_mb}))
+
+
+def measure(csv_file: Path, mode: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = Path(tmp) / "bench.db"
+        db_file.touch()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.ingest", "--child", str(csv_file), str(db_file), mode],
+            capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming bulk ingest: rows/s and peak memory")
+    parser.add_argument("--rows", type=int, nargs="+", default=[250000, 1000000])
+    parser.add_argument("--pandas", action="store_true", help="Also measure the pandas add_table path")
+    parser.add_argument("--child", nargs=3, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    modes = ["stream", "pandas"] if args.pandas else ["stream"]
+    print(f"{'mode':<7} {'rows':>10} {'csv MB':>8} {'seconds':>8} {'rows/s':>10} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            csv_file = Path(tmp) / f"policies_{rows}.csv"
+            write_csv(csv_file, rows)
+            size_mb = csv_file.stat().st_size / 1024 / 1024
+            for mode in modes:
+                result = measure(csv_file, mode)
+                print(f"{mode:<7} {result['rows']:>10} {size_mb:>8.1f} {result['seconds']:>8.2f} "
+                      f"{result['rows_per_s']:>10.0f} {result['peak_rss_mb']:>12.1f}")
+            csv_file.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+Overload check for the LLM scheduler (agents/llm_scheduler.py): admission
+control, per-model concurrency pools and interactive-over-batch priority.
+
+Runs in-process against the ASGI app with a fake LLM that, like the provider,
+answers 429 (ResourceExhausted) to calls beyond its per-model concurrency
+limit. A batch request is started first, then interactive /chat requests
+arrive at a fixed interval: "steady" a little above what the model limit
+can serve, "spike" several times above it. Each scenario is run with the
+scheduler off (every call goes straight to the provider and is retried on
+429) and on (pools sized to the provider limits, bounded queues).
+
+Prints per run: provider 429s, interactive outcomes (ok / rejected with
+Retry-After / failed) with latencies, batch outcomes, and the queue waits of
+interactive and batch calls. With the scheduler on there must be no provider
+429s and no failed requests, rejections must be immediate and carry
+Retry-After, interactive calls must wait less than batch ones and the spike
+must be shed by admission control.
+
+Run from the backend directory:
+    python -m benchmarks.llm_scheduler --interactive 60 --interval 0.1 --spike-interval 0.02 --batch 20
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+from typing import Any, Dict, List, Optional
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+
+import httpx
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+from agents.call_policy import policy_stats
+from agents.llm import set_llm_factory
+from agents.llm_scheduler import llm_scheduler
+from benchmarks.fake_llm import FakeChatModel
+from core.settings import settings
+from utils.stats_utils import percentile
+
+FLASH, PRO = "gemini-2.5-flash", "gemini-2.5-pro"
+QUESTIONS = [
+    "How many policies do we have per region?",
+    "What is the total premium revenue by policy type?",
+    "Which region has the most active policies?",
+]
+
+# Calls in flight at the provider and the 429s it answered, per model
+in_flight: Dict[str, int] = {}
+provider_429s: Dict[str, int] = {}
+
+
+class ResourceExhausted(Exception):
+    """Stand-in for the provider's rate limit error"""
+    code = 429
+
+
+class RateLimitedChatModel(FakeChatModel):
+    """FakeChatModel that rejects calls beyond `limit` concurrent ones for its model"""
+    limit: int = 4
+
+    def _admit(self):
+        if in_flight.get(self.model_id, 0) >= self.limit:
+            provider_429s[self.model_id] = provider_429s.get(self.model_id, 0) + 1
+            raise ResourceExhausted(f"429 Too many concurrent requests for {self.model_id}")
+        in_flight[self.model_id] = in_flight.get(self.model_id, 0) + 1
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        self._admit()
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            in_flight[self.model_id] -= 1
+
+
+async def interactive_request(client: httpx.AsyncClient, session_id: str, question: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    response = await client.post("/api/chatbot/chat", json={
+        "session_id": session_id, "user_id": "bench_user", "input_query": question})
+    return {"status": response.status_code, "latency_ms": (time.perf_counter() - start) * 1000,
+            "retry_after": response.headers.get("Retry-After")}
+
+
+async def batch_request(client: httpx.AsyncClient, items: int, tag: str) -> Dict[str, Any]:
+    payload = {"items": [{"session_id": f"{tag}-batch-{i}", "user_id": "bench_user",
+                          "input_query": QUESTIONS[i % len(QUESTIONS)]} for i in range(items)],
+               "concurrency": items}
+    summary = None
+    async with client.stream("POST", "/api/chatbot/chat/batch", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line and "summary" in (record := json.loads(line)):
+                summary = record["summary"]
+    return summary
+
+
+async def run(args, interval: float, tag: str) -> Dict[str, Any]:
+    import main
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        batch = asyncio.create_task(batch_request(client, args.batch, tag))
+        await asyncio.sleep(interval * 5)
+        requests = []
+        for i in range(args.interactive):
+            requests.append(asyncio.create_task(
+                interactive_request(client, f"{tag}-chat-{i}", QUESTIONS[i % len(QUESTIONS)])))
+            await asyncio.sleep(interval)
+        interactive = await asyncio.gather(*requests)
+        return {"interactive": interactive, "batch": await batch}
+
+
+def report(scenario: str, name: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    interactive = result["interactive"]
+    ok = [r["latency_ms"] for r in interactive if r["status"] == 200]
+    rejected = [r for r in interactive if r["status"] in (429, 503)]
+    failed = len(interactive) - len(ok) - len(rejected)
+    batch = result["batch"]
+    outcome = {
+        "provider_429s": sum(provider_429s.values()),
+        "ok": len(ok), "rejected": len(rejected), "failed": failed,
+        "rejected_without_retry_after": sum(r["retry_after"] is None for r in rejected),
+        "ok_p50_ms": percentile(ok, 50), "ok_p95_ms": percentile(ok, 95),
+        "rejected_p95_ms": percentile([r["latency_ms"] for r in rejected], 95),
+        "batch_succeeded": batch["succeeded"], "batch_failed": batch["failed"],
+        "wait_ms": {key.rsplit("/", 1)[-1]: wait["mean_ms"] for key, wait in llm_scheduler.stats()["wait"].items()
+                    if key.startswith(f"queue/{FLASH}/")},
+    }
+    print(f"{scenario:<8} {name:<9} {outcome['provider_429s']:>9} {len(ok):>4} {len(rejected):>5} {failed:>7} "
+          f"{outcome['ok_p50_ms']:>8.0f} {outcome['ok_p95_ms']:>8.0f} {outcome['rejected_p95_ms']:>9.1f} "
+          f"{batch['succeeded']:>5}/{batch['items']:<3} "
+          f"{outcome['wait_ms'].get('interactive', 0):>8.0f} {outcome['wait_ms'].get('batch', 0):>8.0f}")
+    return outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LLM admission control, concurrency pools and priorities")
+    parser.add_argument("--interactive", type=int, default=60, help="Interactive /chat requests in the burst")
+    parser.add_argument("--interval", type=float, default=0.1, help="Seconds between steady interactive arrivals")
+    parser.add_argument("--spike-interval", type=float, default=0.02, help="Seconds between spike arrivals")
+    parser.add_argument("--batch", type=int, default=20, help="Items of the batch request")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    parser.add_argument("--flash-limit", type=int, default=4, help="Provider concurrency limit (flash)")
+    parser.add_argument("--pro-limit", type=int, default=2, help="Provider concurrency limit (pro)")
+    parser.add_argument("--queue-depth", type=int, default=8)
+    parser.add_argument("--max-wait", type=float, default=5.0, help="Interactive queue wait limit")
+    args = parser.parse_args()
+    # Failed turns are counted below, their tracebacks would only drown the table
+    logging.basicConfig(level=logging.CRITICAL)
+
+    limits = {FLASH: args.flash_limit, PRO: args.pro_limit}
+    set_llm_factory(lambda model_id: RateLimitedChatModel(model_id=model_id, latency=args.latency,
+                                                          limit=limits.get(model_id, args.flash_limit)))
+    settings.LLM_MAX_CONCURRENCY_BY_MODEL = dict(limits)
+    settings.LLM_QUEUE_MAX_DEPTH = args.queue_depth
+    settings.LLM_QUEUE_MAX_WAIT_S = args.max_wait
+
+    print(f"Batch of {args.batch}, then {args.interactive} interactive requests; "
+          f"{args.latency * 1000:.0f} ms per call, provider limits {limits}")
+    print(f"{'scenario':<8} {'scheduler':<9} {'prov 429':>9} {'ok':>4} {'rej':>5} {'failed':>7} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'rej p95':>9} {'batch ok':>9} {'wait int':>8} {'wait bat':>8}")
+    outcomes = {}
+    for scenario, interval in (("steady", args.interval), ("spike", args.spike_interval)):
+        for name, enabled in (("off", False), ("on", True)):
+            llm_scheduler.enabled = enabled
+            llm_scheduler.reset()
+            policy_stats.reset()
+            provider_429s.clear()
+            outcomes[scenario, name] = report(scenario, name, asyncio.run(run(args, interval, f"{scenario}-{name}")))
+
+    on = [outcomes[scenario, "on"] for scenario in ("steady", "spike")]
+    steady, spike = on
+    ok = (all(o["provider_429s"] == 0 and o["failed"] == 0 and o["rejected_without_retry_after"] == 0
+              and o["rejected_p95_ms"] < 100 for o in on)
+          and steady["wait_ms"].get("interactive", 0) < steady["wait_ms"].get("batch", float("inf"))
+          and spike["rejected"] > 0)
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+"""
+Offline load test with the deterministic fake LLM (benchmarks/fake_llm.py).
+
+Drives either ChatbotService.process_message directly (--target service) or
+the FastAPI app in-process through httpx's ASGI transport (--target app) at a
+fixed concurrency, and reports:
+
+- throughput and p50/p95/p99 request latency
+- time per graph node, per tool (execute_query = SQL time) and per LLM call,
+  collected by a callback handler attached to every run
+- memory growth (RSS before and after, peak RSS)
+
+Results are written as JSON (benchmarks/results/ by default, named after the
+current commit) so runs can be compared across commits with --compare.
+
+Run from the backend directory:
+    python -m benchmarks.load_test --target service --requests 500 --concurrency 32 --latency 0.1
+    python -m benchmarks.load_test --target app --compare benchmarks/results/load_test-app-<commit>.json
+"""
+import os
+import gc
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import subprocess
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory
+from core.settings import settings
+from utils.stats_utils import percentile
+
+RESULTS_DIR = Path(__file__).parent / "results"
+QUESTIONS = [
+    "How many policies do we have per region?",
+    "What is the total premium revenue by policy type?",
+    "Which agents manage the most active policies?",
+    "What are the total claims by region?",
+    "What is the claim approval rate by claim type?",
+    "Hello, what can you do?",
+    "Explain the difference between premium and coverage",
+]
+# Metrics compared by --compare: (path in the results, higher is better)
+COMPARED = [
+    (("throughput_per_s",), True),
+    (("latency_ms", "p50"), False),
+    (("latency_ms", "p95"), False),
+    (("latency_ms", "p99"), False),
+    (("sql_ms", "mean"), False),
+    (("memory", "rss_growth_mb"), False),
+]
+
+
+class RunTimer(BaseCallbackHandler):
+    """Times graph nodes, tools and chat model calls of every run it is attached to"""
+
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, Tuple[str, str, float]] = {}
+        self.durations: Dict[Tuple[str, str], List[float]] = {}
+
+    def _start(self, run_id: UUID, kind: str, name: str):
+        self._starts[run_id] = (kind, name, time.perf_counter())
+
+    def _end(self, run_id: UUID):
+        started = self._starts.pop(run_id, None)
+        if started is not None:
+            kind, name, start = started
+            self.durations.setdefault((kind, name), []).append((time.perf_counter() - start) * 1000)
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Any, *, run_id: UUID,
+                       metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        # A graph node is the chain run named after the node it runs in
+        name = kwargs.get("name")
+        if metadata and name and metadata.get("langgraph_node") == name:
+            self._start(run_id, "node", name)
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id, "tool", kwargs.get("name") or (serialized or {}).get("name", "tool"))
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: Any, *, run_id: UUID,
+                            metadata: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        node = (metadata or {}).get("langgraph_node", "other")
+        self._start(run_id, "llm", node)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id)
+
+    def summary(self, kind: str) -> Dict[str, Dict[str, float]]:
+        return {
+            name: summarize(values)
+            for (entry_kind, name), values in sorted(self.durations.items()) if entry_kind == kind
+        }
+
+
+# Handlers in this context variable are attached to every run started in the context
+_timer: ContextVar[Optional[RunTimer]] = ContextVar("load_test_timer", default=None)
+register_configure_hook(_timer, inheritable=True)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "total_s": round(sum(values) / 1000, 3),
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), peak RSS elsewhere"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+def commit_id() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def requests_for(count: int, sessions: int, offset: int = 0) -> List[Tuple[str, str]]:
+    """(session id, question) pairs; sessions are reused round-robin when fewer than requests"""
+    return [(f"load-{(offset + i) % sessions}", QUESTIONS[(offset + i) % len(QUESTIONS)]) for i in range(count)]
+
+
+async def drive(send, work: List[Tuple[str, str]], concurrency: int) -> Tuple[List[float], int]:
+    """Runs `send(session_id, question)` over the work list with `concurrency` workers"""
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(work)
+
+    async def worker():
+        nonlocal errors
+        for session_id, question in pending:
+            start = time.perf_counter()
+            try:
+                await send(session_id, question)
+                latencies.append((time.perf_counter() - start) * 1000)
+            except Exception as e:
+                errors += 1
+                logging.getLogger(__name__).warning("Request failed: %s", e)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from services.chatbot_service import ChatbotService
+
+    client = None
+    if args.target == "app":
+        import httpx
+        import main
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://load", timeout=None)
+
+        async def send(session_id: str, question: str):
+            response = await client.post("/api/chatbot/chat", json={
+                "session_id": session_id, "user_id": "load_user", "input_query": question})
+            response.raise_for_status()
+    else:
+        service = ChatbotService()
+
+        async def send(session_id: str, question: str):
+            await service.process_message(session_id, "load_user", question)
+
+    try:
+        await drive(send, requests_for(args.warmup, args.sessions, offset=args.requests), args.concurrency)
+        gc.collect()
+        rss_before = rss_mb()
+
+        timer = RunTimer()
+        _timer.set(timer)
+        start = time.perf_counter()
+        latencies, errors = await drive(send, requests_for(args.requests, args.sessions), args.concurrency)
+        elapsed = time.perf_counter() - start
+        _timer.set(None)
+    finally:
+        if client is not None:
+            await client.aclose()
+
+    gc.collect()
+    rss_after = rss_mb()
+    return {
+        "requests": args.requests,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_per_s": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize(latencies),
+        "nodes": timer.summary("node"),
+        "tools": timer.summary("tool"),
+        "llm": timer.summary("llm"),
+        "sql_ms": summarize(timer.durations.get(("tool", "execute_query"), [])),
+        "memory": {
+            "rss_before_mb": round(rss_before, 1),
+            "rss_after_mb": round(rss_after, 1),
+            "rss_growth_mb": round(rss_after - rss_before, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+        },
+    }
+
+
+def lookup(results: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any]):
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('timestamp')}):")
+    for path, higher_is_better in COMPARED:
+        old, new = lookup(baseline["results"], path), lookup(current["results"], path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = (change > 0) == higher_is_better if change else None
+        verdict = "" if better is None else ("better" if better else "worse")
+        print(f"  {'.'.join(path):<22} {old:>10.2f} -> {new:>10.2f}  {change:+7.1f}%  {verdict}")
+
+
+def report(results: Dict[str, Any]):
+    latency = results["latency_ms"]
+    print(f"requests={results['requests']} errors={results['errors']} elapsed={results['elapsed_s']}s "
+          f"throughput={results['throughput_per_s']}/s")
+    print(f"latency ms: p50={latency.get('p50')} p95={latency.get('p95')} p99={latency.get('p99')} "
+          f"max={latency.get('max')}")
+    for section in ("nodes", "tools", "llm"):
+        for name, stats in results[section].items():
+            print(f"  {section[:-1] if section != 'llm' else 'llm':<5} {name:<28} n={stats['count']:<6} "
+                  f"mean={stats['mean']:>8.2f} ms  p95={stats['p95']:>8.2f} ms  total={stats['total_s']}s")
+    print(f"memory: {results['memory']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test with a fake LLM")
+    parser.add_argument("--target", choices=["service", "app"], default="service")
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--sessions", type=int, default=None,
+                        help="Distinct sessions (default: one per request, so histories do not grow)")
+    parser.add_argument("--warmup", type=int, default=20, help="Unmeasured requests sent first")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- fraction of latency, deterministic")
+    parser.add_argument("--graph", default=None, help="Graph to run (default: ACTIVE_GRAPH)")
+    parser.add_argument("--memo", action="store_true", help="Keep the question -> SQL memo enabled")
+    parser.add_argument("--output", default=None, help="Results JSON path (default: benchmarks/results/)")
+    parser.add_argument("--compare", default=None, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+    args.sessions = args.sessions or args.requests + args.warmup
+
+    logging.basicConfig(level=logging.WARNING)
+    if args.graph:
+        settings.ACTIVE_GRAPH = args.graph
+    if not args.memo:
+        import agents.sql_memo
+        agents.sql_memo.sql_memo = None
+    set_llm_factory(fake_llm_factory(latency=args.latency, jitter=args.jitter))
+
+    current = {
+        "benchmark": "load_test",
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit_id(),
+        "config": {**vars(args), "graph": settings.ACTIVE_GRAPH},
+        "results": asyncio.run(run(args)),
+    }
+    report(current["results"])
+
+    output = Path(args.output) if args.output else RESULTS_DIR / f"load_test-{args.target}-{current['commit']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, indent=2), encoding="utf-8")
+    print(f"results written to {output}")
+
+    if args.compare:
+        compare(json.loads(Path(args.compare).read_text(encoding="utf-8")), current)
+    sys.exit(0 if current["results"]["errors"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
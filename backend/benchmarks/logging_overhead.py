@@ -0,0 +1,99 @@
+"""
+Micro-benchmark for logging on the SQL hot path.
+
+Compares the previous _run (sqlite3.Row rows, eager f-string boxed_log of
+[dict(row) ...], then a second tuple copy for the cache) with the current one
+(tuple rows, lazy boxed_log with a capped Preview) on a synthetic result set,
+with the database logger at INFO and at WARNING.
+
+Run from the backend directory:
+    python -m benchmarks.logging_overhead --rows 20000 --repeat 20
+"""
+import os
+import time
+import sqlite3
+import logging
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from database.database import InsuranceDatabase
+from utils.logging_utils import boxed_log
+
+QUERY = "SELECT * FROM policies"
+
+logger = logging.getLogger("database.database")
+
+
+def build_database(path: Path, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE policies (Policy_ID TEXT, Region TEXT, Status TEXT, Premium_Amount REAL, Claim_Count INTEGER)")
+    conn.executemany(
+        "INSERT INTO policies VALUES (?, ?, ?, ?, ?)",
+        ((f"POL{i:07d}", ("North", "South", "East", "West")[i % 4], "Active", 1000 + i % 500, i % 5)
+         for i in range(rows)),
+    )
+    conn.commit()
+    conn.close()
+
+
+def legacy_run(conn: sqlite3.Connection):
+    """The previous hot path, kept inline for comparison"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.cursor()
+    boxed_log(f"SQL Query: {QUERY}", logger, "info", max_chars=None)
+    boxed_log(f"SQL Params: {None}", logger, "info", max_chars=None)
+    cursor.execute(QUERY)
+    rows = cursor.fetchall()
+    boxed_log(f"Query Results: {[dict(row) for row in rows]}", logger, "info", max_chars=None)
+    columns = tuple(column[0] for column in cursor.description)
+    return columns, [tuple(row) for row in rows]
+
+
+def timed(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead of the SQL hot path")
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    # Log records go nowhere: only the formatting cost is measured
+    logging.basicConfig(handlers=[logging.NullHandler()], force=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.db"
+        build_database(path, args.rows)
+
+        database = InsuranceDatabase(path)
+        database.cache = None
+        legacy_conn = sqlite3.connect(path)
+
+        def current():
+            with database.pool.acquire() as conn:
+                database._store(None, *database._run(conn, QUERY, None))
+
+        print(f"rows={args.rows} repeat={args.repeat} (median ms per query)")
+        for level in (logging.INFO, logging.WARNING):
+            logger.setLevel(level)
+            legacy_ms = timed(lambda: legacy_run(legacy_conn), args.repeat)
+            current_ms = timed(current, args.repeat)
+            print(f"  {logging.getLevelName(level):<8} legacy={legacy_ms:8.2f}  current={current_ms:8.2f}  "
+                  f"saved={legacy_ms - current_ms:8.2f} ({legacy_ms / current_ms:4.1f}x)")
+
+        legacy_conn.close()
+        database.pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Multi-worker check for the shared session store (services/sqlite_session_store.py).
+
+Starts uvicorn with N worker processes serving the app with a fake LLM, then
+runs multi-turn conversations against it. Every request opens a new
+connection, so consecutive turns of a session land on different workers.
+The fake root model answers with its worker pid and the number of user
+messages it sees in the history, so each answer shows whether the worker
+had the whole conversation.
+
+For each configuration it prints throughput, the share of turns served by a
+different worker than the session's previous turn, and the turns that saw a
+wrong history. The in-memory store with several workers is the baseline that
+loses history; the SQLite store must never do so. Throughput can only scale
+with N up to the number of CPU cores.
+
+Run from the backend directory:
+    python -m benchmarks.multi_worker --workers 1 2 4 --sessions 60 --turns 5 --concurrency 16
+"""
+import os
+import re
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List, Tuple
+
+import httpx
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+ANSWER = re.compile(r"worker (\d+) saw (\d+) user messages")
+
+
+def history_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    """Root model reply naming the worker and how many user messages the history holds"""
+    users = sum(isinstance(message, HumanMessage) for message in messages)
+    return AIMessage(content=f"Hello again! (worker {os.getpid()} saw {users} user messages)")
+
+
+def create_app():
+    """uvicorn app factory: the app with a fake LLM (BENCH_LLM_LATENCY seconds per call)"""
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    from agents.llm import set_llm_factory
+    from benchmarks.fake_llm import fake_llm_factory
+    set_llm_factory(fake_llm_factory(latency=float(os.environ.get("BENCH_LLM_LATENCY", "0.05")),
+                                     responder=history_script))
+    import agents.sql_memo
+    agents.sql_memo.sql_memo = None
+    import main
+    return main.app
+
+
+def start_server(workers: int, backend: str, db_path: str, port: int, latency: float) -> subprocess.Popen:
+    env = {**os.environ, "SESSION_STORE_BACKEND": backend, "SESSION_SQLITE_PATH": db_path,
+           "BENCH_LLM_LATENCY": str(latency), "LOG_LEVEL": "WARNING", "GRAPH_WARMUP": "true",
+           "GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "fake-key")}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.multi_worker:create_app", "--factory",
+         "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_ready(base_url: str, server: subprocess.Popen, timeout_s: float = 120.0):
+    deadline = time.monotonic() + timeout_s
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                await client.get("/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.5)
+    raise TimeoutError("server did not start")
+
+
+async def converse(base_url: str, sessions: int, turns: int, concurrency: int, tag: str) -> Tuple[float, Dict]:
+    # No keep-alive: each request is a new connection, accepted by any worker
+    limits = httpx.Limits(max_keepalive_connections=0)
+    pending = iter(range(sessions))
+    outcome = {"turns": 0, "switched": 0, "wrong_history": 0, "errors": 0, "workers": set()}
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            for session in pending:
+                previous_pid = None
+                for turn in range(1, turns + 1):
+                    response = await client.post("/api/chatbot/chat", json={
+                        "session_id": f"{tag}-{session}", "user_id": "bench_user",
+                        "input_query": f"Hello, this is turn {turn}"})
+                    match = ANSWER.search(response.json().get("response", "")) if response.is_success else None
+                    if match is None:
+                        outcome["errors"] += 1
+                        continue
+                    pid, seen = int(match.group(1)), int(match.group(2))
+                    outcome["turns"] += 1
+                    outcome["workers"].add(pid)
+                    outcome["switched"] += previous_pid is not None and pid != previous_pid
+                    outcome["wrong_history"] += seen != turn
+                    previous_pid = pid
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return outcome["turns"] / elapsed, outcome
+
+
+async def run_config(workers: int, backend: str, args, port: int) -> Dict:
+    directory = tempfile.mkdtemp(prefix="sessions-")
+    server = start_server(workers, backend, os.path.join(directory, "sessions.db"), port, args.latency)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        await wait_ready(base_url, server)
+        # Warm every worker's graph before timing
+        await converse(base_url, workers * 2, 1, workers * 2, "warmup")
+        throughput, outcome = await converse(base_url, args.sessions, args.turns, args.concurrency, "bench")
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(directory, ignore_errors=True)
+    return {"throughput": throughput, **outcome}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sessions shared by uvicorn workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=60)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    configs = [("memory", max(args.workers))] + [("sqlite", workers) for workers in args.workers]
+    print(f"{os.cpu_count()} CPU core(s), {args.sessions} sessions x {args.turns} turns, "
+          f"concurrency {args.concurrency}, LLM latency {args.latency}s")
+    print(f"{'backend':<8} {'workers':>7} {'turns/s':>8} {'pids':>5} {'switched':>9} {'wrong':>6} {'errors':>7}")
+    ok = True
+    for i, (backend, workers) in enumerate(configs):
+        result = asyncio.run(run_config(workers, backend, args, args.port + i))
+        print(f"{backend:<8} {workers:>7} {result['throughput']:>8.1f} {len(result['workers']):>5} "
+              f"{result['switched'] / max(result['turns'], 1):>8.0%} {result['wrong_history']:>6} {result['errors']:>7}")
+        if backend == "sqlite":
+            ok &= result["wrong_history"] == 0 and result["errors"] == 0
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
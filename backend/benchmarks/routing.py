@@ -0,0 +1,120 @@
+"""
+Routing benchmark for the fast-path router in agents/graph.py.
+
+Reports the local classifier's coverage and accuracy on a labelled question set,
+then runs graph.py over the same questions with and without the fast path
+against a fake LLM to measure the latency saved.
+
+Run from the backend directory:
+    python -m benchmarks.routing --latency 0.3
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory
+
+Q, D = "query_agent", "answer_directly"
+
+LABELLED_QUESTIONS = [
+    ("How many active policies do we have?", Q),
+    ("What's the total premium revenue by region?", Q),
+    ("Which agents have the most policies?", Q),
+    ("Show policies expiring this month", Q),
+    ("Show all claims over $10,000", Q),
+    ("What's the average claim processing time?", Q),
+    ("Which adjuster has the most denied claims?", Q),
+    ("List all pending claims", Q),
+    ("What's the claim rate by policy type?", Q),
+    ("Which regions have the highest claim amounts?", Q),
+    ("How many active life insurance policies do we have?", Q),
+    ("What's the average coverage amount by policy type?", Q),
+    ("Total approved amount for health claims", Q),
+    ("Show me customers in the North region", Q),
+    ("How many cancelled policies are there?", Q),
+    ("Break down premiums by payment frequency", Q),
+    ("What about the South?", Q),
+    ("Show me the claims for those", Q),
+    ("Hello!", D),
+    ("hi there", D),
+    ("Thanks, that's helpful", D),
+    ("What is a deductible?", D),
+    ("Explain what an insurance premium is", D),
+    ("What does coverage amount mean?", D),
+    ("What can you do?", D),
+    ("Who are you?", D),
+    ("Give me some tips for reducing churn", D),
+    ("What's the difference between term and whole life insurance?", D),
+    ("Good morning", D),
+    ("Can you define loss ratio?", D),
+]
+
+
+def evaluate_local_router():
+    from agents.router import KeywordRouter
+
+    router = KeywordRouter()
+    confident, correct = 0, 0
+    start = time.perf_counter()
+    for question, label in LABELLED_QUESTIONS:
+        decision = router.route(question)
+        if decision.confidence >= router.threshold:
+            confident += 1
+            correct += decision.next_agent == label
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    total = len(LABELLED_QUESTIONS)
+    print(f"questions:             {total}")
+    print(f"handled locally:       {confident} ({100 * confident / total:.0f}%)")
+    print(f"local accuracy:        {100 * correct / max(confident, 1):.1f}%")
+    print(f"local classify time:   {elapsed_ms / total:.3f} ms/question")
+
+
+async def run_graph(enabled: bool) -> float:
+    from langchain_core.messages import HumanMessage
+    from agents import graph as graph_module
+    from agents.router import KeywordRouter
+
+    graph_module.fast_router = KeywordRouter() if enabled else None
+    start = time.perf_counter()
+    for question, _ in LABELLED_QUESTIONS:
+        await graph_module.graph.ainvoke({
+            "messages": [HumanMessage(content=question)],
+            "session_id": "bench",
+            "user_id": "bench_user",
+            "next_agent": "",
+        })
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-path router accuracy and latency benchmark")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency))
+
+    evaluate_local_router()
+
+    from agents.router import router_stats
+
+    without_router = asyncio.run(run_graph(enabled=False))
+    router_stats.reset()
+    with_router = asyncio.run(run_graph(enabled=True))
+
+    total = len(LABELLED_QUESTIONS)
+    print(f"graph without router:  {without_router:.2f}s ({1000 * without_router / total:.0f} ms/question)")
+    print(f"graph with router:     {with_router:.2f}s ({1000 * with_router / total:.0f} ms/question)")
+    print(f"latency saved:         {without_router - with_router:.2f}s")
+    print(f"router paths:          {router_stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
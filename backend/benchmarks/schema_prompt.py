@@ -0,0 +1,185 @@
+"""
+Prompt size benchmark for the relevant-schema prompts (agents/schema_prompt.py).
+
+1. For a fixed question set, prints the tables the local matcher picks and the
+   estimated prompt tokens of the query agent and root agent system prompts
+   with every table injected vs only the relevant tables and columns. Each
+   question lists the tables and columns its SQL needs; all of them must be
+   in the sliced prompt.
+2. Loads a new table into a copy of the database with db_tool add-table and
+   checks that prompts show it without a restart: on the event loop once the
+   background refresh has run (the previous catalog is served meanwhile),
+   in synchronous callers on the next prompt.
+
+Run from the backend directory:
+    python -m benchmarks.schema_prompt
+"""
+import os
+import sys
+import time
+import shutil
+import asyncio
+import logging
+import tempfile
+import contextlib
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+
+from langchain_core.messages import HumanMessage
+
+from agents.agentprofiles import AgentProfile
+from agents.schema_prompt import SCHEMA_MARKER, SchemaCatalog, SchemaPrompts, schema_prompts
+from core.settings import settings
+from database.database import BASE_DIR, InsuranceDatabase
+from database.db_tool import add_table
+from utils.message_utils import estimate_tokens
+
+# Question -> table.column names its SQL needs (a table alone: the table)
+QUESTIONS: List[Tuple[str, List[str]]] = [
+    ("How many active policies do we have?", ["insurance_policies.Status"]),
+    ("What's the total premium revenue by region?", ["insurance_policies.Premium_Amount", "insurance_policies.Region"]),
+    ("Which agents have the most policies?", ["insurance_policies.Agent_ID"]),
+    ("Show policies expiring this month", ["insurance_policies.End_Date"]),
+    ("Show all claims over $10,000", ["insurance_claims.Claim_Amount"]),
+    ("What's the average claim processing time?", ["insurance_claims.Processing_Days"]),
+    ("Which adjuster has the most denied claims?", ["insurance_claims.Adjuster_ID", "insurance_claims.Status"]),
+    ("List all pending claims", ["insurance_claims"]),
+    ("Which regions have the highest claim amounts?", ["insurance_claims.Claim_Amount", "insurance_policies.Region"]),
+    ("How many active life insurance policies do we have?",
+     ["insurance_policies.Status", "insurance_policies.Policy_Type"]),
+    ("What's the average coverage amount by policy type?",
+     ["insurance_policies.Coverage_Amount", "insurance_policies.Policy_Type"]),
+    ("Total approved amount for health claims", ["insurance_claims.Approved_Amount", "insurance_claims.Claim_Type"]),
+    ("Show me customers in the North region", ["insurance_policies.Customer_Name", "insurance_policies.Region"]),
+    ("Break down premiums by payment frequency",
+     ["insurance_policies.Premium_Amount", "insurance_policies.Payment_Frequency"]),
+    ("Show customers with claims exceeding their coverage",
+     ["insurance_policies.Coverage_Amount", "insurance_claims.Claim_Amount"]),
+    ("Hello, what can you do?", []),
+]
+
+AGENTS_CSV = """Agent_ID,Agent_Name,Tier,Office
+AGT001,Maria Lopez,Gold,Manila
+AGT002,James Chen,Silver,Cebu
+AGT003,Ana Reyes,Gold,Davao
+AGT004,Paolo Cruz,Bronze,Manila
+AGT005,Liza Santos,Silver,Cebu
+"""
+
+
+def prompt_tokens(prompts: SchemaPrompts, prompt: str, question: str) -> int:
+    return estimate_tokens(prompts.render(prompt, [HumanMessage(content=question)]))
+
+
+def covered(selection, needs: List[str]) -> List[str]:
+    """The needed tables/columns missing from the selection (columns listed by name count)"""
+    shown: Dict[str, set] = {table.name: {column.name for column in table.columns} for table, _ in selection}
+    missing = []
+    for need in needs:
+        table, _, column = need.partition(".")
+        if table not in shown or (column and column not in shown[table]):
+            missing.append(need)
+    return missing
+
+
+def token_report(root: AgentProfile, query: AgentProfile) -> bool:
+    prompts = {"schema": SCHEMA_MARKER, "query": f"{query.instruction}\n\n{query.description}",
+               "root": f"{root.instruction}\n\n{root.description}"}
+    print(f"{'question':<52} {'tables':<36} {'schema':>13} {'query prompt':>13} {'root prompt':>13}")
+    totals = {name: [0, 0] for name in prompts}
+    ok = True
+    for question, needs in QUESTIONS:
+        tokens = {}
+        for sliced in (False, True):
+            settings.SCHEMA_PROMPT_SLICING = sliced
+            for name, prompt in prompts.items():
+                tokens.setdefault(name, []).append(prompt_tokens(schema_prompts, prompt, question))
+                totals[name][sliced] += tokens[name][-1]
+        selection = schema_prompts.selection(question)
+        missing = covered(selection, needs)
+        ok &= not missing
+        tables = ",".join(table.name.replace("insurance_", "").replace("summary_", "sum_") for table, _ in selection)
+        print(f"{question[:52]:<52} {tables[:36]:<36} "
+              + " ".join(f"{full:>6}>{sliced:<6}" for full, sliced in tokens.values())
+              + (f"  MISSING {missing}" if missing else ""))
+
+    n = len(QUESTIONS)
+    labels = {"schema": "query agent schema section", "query": "query agent prompt", "root": "root agent prompt"}
+    for name, (full, sliced) in totals.items():
+        print(f"{labels[name]}: {full / n:.0f} -> {sliced / n:.0f} tokens per call on average "
+              f"({(full - sliced) / full:+.1%} fewer)".replace("+", ""))
+    ok &= totals["query"][1] < totals["query"][0]
+    return ok
+
+
+async def background_refresh(catalog: SchemaCatalog, table: str) -> Tuple[bool, float]:
+    """Whether the first atables() after a change served the previous catalog, and ms until `table` shows"""
+    start = time.perf_counter()
+    stale = table not in await catalog.atables()
+    while table not in await catalog.atables():
+        await asyncio.sleep(0.005)
+    return stale, (time.perf_counter() - start) * 1000
+
+
+def freshness_check() -> bool:
+    """A table loaded with db_tool add-table shows up in the next prompt"""
+    directory = tempfile.mkdtemp(prefix="schema-")
+    try:
+        db_path = os.path.join(directory, "insurance.db")
+        shutil.copy(BASE_DIR / "insurance.db", db_path)
+        prompts = SchemaPrompts(SchemaCatalog(InsuranceDatabase(db_path)))
+        question = "Which agent tier has the most policies?"
+        before = {table.name for table, _ in prompts.selection(question)}
+        asyncio.run(prompts.catalog.atables())
+
+        csv_path = os.path.join(directory, "insurance_agents.csv")
+        with open(csv_path, "w", encoding="utf-8") as file:
+            file.write(AGENTS_CSV)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            add_table(csv_path, db_path, "insurance_agents")
+        stale, refresh_ms = asyncio.run(background_refresh(prompts.catalog, "insurance_agents"))
+        print(f"event loop: previous catalog served: {stale}, new table shown after {refresh_ms:.1f} ms")
+        prompts = SchemaPrompts(SchemaCatalog(InsuranceDatabase(db_path)))
+        prompts.selection(question)
+        with open(csv_path, "a", encoding="utf-8") as file:
+            file.write("AGT006,Rico Tan,Platinum,Iloilo\n")
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            add_table(csv_path, db_path, "insurance_agents")
+
+        start = time.perf_counter()
+        selection = prompts.selection(question)
+        reload_ms = (time.perf_counter() - start) * 1000
+        after = {table.name: columns for table, columns in selection}
+        tier = next((column for column in prompts.catalog.tables()["insurance_agents"].columns
+                     if column.name == "Tier"), None)
+        print(f"before add-table: {sorted(before)}")
+        print(f"after add-table:  {sorted(after)} (catalog reloaded in {reload_ms:.1f} ms, "
+              f"Tier values {tier.values if tier else None})")
+        return (stale and "insurance_agents" not in before and "insurance_agents" in after
+                and bool(tier and "Platinum" in tier.values))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    root, query = AgentProfile(agent_name="root_agent"), AgentProfile(agent_name="query_agent")
+
+    start = time.perf_counter()
+    schema_prompts.catalog.tables()
+    print(f"catalog: {len(schema_prompts.catalog.tables())} tables loaded in {(time.perf_counter() - start) * 1000:.1f} ms")
+    start = time.perf_counter()
+    for question, _ in QUESTIONS:
+        schema_prompts.render(query.instruction, [HumanMessage(content=question)])
+    print(f"render: {(time.perf_counter() - start) * 1000 / len(QUESTIONS):.2f} ms per prompt (catalog cached)")
+
+    ok = token_report(root, query)
+    ok &= freshness_check()
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Checks per-session ordering and request coalescing in ChatbotService, using a
+fake LLM with artificial latency.
+
+1. Concurrent different messages for one session: every turn is kept, in order.
+2. Concurrent identical retries for one session: the graph runs once.
+3. Different sessions still run in parallel.
+
+Run from the backend directory:
+    python -m benchmarks.session_ordering --latency 0.1
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+# Parallelism is checked against the session locks alone, not the LLM concurrency pools
+os.environ["LLM_SCHEDULER_ENABLED"] = "false"
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory, insurance_script
+
+llm_calls = 0
+
+
+def counting_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    global llm_calls
+    llm_calls += 1
+    return insurance_script(model_id, messages)
+
+
+async def run(latency: float) -> bool:
+    global llm_calls
+    from services.chatbot_service import ChatbotService
+
+    service = ChatbotService()
+    ok = True
+
+    # 1. Ordering within a session
+    questions = [f"Hello, this is message {i}" for i in range(8)]
+    await asyncio.gather(*(service.process_message("ordered", "bench_user", q) for q in questions))
+    stored = [m.content for m in service.sessions.get("ordered") if isinstance(m, HumanMessage)]
+    print(f"ordering:    {len(stored)}/{len(questions)} turns stored, in order: {stored == questions}")
+    ok &= stored == questions
+
+    # 2. Coalescing identical retries
+    llm_calls = 0
+    responses = await asyncio.gather(*(
+        service.process_message("retried", "bench_user", "Hello, how are you?") for _ in range(5)
+    ))
+    turns = sum(isinstance(m, HumanMessage) for m in service.sessions.get("retried"))
+    print(f"coalescing:  5 requests -> {llm_calls} LLM calls, {turns} stored turn, "
+          f"identical responses: {len(set(responses)) == 1}")
+    ok &= llm_calls == 1 and turns == 1 and len(set(responses)) == 1
+
+    # 3. Parallelism across sessions
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        service.process_message(f"parallel-{i}", "bench_user", "Hello there") for i in range(50)
+    ))
+    elapsed = time.perf_counter() - start
+    print(f"parallelism: 50 sessions in {elapsed:.2f}s (one call = {latency:.2f}s)")
+    ok &= elapsed < 5 * latency
+
+    print(f"stats:       {service.session_stats()}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-session ordering and request coalescing")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency, responder=counting_script))
+
+    ok = asyncio.run(run(args.latency))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Memory benchmark for the chat session store.
+
+Simulates many sessions of graph1-style turns (user message, tool call, raw SQL
+result, answer) and compares the process memory of an unbounded dict with the
+bounded InMemorySessionStore, printing the store's stats for container sizing.
+
+Run from the backend directory:
+    python -m benchmarks.session_store --sessions 2000 --turns 10
+"""
+import os
+import json
+import argparse
+import tracemalloc
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from services.session_store import InMemorySessionStore
+
+
+def turn(session: int, number: int, result_rows: int) -> List[BaseMessage]:
+    call_id = f"call_{session}_{number}"
+    rows = [[f"POL{i:07d}", "North", "Active", 1200.5 + i] for i in range(result_rows)]
+    return [
+        HumanMessage(content=f"How many active policies are there in region {number}?"),
+        AIMessage(content="", tool_calls=[{"name": "query_agent_tool", "id": call_id,
+                                           "args": {"user_request": "active policies by region"}}]),
+        ToolMessage(content=json.dumps({"columns": ["Policy_ID", "Region", "Status", "Premium_Amount"],
+                                        "rows": rows}), tool_call_id=call_id),
+        AIMessage(content=f"There are {result_rows} active policies in region {number}."),
+    ]
+
+
+def fill(store, sessions: int, turns: int, result_rows: int) -> int:
+    tracemalloc.start()
+    for number in range(turns):
+        for session in range(sessions):
+            session_id = f"session-{session}"
+            history = store.get(session_id) or []
+            store.put(session_id, history + turn(session, number, result_rows))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current
+
+
+class UnboundedStore(dict):
+    """The previous behaviour: a plain dict of full histories"""
+
+    def put(self, session_id: str, messages: List[BaseMessage]):
+        self[session_id] = list(messages)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Session store memory under synthetic traffic")
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--result-rows", type=int, default=50)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    parser.add_argument("--max-session-kb", type=int, default=64)
+    parser.add_argument("--max-total-mb", type=int, default=32)
+    args = parser.parse_args()
+
+    unbounded = fill(UnboundedStore(), args.sessions, args.turns, args.result_rows)
+    store = InMemorySessionStore(
+        max_sessions=args.max_sessions,
+        max_session_bytes=args.max_session_kb * 1024,
+        max_total_bytes=args.max_total_mb * 1024 * 1024,
+    )
+    bounded = fill(store, args.sessions, args.turns, args.result_rows)
+
+    print(f"sessions={args.sessions} turns={args.turns} result_rows={args.result_rows}")
+    print(f"unbounded dict:   {unbounded / 1024 / 1024:8.1f} MB traced")
+    print(f"session store:    {bounded / 1024 / 1024:8.1f} MB traced")
+    print(f"store stats:      {store.stats()}")
+
+
+if __name__ == "__main__":
+    main()
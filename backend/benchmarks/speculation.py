@@ -0,0 +1,108 @@
+"""
+Latency check for speculative query execution in agents/graph.py.
+
+Runs data and direct questions through `graph` with a latency-injecting fake
+LLM, with SPECULATIVE_QUERY_ENABLED off and on (fast router off, so every
+question pays the routing call). With speculation, data questions should save
+about one LLM latency, and direct questions show the speculative calls wasted.
+Each run is accounted like a /chat turn (usage_scope plus a UsageCallbackHandler
+on the run config): the speculative query agent's calls must be counted, so
+data questions report the same calls per model with speculation on and off.
+
+Run from the backend directory:
+    python -m benchmarks.speculation --latency 0.2
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from typing import Any, Dict, List, Tuple
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["SQL_MEMO_ENABLED"] = "false"
+
+from langchain_core.messages import HumanMessage
+
+from agents.llm import set_llm_factory
+from agents.usage import TurnUsage, UsageCallbackHandler, usage_scope
+from benchmarks.fake_llm import fake_llm_factory
+from core.settings import settings
+
+DATA_QUESTIONS = [
+    "How many policies do we have per region?",
+    "What is the total premium revenue by policy type?",
+    "Which agents manage the most active policies?",
+]
+DIRECT_QUESTIONS = [
+    "Hello, what can you do?",
+    "Explain the difference between premium and coverage",
+]
+
+
+async def run(questions: List[str]) -> Tuple[List[float], Dict[str, int]]:
+    """Latencies of the questions and their LLM calls per model, as TurnUsage counts them"""
+    from agents.registry import get_graph
+
+    graph = get_graph("graph")
+    latencies, calls = [], {}
+    for question in questions:
+        usage = TurnUsage()
+        start = time.perf_counter()
+        with usage_scope(usage):
+            result = await graph.ainvoke({
+                "messages": [HumanMessage(content=question)],
+                "session_id": "bench", "user_id": "bench_user", "next_agent": "",
+            }, config={"callbacks": [UsageCallbackHandler(usage)]})
+        latencies.append(time.perf_counter() - start)
+        assert result["messages"][-1].content, question
+        for model_id, counts in usage.to_dict()["by_model"].items():
+            calls[model_id] = calls.get(model_id, 0) + counts["calls"]
+    return latencies, calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Speculative query agent latency and waste")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency))
+
+    import agents.graph
+    from agents.speculation import speculation_stats
+    agents.graph.fast_router = None
+
+    results: Dict[bool, Dict[str, float]] = {}
+    usage: Dict[bool, Dict[str, Any]] = {}
+    for speculative in (False, True):
+        settings.SPECULATIVE_QUERY_ENABLED = speculative
+        speculation_stats.reset()
+        data, data_calls = asyncio.run(run(DATA_QUESTIONS))
+        direct, direct_calls = asyncio.run(run(DIRECT_QUESTIONS))
+        results[speculative] = {"data": statistics.mean(data), "direct": statistics.mean(direct)}
+        usage[speculative] = {"data": data_calls, "direct": direct_calls}
+        print(f"speculative={'on ' if speculative else 'off'} "
+              f"data={results[speculative]['data'] * 1000:6.0f} ms  "
+              f"direct={results[speculative]['direct'] * 1000:6.0f} ms  "
+              f"turn usage calls: data={data_calls} direct={direct_calls}")
+    print(f"speculation stats: {speculation_stats.snapshot()}")
+
+    saved = results[False]["data"] - results[True]["data"]
+    stats = speculation_stats.snapshot()
+    ok = (saved >= 0.8 * args.latency
+          and stats["used"] == len(DATA_QUESTIONS)
+          and stats["cancelled"] == len(DIRECT_QUESTIONS)
+          and results[True]["direct"] < results[False]["direct"] + 0.5 * args.latency
+          # Speculative calls run under the turn's callbacks: counted and budgeted like the others
+          and usage[True]["data"] == usage[False]["data"]
+          and sum(usage[True]["direct"].values()) >= sum(usage[False]["direct"].values()))
+    print(f"data question latency saved: {saved * 1000:.0f} ms (one LLM call = {args.latency * 1000:.0f} ms)")
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Checks the SQL guard in database/sql_guard.py against a synthetic database.
+
+1. Writes, PRAGMA and ATTACH are rejected as read_only_violation.
+2. A cartesian join is rejected from its query plan before it runs.
+3. With the plan check set to "warn", the same join runs and is stopped by
+   the instruction/time budget, while concurrent cheap queries stay fast.
+4. Oversized results are rejected as too_many_rows.
+5. Normal queries pass; the guard overhead per uncached query is reported.
+
+Run from the backend directory:
+    python -m benchmarks.sql_guard --policies 200000 --claims 100000
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import logging
+import argparse
+import tempfile
+import statistics
+import threading
+from pathlib import Path
+from typing import Callable, List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from core.settings import settings
+from database.sql_guard import QueryRejectedError
+
+WRITES = [
+    "INSERT INTO insurance_policies (Policy_ID) VALUES ('POLX')",
+    "DELETE FROM insurance_claims",
+    "DROP TABLE insurance_claims",
+    "PRAGMA writable_schema = 1",
+    "ATTACH DATABASE ':memory:' AS scratch",
+    "CREATE TEMP TABLE scratch AS SELECT * FROM insurance_policies",
+]
+CARTESIAN = ("SELECT COUNT(*) FROM insurance_policies p, insurance_claims c "
+             "WHERE p.Premium_Amount > c.Claim_Amount")
+CHEAP = "SELECT Region, COUNT(*) FROM insurance_policies WHERE Policy_ID = 'POL00000042' GROUP BY Region"
+NORMAL = [
+    "SELECT Region, COUNT(*), SUM(Premium_Amount) FROM insurance_policies GROUP BY Region",
+    "SELECT p.Policy_Type, SUM(c.Claim_Amount) FROM insurance_claims c "
+    "JOIN insurance_policies p ON p.Policy_ID = c.Policy_ID GROUP BY p.Policy_Type",
+    "SELECT * FROM insurance_policies WHERE Status = 'Active' ORDER BY Premium_Amount DESC LIMIT 20",
+]
+
+
+def build(path: Path, policies: int, claims: int):
+    rng = random.Random(7)
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE insurance_policies (Policy_ID TEXT PRIMARY KEY, Policy_Type TEXT, Premium_Amount REAL,
+                                         Status TEXT, Region TEXT);
+        CREATE TABLE insurance_claims (Claim_ID TEXT PRIMARY KEY, Policy_ID TEXT, Claim_Amount REAL);
+    """)
+    conn.executemany("INSERT INTO insurance_policies VALUES (?, ?, ?, ?, ?)", (
+        (f"POL{i:08d}", rng.choice(["Auto", "Health", "Home", "Life"]), rng.randrange(300, 8000),
+         rng.choice(["Active", "Expired"]), rng.choice(["North", "South", "East", "West"]))
+        for i in range(policies)))
+    conn.executemany("INSERT INTO insurance_claims VALUES (?, ?, ?)", (
+        (f"CLM{i:08d}", f"POL{rng.randrange(policies):08d}", rng.randrange(100, 50000))
+        for i in range(claims)))
+    conn.commit()
+    conn.close()
+
+
+def expect_rejection(run: Callable, query: str, code: str) -> bool:
+    start = time.perf_counter()
+    try:
+        run(query)
+    except QueryRejectedError as e:
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"  {e.code:<22} {elapsed:8.1f} ms  {query[:60]}")
+        return e.code == code
+    print(f"  NOT REJECTED                      {query[:60]}")
+    return False
+
+
+def cheap_latencies(run: Callable, stop: threading.Event, out: List[float]):
+    while not stop.is_set():
+        start = time.perf_counter()
+        run(CHEAP)
+        out.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQL guard rejections, budgets and overhead")
+    parser.add_argument("--policies", type=int, default=200000)
+    parser.add_argument("--claims", type=int, default=100000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    settings.QUERY_CACHE_ENABLED = False
+    from database.database import InsuranceDatabase
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "guard.db"
+        build(path, args.policies, args.claims)
+        db = InsuranceDatabase(path)
+
+        print("1. read-only enforcement")
+        for query in WRITES:
+            ok &= expect_rejection(db.execute_query_columnar, query, "read_only_violation")
+
+        print("2. plan check (reject)")
+        ok &= expect_rejection(db.execute_query_columnar, CARTESIAN, "full_scan_too_large")
+
+        print("3. budget (plan check set to warn)")
+        db.guard.scan_action = "warn"
+        stop, latencies = threading.Event(), []
+        worker = threading.Thread(target=cheap_latencies, args=(db.execute_query_columnar, stop, latencies))
+        worker.start()
+        stopped = expect_rejection(db.execute_query_columnar, CARTESIAN, "query_too_expensive")
+        stop.set()
+        worker.join()
+        ok &= stopped
+        if latencies:
+            print(f"  concurrent cheap queries: {len(latencies)} runs, "
+                  f"median {statistics.median(latencies):.1f} ms, max {max(latencies):.1f} ms")
+        db.guard.scan_action = settings.DB_GUARD_SCAN_ACTION
+
+        print("4. row limit")
+        ok &= expect_rejection(db.execute_query_columnar, "SELECT * FROM insurance_policies", "too_many_rows")
+
+        print("5. normal queries and overhead")
+        timings = {}
+        for enabled in (False, True):
+            guard = db.guard
+            if not enabled:
+                db.guard = None
+            runs = []
+            for _ in range(5):
+                for query in NORMAL:
+                    start = time.perf_counter()
+                    db.execute_query_columnar(query)
+                    runs.append((time.perf_counter() - start) * 1000)
+            db.guard = guard
+            timings[enabled] = statistics.median(runs)
+        print(f"  median latency: guard off {timings[False]:.2f} ms, guard on {timings[True]:.2f} ms")
+        print(f"  guard stats: {db.guard.stats()}")
+        db.pool.close()
+
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cold-start benchmark for the FastAPI app, using a fake LLM.
+
+Each mode runs in a fresh interpreter and measures importing main, running the
+lifespan startup and the first /chat request:
+    eager   both graph modules imported up front (the previous import-time behaviour)
+    lazy    active graph built on the first request (GRAPH_WARMUP=false)
+    warmup  active graph built in the lifespan hook (default)
+
+Run from the backend directory:
+    python -m benchmarks.startup --runs 3
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from typing import Dict, List
+
+MODES = ("eager", "lazy", "warmup")
+
+
+def child(mode: str):
+    """Runs inside the fresh interpreter and prints timings as JSON"""
+    os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+    os.environ["LOG_LEVEL"] = "WARNING"
+    os.environ["SQL_MEMO_ENABLED"] = "false"
+    os.environ["GRAPH_WARMUP"] = "false" if mode == "lazy" else "true"
+
+    start = time.perf_counter()
+    from agents.llm import set_llm_factory
+    from benchmarks.fake_llm import fake_llm_factory
+    set_llm_factory(fake_llm_factory())
+
+    if mode == "eager":
+        import agents.graph  # noqa: F401
+        import agents.graph1  # noqa: F401
+    import main
+    from fastapi.testclient import TestClient
+    imported = time.perf_counter()
+
+    with TestClient(main.app) as client:
+        started = time.perf_counter()
+        response = client.post("/api/chatbot/chat", json={
+            "session_id": "startup", "user_id": "bench_user",
+            "input_query": "How many policies do we have per region?",
+        })
+        first_request = time.perf_counter()
+    assert response.status_code == 200, response.text
+
+    print(json.dumps({
+        "import_ms": (imported - start) * 1000,
+        "startup_ms": (started - imported) * 1000,
+        "first_request_ms": (first_request - started) * 1000,
+        "ready_to_answer_ms": (first_request - start) * 1000,
+    }))
+
+
+def measure(mode: str) -> Dict[str, float]:
+    output = subprocess.run(
+        [sys.executable, "-m", "benchmarks.startup", "--child", mode],
+        capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import, startup and first request latency")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    print(f"{'mode':<8} {'import':>9} {'startup':>9} {'1st request':>12} {'total':>9}  (median of {args.runs}, ms)")
+    for mode in MODES:
+        runs: List[Dict[str, float]] = [measure(mode) for _ in range(args.runs)]
+        median = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        print(f"{mode:<8} {median['import_ms']:>9.0f} {median['startup_ms']:>9.0f} "
+              f"{median['first_request_ms']:>12.0f} {median['ready_to_answer_ms']:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Query latency on the raw tables versus the precomputed summary tables
+(database/summary_tables.yaml).
+
+Scales the bundled CSVs (database/insurance_*.csv) by each factor, loads them
+with db_tool.ingest_csv (which rebuilds the summary tables), then runs typical
+aggregate questions both ways through InsuranceDatabase with the result cache
+off, checking that both give the same answer.
+
+Run from the backend directory:
+    python -m benchmarks.summary_tables --scales 10 100 10000
+"""
+import os
+import sys
+import csv
+import time
+import random
+import logging
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+
+from core.settings import settings
+
+DATA_DIR = Path(__file__).parent.parent / "database"
+
+# (question, raw SQL, summary SQL)
+QUERIES: List[Tuple[str, str, str]] = [
+    ("claims totals by region",
+     "SELECT p.Region, SUM(c.Claim_Amount) FROM insurance_claims c "
+     "LEFT JOIN insurance_policies p ON p.Policy_ID = c.Policy_ID GROUP BY p.Region ORDER BY 1",
+     "SELECT Region, SUM(Total_Claim_Amount) FROM summary_claims GROUP BY Region ORDER BY 1"),
+    ("premium by policy type",
+     "SELECT Policy_Type, SUM(Premium_Amount) FROM insurance_policies GROUP BY Policy_Type ORDER BY 1",
+     "SELECT Policy_Type, SUM(Total_Premium) FROM summary_policies GROUP BY Policy_Type ORDER BY 1"),
+    ("active policy count",
+     "SELECT COUNT(*) FROM insurance_policies WHERE Status = 'Active'",
+     "SELECT SUM(Policy_Count) FROM summary_policies WHERE Status = 'Active'"),
+    ("approval rate by claim type",
+     "SELECT Claim_Type, SUM(CASE WHEN Status = 'Approved' THEN 1 ELSE 0 END) * 100.0 / COUNT(*) "
+     "FROM insurance_claims GROUP BY Claim_Type ORDER BY 1",
+     "SELECT Claim_Type, SUM(CASE WHEN Status = 'Approved' THEN Claim_Count ELSE 0 END) * 100.0 / SUM(Claim_Count) "
+     "FROM summary_claims GROUP BY Claim_Type ORDER BY 1"),
+]
+
+
+def read_csv(path: Path) -> Tuple[List[str], List[List[str]]]:
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = list(csv.reader(file))
+    return rows[0], rows[1:]
+
+
+def write_scaled(tmp: Path, scale: int) -> Tuple[Path, Path]:
+    """Copies of the bundled rows with fresh ids, claims spread over the scaled policies"""
+    rng = random.Random(scale)
+    policy_header, policies = read_csv(DATA_DIR / "insurance_policies.csv")
+    claim_header, claims = read_csv(DATA_DIR / "insurance_claims.csv")
+    policy_count = len(policies) * scale
+
+    policies_file, claims_file = tmp / "insurance_policies.csv", tmp / "insurance_claims.csv"
+    with open(policies_file, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(policy_header)
+        for i in range(policy_count):
+            row = list(policies[i % len(policies)])
+            row[0] = f"POL{i:09d}"
+            writer.writerow(row)
+    with open(claims_file, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(claim_header)
+        for i in range(len(claims) * scale):
+            row = list(claims[i % len(claims)])
+            row[0] = f"CLM{i:09d}"
+            row[1] = f"POL{rng.randrange(policy_count):09d}"
+            writer.writerow(row)
+    return policies_file, claims_file
+
+
+def median_ms(db, query: str, runs: int) -> float:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        db.execute_query_columnar(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def same(a: List[tuple], b: List[tuple]) -> bool:
+    def rounded(rows):
+        return [tuple(round(v, 4) if isinstance(v, float) else v for v in row) for row in rows]
+    return rounded(a) == rounded(b)
+
+
+def run_scale(scale: int, runs: int) -> Tuple[bool, Dict[str, int]]:
+    from database.database import InsuranceDatabase
+    from database.db_tool import ingest_csv
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        policies_file, claims_file = write_scaled(tmp, scale)
+        db_file = tmp / "bench.db"
+        db_file.touch()
+        ingest_csv(str(policies_file), str(db_file), "insurance_policies")
+        stats = ingest_csv(str(claims_file), str(db_file), "insurance_claims")
+
+        db = InsuranceDatabase(db_file)
+        ok = True
+        for question, raw, summary in QUERIES:
+            raw_rows = db.execute_query_columnar(raw)[1]
+            summary_rows = db.execute_query_columnar(summary)[1]
+            raw_ms, summary_ms = median_ms(db, raw, runs), median_ms(db, summary, runs)
+            match = same(raw_rows, summary_rows)
+            ok &= match
+            print(f"{scale:>6}x {question:<28} raw {raw_ms:9.2f} ms  summary {summary_ms:7.2f} ms  "
+                  f"speedup {raw_ms / summary_ms:7.1f}x  {'match' if match else 'MISMATCH'}")
+        db.pool.close()
+        return ok, stats["summary_tables"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Raw versus summary table query latency")
+    parser.add_argument("--scales", type=int, nargs="+", default=[10, 100, 10000],
+                        help="Multiples of the bundled CSV row counts")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    settings.LOG_LEVEL = "WARNING"
+    settings.QUERY_CACHE_ENABLED = False
+
+    ok = True
+    for scale in args.scales:
+        scale_ok, summaries = run_scale(scale, args.runs)
+        print(f"{scale:>6}x summary table rows: {summaries}")
+        ok &= scale_ok
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Checks the tracing spans (core/tracing.py) end to end, in-process with a fake LLM.
+
+Sends chat requests through the ASGI app, then:
+1. fetches the spans of one request via /api/chatbot/traces?request_id=... and
+   prints them as a tree (http -> turn -> nodes -> LLM / tool / SQL)
+2. prints the mean time per stage from /metrics, slowest first
+3. compares throughput with tracing on and off
+
+Run from the backend directory:
+    python -m benchmarks.tracing --requests 200 --concurrency 16 --latency 0.05
+"""
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from typing import Dict, List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+os.environ["TRACES_ENDPOINT_ENABLED"] = "true"
+
+import httpx
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import fake_llm_factory
+
+QUESTIONS = [
+    "How many policies do we have per region?",
+    "What are the total claims by region?",
+    "Hello, what can you do?",
+]
+
+
+async def load(client: httpx.AsyncClient, requests: int, concurrency: int) -> float:
+    pending = iter(range(requests))
+
+    async def worker():
+        for i in pending:
+            response = await client.post("/api/chatbot/chat", json={
+                "session_id": f"trace-{i}", "user_id": "bench_user", "input_query": QUESTIONS[i % len(QUESTIONS)]})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+def print_tree(spans: List[Dict]):
+    children: Dict = {}
+    for span in spans:
+        children.setdefault(span["parent_id"], []).append(span)
+    ids = {span["span_id"] for span in spans}
+
+    def walk(span: Dict, depth: int):
+        extra = {k: v for k, v in span["attributes"].items() if k in ("rows", "cache_hit", "node", "step")}
+        print(f"  {'  ' * depth}{span['kind']:<5} {span['name']:<28} {span['duration_ms']:9.2f} ms  {extra}")
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start"]):
+            walk(child, depth + 1)
+
+    roots = [span for span in spans if span["parent_id"] not in ids]
+    for span in sorted(roots, key=lambda s: s["start"]):
+        walk(span, 0)
+
+
+async def run(requests: int, concurrency: int) -> Dict[str, float]:
+    import main
+    from core.tracing import tracer
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        response = await client.post("/api/chatbot/chat", headers={"X-Request-ID": "trace-demo"}, json={
+            "session_id": "trace-demo", "user_id": "bench_user", "input_query": QUESTIONS[1]})
+        assert response.headers["X-Request-ID"] == "trace-demo"
+        spans = (await client.get("/api/chatbot/traces", params={"request_id": "trace-demo"})).json()["spans"]
+        print(f"1. spans of request trace-demo ({len(spans)}):")
+        print_tree(spans)
+
+        throughput = {}
+        for enabled in (True, False):
+            tracer.enabled = enabled
+            throughput[enabled] = await load(client, requests, concurrency)
+        tracer.enabled = True
+
+        metrics = (await client.get("/metrics")).text
+    latency = tracer.histograms.snapshot()
+    print("2. mean time per stage (from the histograms):")
+    for key, series in sorted(latency.items(), key=lambda item: -item[1]["mean_ms"]):
+        print(f"  {key:<36} n={series['count']:<6} mean={series['mean_ms']:9.2f} ms")
+    print(f"   /metrics: {len(metrics.splitlines())} lines")
+    return throughput
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tracing spans, metrics endpoint and overhead")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds per fake LLM call")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    set_llm_factory(fake_llm_factory(latency=args.latency))
+    import agents.sql_memo
+    agents.sql_memo.sql_memo = None
+
+    throughput = asyncio.run(run(args.requests, args.concurrency))
+    overhead = (throughput[False] - throughput[True]) / throughput[False] * 100
+    print(f"3. throughput: tracing on {throughput[True]:.1f}/s, off {throughput[False]:.1f}/s "
+          f"(overhead {overhead:.1f}%)")
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Checks the per-request LLM usage accounting and budgets (agents/usage.py), in-process with a fake LLM.
+
+For each graph variant:
+1. a normal data question: prints its calls and tokens per model
+2. a runaway question, for which the fake query model keeps calling
+   execute_query and never answers: without a budget the agent loop only stops
+   at create_agent's recursion limit (10000 steps), so the turn is cancelled
+   after --unbounded-s; with a budget it ends early with a graceful answer
+Then checks the per-session and per-user totals of the usage ledger.
+
+Run from the backend directory:
+    python -m benchmarks.usage_budget --max-calls 8 --unbounded-s 2
+"""
+import os
+import sys
+import asyncio
+import logging
+import argparse
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "fake-key")
+os.environ["LOG_LEVEL"] = "WARNING"
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+from agents.llm import set_llm_factory
+from benchmarks.fake_llm import QUERY_MODEL_MARKER, _last_user_text, _tool_call, fake_llm_factory, insurance_script
+from core.settings import settings
+
+GRAPHS = ["graph", "graph1", "graph_single_call"]
+NORMAL_QUESTION = "What are the total claims by region?"
+RUNAWAY_QUESTION = "Keep checking the claims by region again and again"
+RUNAWAY_MARKER = "again and again"
+runaway_calls = 0
+
+
+def runaway_script(model_id: str, messages: List[BaseMessage]) -> AIMessage:
+    """insurance_script, except that the query model never stops querying for runaway questions"""
+    global runaway_calls
+    if QUERY_MODEL_MARKER in model_id and RUNAWAY_MARKER in _last_user_text(messages):
+        runaway_calls += 1
+        return _tool_call("execute_query", {"sql_query": "SELECT COUNT(*) FROM insurance_claims"})
+    return insurance_script(model_id, messages)
+
+
+async def run(max_calls: int, unbounded_s: float) -> bool:
+    from services.chatbot_service import ChatbotService
+
+    ok = True
+    for graph in GRAPHS:
+        settings.ACTIVE_GRAPH = graph
+        service = ChatbotService()
+        print(f"{graph}:")
+
+        response, usage = await service.process_message_with_usage(f"{graph}-normal", "bench_user", NORMAL_QUESTION)
+        models = ", ".join(f"{model}={counts['calls']}" for model, counts in usage["by_model"].items())
+        print(f"  normal   calls={usage['calls']:<3} tokens={usage['total_tokens']:<6} ({models})")
+        ok &= usage["calls"] > 0 and usage["total_tokens"] > 0 and usage["budget_stop"] is None
+
+        budgets = settings.LLM_MAX_CALLS_PER_REQUEST, settings.LLM_MAX_TOKENS_PER_REQUEST
+        settings.LLM_MAX_CALLS_PER_REQUEST = settings.LLM_MAX_TOKENS_PER_REQUEST = 0
+        start_calls = runaway_calls
+        try:
+            # The turn itself, not the shielded caller, so the timeout cancels it
+            await asyncio.wait_for(service._run_turn(f"{graph}-unbounded", "bench_user", RUNAWAY_QUESTION), unbounded_s)
+            print("  runaway without budget: finished?!")
+            ok = False
+        except asyncio.TimeoutError:
+            print(f"  runaway without budget: still looping after {unbounded_s:.0f}s, "
+                  f"{runaway_calls - start_calls} query model calls")
+
+        settings.LLM_MAX_CALLS_PER_REQUEST = max_calls
+        settings.LLM_MAX_TOKENS_PER_REQUEST = budgets[1]
+        response, usage = await service.process_message_with_usage(f"{graph}-runaway", "bench_user", RUNAWAY_QUESTION)
+        print(f"  runaway with budget    calls={usage['calls']:<3} tokens={usage['total_tokens']:<6} "
+              f"stop={usage['budget_stop']!r}")
+        print(f"    answer: {response[:100]}")
+        ok &= usage["calls"] <= max_calls and usage["budget_stop"] is not None and bool(response)
+
+        totals = service.usage_for_user("bench_user")
+        session = service.usage_for_session(f"{graph}-runaway")
+        print(f"  ledger   user turns={totals['turns']} calls={totals['calls']} budget_stops={totals['budget_stops']}")
+        ok &= totals["turns"] == 2 and session["turns"] == 1 and totals["budget_stops"] == 1
+        settings.LLM_MAX_CALLS_PER_REQUEST = budgets[0]
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-request LLM usage accounting and budgets")
+    parser.add_argument("--max-calls", type=int, default=8, help="LLM call budget for the runaway turns")
+    parser.add_argument("--unbounded-s", type=float, default=2.0, help="Seconds before the unbudgeted runaway turn is cancelled")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    set_llm_factory(fake_llm_factory(responder=runaway_script))
+    import agents.sql_memo
+    agents.sql_memo.sql_memo = None
+
+    ok = asyncio.run(run(args.max_calls, args.unbounded_s))
+    print("OK" if ok else "FAILED")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     # App info
@@ -17,6 +17,114 @@ class Settings(BaseSettings):
     # Logging
     LOG_LEVEL: str = "DEBUG"
 
+    # Agent graph used by ChatbotService (agents/registry.py): "graph", "graph1" or "graph_single_call"
+    ACTIVE_GRAPH: str = "graph1"
+    GRAPH_WARMUP: bool = True
+
+    # Routing (agents/graph.py): local classifier before the routing LLM call
+    FAST_ROUTER_ENABLED: bool = True
+    FAST_ROUTER_THRESHOLD: float = 0.8
+    # Start the query agent concurrently with the routing LLM call (wasted work when routing says no)
+    SPECULATIVE_QUERY_ENABLED: bool = False
+
+    # Tracing spans for requests, graph nodes, LLM calls, tools and SQL (core/tracing.py)
+    TRACING_ENABLED: bool = True
+    TRACE_BUFFER_SIZE: int = 5000
+    TRACE_JSONL_PATH: str = ""  # append finished spans to this JSONL file, "" = off
+    TRACE_JSONL_FLUSH_INTERVAL_S: float = 1.0
+    # GET /api/chatbot/traces returns raw spans (SQL text, session ids): off unless debugging
+    TRACES_ENDPOINT_ENABLED: bool = False
+
+    # SQLite read connection pool (database/pool.py)
+    DB_POOL_SIZE: int = 8
+    DB_POOL_ACQUIRE_TIMEOUT_S: float = 10.0
+    DB_QUERY_TIMEOUT_MS: int = 5000
+    DB_QUERY_MAX_INSTRUCTIONS: int = 100_000_000  # SQLite VM instructions per query, 0 = unlimited
+    DB_CACHE_SIZE_KB: int = 16384
+    DB_MMAP_SIZE: int = 256 * 1024 * 1024
+
+    # Guard for LLM-written SQL (database/sql_guard.py)
+    DB_GUARD_ENABLED: bool = True
+    DB_GUARD_MAX_SCAN_ROWS: int = 20_000_000  # estimated rows visited by a plan with an unindexed full scan
+    DB_GUARD_SCAN_ACTION: str = "reject"  # "reject", "warn" (run and flag in metadata) or "off"
+    DB_GUARD_MAX_RESULT_ROWS: int = 100_000
+
+    # SQL result cache (database/database.py)
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_MAX_ENTRIES: int = 256
+    QUERY_CACHE_MAX_BYTES: int = 16 * 1024 * 1024
+
+    # execute_query tool results sent to the LLM
+    TOOL_RESULT_FORMAT: str = "columnar"  # "columnar" (columns + row lists) or "records" (list of dicts)
+    TOOL_RESULT_MAX_ROWS: int = 50
+    TOOL_RESULT_MAX_BYTES: int = 16000
+    RESULT_STORE_MAX_ENTRIES: int = 128
+    RESULT_STORE_TTL_S: float = 600.0
+    RESULT_STORE_MAX_BYTES: int = 64 * 1024 * 1024  # approximate, full results kept for fetch_result_page
+
+    # Question -> SQL memo that lets repeated questions skip the query agent LLM
+    SQL_MEMO_ENABLED: bool = True
+    SQL_MEMO_PATH: str = "database/sql_memo.json"
+    SQL_MEMO_MAX_ENTRIES: int = 2000
+    SQL_MEMO_SIMILARITY_ENABLED: bool = False
+    SQL_MEMO_SIMILARITY_THRESHOLD: float = 0.9
+    SQL_MEMO_FLUSH_DELAY_S: float = 2.0  # changes are written to the file in the background after this delay
+
+    # Chat session histories: "memory" (services/session_store.py, one process) or
+    # "sqlite" (services/sqlite_session_store.py, shared by all workers on the host)
+    SESSION_STORE_BACKEND: str = "memory"
+    SESSION_SQLITE_PATH: str = "database/sessions.db"
+    SESSION_SQLITE_CACHE_SESSIONS: int = 1000
+    SESSION_MAX_COUNT: int = 10000
+    SESSION_TTL_S: float = 3600.0
+    SESSION_MAX_BYTES: int = 512 * 1024
+    SESSION_STORE_MAX_BYTES: int = 256 * 1024 * 1024
+    SESSION_EVICTION_INTERVAL_S: float = 60.0
+
+    # /chat/batch: items processed concurrently per batch and batch size limit
+    BATCH_DEFAULT_CONCURRENCY: int = 8
+    BATCH_MAX_CONCURRENCY: int = 32
+    BATCH_MAX_ITEMS: int = 10000
+
+    # History compaction before each graph run (services/history_compaction.py)
+    HISTORY_COMPACTION_ENABLED: bool = True
+    HISTORY_TOKEN_BUDGET: int = 2000
+    HISTORY_SUMMARY_MAX_TOKENS: int = 400
+
+    # Schema sections of the agent prompts (agents/schema_prompt.py): only the tables and
+    # columns relevant to the question when slicing, every one otherwise
+    SCHEMA_PROMPT_SLICING: bool = True
+    SCHEMA_VALUE_MAX_DISTINCT: int = 12  # text columns with at most this many values list them
+    SCHEMA_CONTEXT_MESSAGES: int = 3  # user messages matched against the schema
+
+    # Timeouts, retries and hedging around every LLM call (agents/call_policy.py)
+    LLM_CALL_POLICY_ENABLED: bool = True
+    LLM_TIMEOUT_S: float = 60.0  # per attempt; 0 disables
+    LLM_TIMEOUTS_BY_MODEL: Dict[str, float] = {"gemini-2.5-flash": 30.0, "gemini-2.5-pro": 90.0}
+    LLM_MAX_RETRIES: int = 2
+    LLM_RETRY_BACKOFF_S: float = 0.5
+    LLM_RETRY_MAX_BACKOFF_S: float = 8.0
+    LLM_HEDGE_ENABLED: bool = False
+    LLM_HEDGE_PERCENTILE: float = 95.0
+    LLM_HEDGE_MIN_SAMPLES: int = 20
+    LLM_HEDGE_DELAY_S: float = 5.0
+
+    # Per-model concurrency pools and wait queues for LLM calls (agents/llm_scheduler.py).
+    # Caps the LLM calls in flight per model at the pool size; calls beyond LLM_QUEUE_MAX_DEPTH
+    # waiting ones fail with QueueFull (/chat answers 429 with Retry-After), so with the defaults
+    # about 80 flash-bound chat turns can be in flight per worker. Size these to the provider quota.
+    LLM_SCHEDULER_ENABLED: bool = True
+    LLM_MAX_CONCURRENCY: int = 8
+    LLM_MAX_CONCURRENCY_BY_MODEL: Dict[str, int] = {"gemini-2.5-flash": 16, "gemini-2.5-pro": 4}
+    LLM_QUEUE_MAX_DEPTH: int = 64
+    LLM_QUEUE_MAX_WAIT_S: float = 15.0  # interactive requests
+    LLM_BATCH_QUEUE_MAX_WAIT_S: float = 120.0
+
+    # LLM usage per chat turn (agents/usage.py); 0 disables a budget
+    LLM_MAX_CALLS_PER_REQUEST: int = 12
+    LLM_MAX_TOKENS_PER_REQUEST: int = 150_000
+    USAGE_LEDGER_MAX_KEYS: int = 10000
+
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
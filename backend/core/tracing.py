@@ -0,0 +1,299 @@
+import json
+import time
+import uuid
+import atexit
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from typing import Any, Deque, Dict, Iterator, List, Optional, Protocol, Tuple
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is +Inf
+LATENCY_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+@dataclass
+class Span:
+    """One timed operation, tied to the request and session it ran for"""
+    kind: str  # "http", "turn", "node", "llm", "tool" or "sql"
+    name: str
+    start: float  # epoch seconds
+    duration_ms: float
+    request_id: Optional[str] = None
+    session_id: Optional[str] = None
+    status: str = "ok"
+    span_id: str = field(default_factory=lambda: uuid.uuid4().hex[:16])
+    parent_id: Optional[str] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class RequestContext:
+    request_id: str
+    session_id: Optional[str] = None
+
+
+class SpanSink(Protocol):
+    """Receives every finished span; must be thread-safe (SQL spans end in worker threads)"""
+
+    def export(self, span: Span) -> None: ...
+
+
+class RingBufferSink:
+    """Keeps the most recent `capacity` spans in memory"""
+
+    def __init__(self, capacity: int = 5000):
+        self._spans: Deque[Span] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, request_id: Optional[str] = None, session_id: Optional[str] = None,
+              limit: int = 200) -> List[Span]:
+        """Most recent matching spans, oldest first"""
+        with self._lock:
+            spans = list(self._spans)
+        if request_id:
+            spans = [span for span in spans if span.request_id == request_id]
+        if session_id:
+            spans = [span for span in spans if span.session_id == session_id]
+        return spans[-limit:] if limit else spans
+
+    def __len__(self) -> int:
+        return len(self._spans)
+
+
+class JsonlFileSink:
+    """
+    Appends each span as one JSON line. export only queues the span; a writer
+    thread serializes and writes the queue every `flush_interval_s` (and on
+    close, at exit), so callers on the event loop never touch the file.
+    Spans beyond `max_pending` unwritten ones are dropped and counted.
+    """
+
+    def __init__(self, path: str, flush_interval_s: float = 1.0, max_pending: int = 50000):
+        self.path = path
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.dropped = 0
+        self._file = open(path, "a", encoding="utf-8")
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._run, name="trace-jsonl-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(span)
+
+    def _run(self):
+        while not self._closed.wait(self.flush_interval_s):
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._pending = self._pending, []
+        if spans:
+            self._file.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+            self._file.flush()
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._writer.join()
+        self.flush()
+        self._file.close()
+
+
+class LatencyHistograms:
+    """Cumulative latency histograms and error counts per (span kind, span name)"""
+
+    def __init__(self, buckets_ms: Tuple[float, ...] = LATENCY_BUCKETS_MS):
+        self.buckets_ms = buckets_ms
+        # (kind, name) -> [bucket counts..., +Inf count], sum, count, errors
+        self._series: Dict[Tuple[str, str], List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, kind: str, name: str, duration_ms: float, error: bool = False):
+        with self._lock:
+            series = self._series.get((kind, name))
+            if series is None:
+                series = self._series[(kind, name)] = [[0] * (len(self.buckets_ms) + 1), 0.0, 0, 0]
+            index = next((i for i, bound in enumerate(self.buckets_ms) if duration_ms <= bound), len(self.buckets_ms))
+            series[0][index] += 1
+            series[1] += duration_ms
+            series[2] += 1
+            series[3] += error
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """"kind/name" -> count, errors, mean and cumulative bucket counts"""
+        with self._lock:
+            items = [(key, [list(series[0]), *series[1:]]) for key, series in sorted(self._series.items())]
+        snapshot = {}
+        for (kind, name), (counts, total, count, errors) in items:
+            cumulative, buckets = 0, {}
+            for bound, bucket_count in zip([*self.buckets_ms, "+Inf"], counts):
+                cumulative += bucket_count
+                buckets[str(bound)] = cumulative
+            snapshot[f"{kind}/{name}"] = {
+                "count": count, "errors": errors, "sum_ms": round(total, 3),
+                "mean_ms": round(total / count, 3) if count else 0.0, "buckets": buckets,
+            }
+        return snapshot
+
+    def prometheus(self, metric: str = "chatbot_span_duration_ms",
+                   errors_metric: Optional[str] = "chatbot_span_errors_total") -> str:
+        """Histograms (and error counters unless errors_metric is None) in the Prometheus text exposition format"""
+        lines = [
+            f"# HELP {metric} Latency in milliseconds, by kind and name",
+            f"# TYPE {metric} histogram",
+        ]
+        errors = [
+            f"# HELP {errors_metric} Observations that ended with an error",
+            f"# TYPE {errors_metric} counter",
+        ] if errors_metric else []
+        for key, series in self.snapshot().items():
+            kind, name = key.split("/", 1)
+            labels = f'kind="{kind}",name="{_escape_label(name)}"'
+            for bound, count in series["buckets"].items():
+                lines.append(f'{metric}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{metric}_sum{{{labels}}} {series['sum_ms']}")
+            lines.append(f"{metric}_count{{{labels}}} {series['count']}")
+            if errors_metric:
+                errors.append(f"{errors_metric}{{{labels}}} {series['errors']}")
+        return "\n".join(lines + errors) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_request: ContextVar[Optional[RequestContext]] = ContextVar("trace_request", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("trace_span", default=None)
+
+
+def _reset(var: ContextVar, token: Any):
+    try:
+        var.reset(token)
+    except ValueError:
+        # An async generator (streaming turn) was closed from another context
+        pass
+
+
+class Tracer:
+    """
+    Records spans into pluggable sinks and latency histograms. The request and
+    the enclosing span are carried in context variables, so spans opened in
+    tasks and worker threads (asyncio.to_thread copies the context) are tied to
+    the request that started them.
+    """
+
+    def __init__(self, sinks: Optional[List[SpanSink]] = None, enabled: bool = True):
+        self.enabled = enabled
+        self.sinks: List[SpanSink] = list(sinks or [])
+        self.histograms = LatencyHistograms()
+
+    @staticmethod
+    def current_request() -> Optional[RequestContext]:
+        return _request.get()
+
+    @staticmethod
+    def current_span_id() -> Optional[str]:
+        return _current_span.get()
+
+    @contextmanager
+    def request(self, request_id: Optional[str] = None, session_id: Optional[str] = None,
+                kind: str = "turn", name: str = "chat", **attributes: Any) -> Iterator[RequestContext]:
+        """
+        Binds a request (and session) to the context and times it as one span.
+        Nested calls keep the outer request id and fill in the session id.
+        """
+        outer = _request.get()
+        if request_id is None:
+            request_id = outer.request_id if outer else uuid.uuid4().hex
+        context = RequestContext(request_id, session_id or (outer.session_id if outer else None))
+        token = _request.set(context)
+        try:
+            with self.span(kind, name, **attributes):
+                yield context
+        finally:
+            _reset(_request, token)
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+        """Times the block; yields the attribute dict so the block can add results (rows, cache hit...)"""
+        if not self.enabled:
+            yield attributes
+            return
+
+        span_id = uuid.uuid4().hex[:16]
+        parent_id = _current_span.get()
+        token = _current_span.set(span_id)
+        start, started = time.time(), time.perf_counter()
+        status = "ok"
+        try:
+            yield attributes
+        except BaseException as e:
+            status = "error"
+            attributes["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _reset(_current_span, token)
+            self.record(kind, name, start, (time.perf_counter() - started) * 1000, status=status,
+                        attributes=attributes, span_id=span_id, parent_id=parent_id)
+
+    def record(self, kind: str, name: str, start: float, duration_ms: float, status: str = "ok",
+               attributes: Optional[Dict[str, Any]] = None, span_id: Optional[str] = None,
+               parent_id: Optional[str] = None, request: Optional[RequestContext] = None):
+        """Exports a finished span (for operations timed elsewhere, e.g. by callbacks)"""
+        if not self.enabled:
+            return
+        request = request or _request.get()
+        span = Span(
+            kind=kind, name=name, start=start, duration_ms=round(duration_ms, 3),
+            request_id=request.request_id if request else None,
+            session_id=request.session_id if request else None,
+            status=status, span_id=span_id or uuid.uuid4().hex[:16], parent_id=parent_id,
+            attributes=attributes or {},
+        )
+        self.histograms.observe(kind, name, duration_ms, error=status != "ok")
+        for sink in self.sinks:
+            try:
+                sink.export(span)
+            except Exception as e:
+                logger.warning("Span sink %s failed: %s", type(sink).__name__, e)
+
+    @property
+    def buffer(self) -> Optional[RingBufferSink]:
+        return next((sink for sink in self.sinks if isinstance(sink, RingBufferSink)), None)
+
+
+def _default_sinks() -> List[SpanSink]:
+    sinks: List[SpanSink] = [RingBufferSink(settings.TRACE_BUFFER_SIZE)]
+    if settings.TRACE_JSONL_PATH:
+        sinks.append(JsonlFileSink(settings.TRACE_JSONL_PATH, flush_interval_s=settings.TRACE_JSONL_FLUSH_INTERVAL_S))
+    return sinks
+
+
+tracer = Tracer(_default_sinks(), enabled=settings.TRACING_ENABLED)
@@ -1,8 +1,18 @@
+import os
+import asyncio
+import hashlib
 import sqlite3
 import logging
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List
-from utils.logging_utils import boxed_log
+from typing import Any, Dict, List, Optional, Tuple
+from core.settings import settings
+from core.tracing import tracer
+from database.pool import ConnectionPool
+from database.query_cache import QueryResultCache, is_read_only
+from database.sql_guard import QueryRejectedError, SqlGuard
+from utils.logging_utils import Preview, boxed_log
 
 logger = logging.getLogger(__name__)
 
@@ -14,34 +24,204 @@ class InsuranceDatabase:
             db_path = BASE_DIR / "insurance.db"
 
         self.db_path = db_path
-        self._connection = None
+        self.pool = ConnectionPool(
+            db_path,
+            size=settings.DB_POOL_SIZE,
+            acquire_timeout_s=settings.DB_POOL_ACQUIRE_TIMEOUT_S,
+            query_timeout_ms=settings.DB_QUERY_TIMEOUT_MS,
+            max_instructions=settings.DB_QUERY_MAX_INSTRUCTIONS,
+            cache_size_kb=settings.DB_CACHE_SIZE_KB,
+            mmap_size=settings.DB_MMAP_SIZE,
+        )
+        # Dedicated connection for version probes: PRAGMA data_version is per connection
+        self._version_connection = None
+        self._version_lock = threading.Lock()
+        self._schema_fingerprint = None
+        self.cache = QueryResultCache(
+            max_entries=settings.QUERY_CACHE_MAX_ENTRIES,
+            max_bytes=settings.QUERY_CACHE_MAX_BYTES,
+        ) if settings.QUERY_CACHE_ENABLED else None
+        self.guard = SqlGuard(
+            max_scan_rows=settings.DB_GUARD_MAX_SCAN_ROWS,
+            scan_action=settings.DB_GUARD_SCAN_ACTION,
+            max_result_rows=settings.DB_GUARD_MAX_RESULT_ROWS,
+        ) if settings.DB_GUARD_ENABLED else None
 
-    def get_connection(self):
-        if self._connection is None:
-            self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self._connection.row_factory = sqlite3.Row
-        return self._connection
+    def connect_readonly(self) -> sqlite3.Connection:
+        """A new read-only connection outside the pool (metadata reads that must never wait for it)"""
+        return sqlite3.connect(f"{Path(self.db_path).resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+
+    def _probe_connection(self) -> sqlite3.Connection:
+        """The version probe connection (call with _version_lock held)"""
+        if self._version_connection is None:
+            self._version_connection = self.connect_readonly()
+        return self._version_connection
+
+    def _probe(self, *statements: str) -> List[Any]:
+        """Runs single-value PRAGMA statements on the version probe connection"""
+        with self._version_lock:
+            conn = self._probe_connection()
+            return [conn.execute(statement).fetchone()[0] for statement in statements]
     
+    def data_version(self) -> Tuple[int, int, int]:
+        """
+        Token that changes whenever the database content changes:
+        PRAGMA data_version (commits by other connections/processes),
+        PRAGMA user_version (bumped by db_tool on ingest) and the file mtime.
+        """
+        data_version, user_version = self._probe("PRAGMA data_version", "PRAGMA user_version")
+        try:
+            mtime = os.stat(self.db_path).st_mtime_ns
+        except OSError:
+            mtime = 0
+        return data_version, user_version, mtime
+
+    def schema_fingerprint(self) -> str:
+        """
+        Hash of the table/index definitions in sqlite_master, changes only when the schema changes.
+        Read on the probe connection: never waits for a pooled connection.
+        """
+        with self._version_lock:
+            conn = self._probe_connection()
+            schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+            if self._schema_fingerprint is None or self._schema_fingerprint[0] != schema_version:
+                rows = conn.execute("SELECT type, name, sql FROM sqlite_master ORDER BY type, name").fetchall()
+                digest = hashlib.sha1(repr([tuple(row) for row in rows]).encode("utf-8")).hexdigest()
+                self._schema_fingerprint = (schema_version, digest)
+            return self._schema_fingerprint[1]
+
+    def invalidate_cache(self):
+        """Drop cached results (call after writing to the database in-process)"""
+        if self.cache is not None:
+            self.cache.invalidate()
+
     def execute_query(self, query: str, params: tuple = None) -> List[Dict]:
+        rows, _ = self.execute_query_with_metadata(query, params)
+        return rows
+
+    def execute_query_with_metadata(self, query: str, params: tuple = None) -> Tuple[List[Dict], Dict[str, Any]]:
+        """Runs a query and returns (rows, metadata), metadata tells whether the result came from the cache"""
+        columns, rows, metadata = self.execute_query_columnar(query, params)
+        return [dict(zip(columns, row)) for row in rows], metadata
+
+    async def aexecute_query_with_metadata(self, query: str, params: tuple = None) -> Tuple[List[Dict], Dict[str, Any]]:
+        """Async variant of execute_query_with_metadata"""
+        columns, rows, metadata = await self.aexecute_query_columnar(query, params)
+        return [dict(zip(columns, row)) for row in rows], metadata
+
+    def execute_query_columnar(self, query: str, params: tuple = None) -> Tuple[Tuple[str, ...], List[tuple], Dict[str, Any]]:
+        """Runs a query and returns (column names, row tuples, metadata)"""
+        with tracer.span("sql", "execute_query", statement=query[:500]) as span:
+            cache_key, cached = self._cache_lookup(query, params)
+            span["cache_hit"] = cached is not None
+            if cached is not None:
+                span["rows"] = len(cached[1])
+                return cached
+
+            with self.pool.acquire() as conn:
+                columns, rows, guard_info = self._run(conn, query, params)
+            span["rows"] = len(rows)
+            return self._store(cache_key, columns, rows, guard_info)
+
+    async def aexecute_query_columnar(self, query: str, params: tuple = None) -> Tuple[Tuple[str, ...], List[tuple], Dict[str, Any]]:
+        """Async variant: waits for a pooled connection and runs the query off the event loop"""
+        with tracer.span("sql", "execute_query", statement=query[:500]) as span:
+            cache_key, cached = self._cache_lookup(query, params)
+            span["cache_hit"] = cached is not None
+            if cached is not None:
+                span["rows"] = len(cached[1])
+                return cached
+
+            waited = time.perf_counter()
+            async with self.pool.acquire_async() as conn:
+                span["pool_wait_ms"] = round((time.perf_counter() - waited) * 1000, 3)
+                columns, rows, guard_info = await asyncio.to_thread(self._run, conn, query, params)
+            span["rows"] = len(rows)
+            return self._store(cache_key, columns, rows, guard_info)
+
+    def _cache_lookup(self, query: str, params: tuple) -> Tuple[Any, Optional[Tuple[Tuple[str, ...], List[tuple], Dict[str, Any]]]]:
+        """Returns (cache key or None when not cacheable, cached (columns, rows, metadata) or None)"""
+        if self.cache is None or not is_read_only(query):
+            return None, None
+
+        self.cache.check_version(self.data_version())
+        cache_key = self.cache.make_key(query, params)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+
+        columns, rows = cached
+        boxed_log("SQL Query (cached): %s", logger, "info", query)
+        metadata = {"cache_hit": True}
+        return cache_key, (columns, rows, metadata)
+
+    def _run(self, conn: sqlite3.Connection, query: str,
+             params: tuple) -> Tuple[Tuple[str, ...], List[tuple], Dict[str, Any]]:
+        """Runs one statement, through the SQL guard when enabled; returns (columns, rows, guard plan summary)"""
+        denied: List[Tuple[str, Optional[str]]] = []
+        start = time.monotonic()
         try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
+            # Lazy %-args: nothing is formatted unless INFO is enabled
+            boxed_log("SQL Query: %s", logger, "info", query)
+            boxed_log("SQL Params: %s", logger, "info", params)
 
-            boxed_log(f"SQL Query: {query}", logger, level="info")
-            boxed_log(f"SQL Params: {params}", logger, level="info")
+            guard_info: Dict[str, Any] = {}
+            if self.guard is not None:
+                table_rows = self.guard.table_rows(conn, self.data_version())
+                conn.set_authorizer(self.guard.authorizer(denied))
+                guard_info = self.guard.check_plan(conn, query, params, table_rows)
 
+            cursor = conn.cursor()
             if params:
                 cursor.execute(query, params)
             else:
                 cursor.execute(query)
-            
-            rows = cursor.fetchall()
-            boxed_log(f"Query Results: {[dict(row) for row in rows]}", logger, level="info")
-            return [dict(row) for row in rows]
+
+            rows = self.guard.fetch_rows(cursor) if self.guard is not None else cursor.fetchall()
+            columns = tuple(column[0] for column in cursor.description or ())
+            boxed_log("Query Results (%d rows) %s: %s", logger, "info", len(rows), columns, Preview(rows))
+            return columns, rows, guard_info
+        except QueryRejectedError as e:
+            logger.warning("SQL guard rejected query (%s): %s", e.code, e.message)
+            raise
+        except sqlite3.Error as e:
+            rejection = self.guard and self.guard.rejection(
+                e, denied, (time.monotonic() - start) * 1000, self.pool.query_timeout_ms, self.pool.max_instructions)
+            if rejection:
+                logger.warning("SQL guard rejected query (%s): %s", rejection.code, rejection.message)
+                raise rejection from e
+            self._log_failure(e, query, params)
+            raise
         except Exception as e:
-            logger.error("Database query error: %s", e)
-            logger.error("Query: %s", query)
-            logger.error("Params: %s", params)
+            self._log_failure(e, query, params)
             raise
+        finally:
+            if self.guard is not None:
+                conn.set_authorizer(None)
+
+    @staticmethod
+    def _log_failure(e: Exception, query: str, params: tuple):
+        logger.error("Database query error: %s", e)
+        logger.error("Query: %s", query)
+        logger.error("Params: %s", params)
+
+    def _store(self, cache_key: Any, columns: Tuple[str, ...], rows: List[tuple],
+               guard_info: Optional[Dict[str, Any]] = None) -> Tuple[Tuple[str, ...], List[tuple], Dict[str, Any]]:
+        # Cached rows are shared between callers; pool connections return immutable tuples
+        metadata: Dict[str, Any] = {"cache_hit": False}
+        if guard_info and guard_info.get("flagged"):
+            # Only flagged plans are reported, to keep tool output small
+            metadata["guard"] = guard_info
+        if cache_key is not None:
+            self.cache.put(cache_key, columns, rows)
+        return columns, rows, metadata
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool, query result cache and SQL guard counters (None when disabled)"""
+        return {
+            "pool": self.pool.stats(),
+            "query_cache": self.cache.stats() if self.cache is not None else None,
+            "guard": self.guard.stats() if self.guard is not None else None,
+        }
 
 db = InsuranceDatabase()
\ No newline at end of file
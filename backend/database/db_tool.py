@@ -1,8 +1,24 @@
+import re
+import csv
+import itertools
 import sqlite3
+import time
 import pandas as pd
 import os
 import argparse
 import sys
+import yaml
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Intended schema of each table, with table descriptions and column comments
+SCHEMA_FILE = Path(__file__).parent / "schema.sql"
+# Aggregate tables rebuilt whenever one of their source tables is loaded
+SUMMARY_TABLES_FILE = Path(__file__).parent / "summary_tables.yaml"
+
+_CREATE_TABLE = re.compile(r"((?:^--[^\n]*\n)*)CREATE TABLE\s+(\w+)\s*\((.*?)\n\);", re.S | re.I | re.M)
+_COLUMN = re.compile(r"^\s*(\w+)\s+(\w+)([^,-]*),?\s*(?:--\s*(.*))?$")
 
 
 def create_db(db_name: str):
@@ -14,6 +30,17 @@ def create_db(db_name: str):
     print(f"Database '{db_name}' created successfully.")
 
 
+def bump_data_version(conn: sqlite3.Connection) -> int:
+    """
+    Increments PRAGMA user_version so running apps drop cached query results.
+    Returns the new version.
+    """
+    version = conn.execute("PRAGMA user_version").fetchone()[0] + 1
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+    return version
+
+
 def add_table(csv_file: str, db_name: str, table_name: str = None):
     if not os.path.exists(csv_file):
         raise FileNotFoundError(f"CSV file '{csv_file}' not found.")
@@ -28,7 +55,11 @@ def add_table(csv_file: str, db_name: str, table_name: str = None):
     conn = sqlite3.connect(db_name)
 
     df.to_sql(table_name, conn, if_exists="replace", index=False)
+    summaries = refresh_summary_tables(conn, changed=[table_name])
+    bump_data_version(conn)
     print(f"Table '{table_name}' added to '{db_name}' successfully.")
+    for name, count in summaries.items():
+        print(f"Summary table '{name}' refreshed: {count} rows")
 
     # Show sample rows
     sample = conn.execute(f"SELECT * FROM {table_name} LIMIT 5;").fetchall()
@@ -38,6 +69,275 @@ def add_table(csv_file: str, db_name: str, table_name: str = None):
     conn.close()
 
 
+@dataclass
+class ColumnSpec:
+    name: str
+    type: str
+    constraints: str = ""
+    comment: str = ""
+
+
+@dataclass
+class TableSpec:
+    name: str
+    columns: List[ColumnSpec] = field(default_factory=list)
+    primary_key: Optional[str] = None
+    description: str = ""
+
+    def column(self, name: str) -> Optional[ColumnSpec]:
+        return next((column for column in self.columns if column.name == name), None)
+
+
+def schema_from_file(path: Path = SCHEMA_FILE) -> Dict[str, TableSpec]:
+    """
+    Parses the CREATE TABLE statements in a schema file into table specs; the
+    comment lines right above a statement are the table's description
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        text = file.read()
+
+    tables = {}
+    for comments, name, body in _CREATE_TABLE.findall(text):
+        description = "\n".join(line[2:].strip() for line in comments.splitlines())
+        spec = TableSpec(name=name, description=description)
+        for line in body.splitlines():
+            match = _COLUMN.match(line)
+            if not match:
+                continue
+            column = ColumnSpec(name=match[1], type=match[2].upper(),
+                                constraints=match[3].strip(), comment=(match[4] or "").strip())
+            if "PRIMARY KEY" in column.constraints.upper():
+                spec.primary_key = column.name
+            spec.columns.append(column)
+        tables[name] = spec
+    return tables
+
+
+def indexes_from_schema(spec: TableSpec) -> List[Tuple[str, ...]]:
+    """
+    Indexes for the columns agents filter and join on: *_ID columns other than
+    the primary key, and columns whose comment lists their values ('Active', ...)
+    """
+    indexes = []
+    for column in spec.columns:
+        if column.name == spec.primary_key:
+            continue
+        if column.name.upper().endswith("_ID") or column.comment.startswith("'"):
+            indexes.append((column.name,))
+    return indexes
+
+
+def load_index_config(path: str) -> Dict[str, List[Tuple[str, ...]]]:
+    """
+    Index config file (YAML), table name -> list of indexes, each a column or list of columns:
+        insurance_policies: [Customer_ID, Status, [Region, Status]]
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file) or {}
+    return {
+        table: [tuple(index) if isinstance(index, list) else (index,) for index in indexes]
+        for table, indexes in config.items()
+    }
+
+
+def load_summary_config(path: Path = SUMMARY_TABLES_FILE) -> Dict[str, Dict[str, Any]]:
+    """
+    Summary table config (YAML), table name -> source tables and the SELECT that builds it:
+        summary_policies: {sources: [insurance_policies], sql: "SELECT Region, COUNT(*) ... GROUP BY Region"}
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file:
+        config = yaml.safe_load(file) or {}
+    return {
+        name: {"sources": list(entry.get("sources", [])), "sql": entry["sql"].strip().rstrip(";")}
+        for name, entry in config.items()
+    }
+
+
+def _rebuild_summaries(conn: sqlite3.Connection, changed: Optional[Sequence[str]],
+                       config: Dict[str, Dict[str, Any]]) -> Dict[str, int]:
+    """Recreates the summary tables that depend on `changed` (all when None) in the caller's transaction"""
+    existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    refreshed = {}
+    for name, entry in config.items():
+        if changed is not None and not set(entry["sources"]) & set(changed):
+            continue
+        if not set(entry["sources"]) <= existing:
+            # Built once all of its source tables have been loaded
+            continue
+        conn.execute(f"DROP TABLE IF EXISTS {_quote(name)}")
+        conn.execute(f"CREATE TABLE {_quote(name)} AS {entry['sql']}")
+        refreshed[name] = conn.execute(f"SELECT COUNT(*) FROM {_quote(name)}").fetchone()[0]
+    return refreshed
+
+
+def refresh_summary_tables(conn: sqlite3.Connection, changed: Optional[Sequence[str]] = None,
+                           config_path: Path = SUMMARY_TABLES_FILE) -> Dict[str, int]:
+    """
+    Rebuilds the summary tables whose sources include a table in `changed`
+    (every summary table when None) in one transaction, then analyzes them.
+    Returns summary table name -> row count. The caller bumps the data version.
+    """
+    config = load_summary_config(config_path)
+    if not config:
+        return {}
+
+    if conn.in_transaction:
+        conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        refreshed = _rebuild_summaries(conn, changed, config)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    for name in refreshed:
+        conn.execute(f"ANALYZE {_quote(name)}")
+    return refreshed
+
+
+def _infer_type(values: Sequence[str]) -> str:
+    """SQLite type for a column of CSV strings (empty strings are NULLs)"""
+    declared = "INTEGER"
+    for value in values:
+        if value == "":
+            continue
+        try:
+            int(value)
+            continue
+        except ValueError:
+            pass
+        try:
+            float(value)
+            declared = "REAL"
+        except ValueError:
+            return "TEXT"
+    return declared
+
+
+def _chunks(reader: Iterator[List[str]], size: int, width: int) -> Iterator[List[List[Optional[str]]]]:
+    """Rows in lists of at most `size`, empty strings as NULL; the declared column types convert the rest"""
+    chunk = []
+    for line_number, row in enumerate(reader, start=2):
+        if len(row) != width:
+            raise ValueError(f"Line {line_number}: expected {width} fields, got {len(row)}")
+        chunk.append([None if value == "" else value for value in row])
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def ingest_csv(csv_file: str, db_name: str, table_name: str = None, chunk_size: int = 50000,
+               primary_key: str = None, indexes: Optional[List[Tuple[str, ...]]] = None,
+               schema_file: Path = SCHEMA_FILE, wal: bool = True,
+               summary_config: Optional[Path] = SUMMARY_TABLES_FILE) -> Dict[str, Any]:
+    """
+    Streams a CSV into a table with bounded memory: rows are read and inserted
+    chunk by chunk (executemany) inside one transaction that replaces the table,
+    so readers see either the old or the new table.
+
+    Column types and the primary key come from the table's CREATE TABLE in
+    schema_file when present, otherwise types are inferred from the first chunk.
+    Indexes default to the ones derived from that schema. Summary tables built
+    from this table (summary_config) are rebuilt in the same transaction.
+    Afterwards the tables are analyzed, the database switched to WAL and the
+    data version bumped.
+    """
+    if not os.path.exists(csv_file):
+        raise FileNotFoundError(f"CSV file '{csv_file}' not found.")
+
+    if not os.path.exists(db_name):
+        raise FileNotFoundError(f"Database '{db_name}' not found. Please create it first!")
+
+    if table_name is None:
+        table_name = os.path.splitext(os.path.basename(csv_file))[0]
+
+    spec = schema_from_file(schema_file).get(table_name) or TableSpec(name=table_name)
+    primary_key = primary_key or spec.primary_key
+    if indexes is None:
+        indexes = indexes_from_schema(spec)
+
+    start = time.perf_counter()
+    rows = 0
+    conn = sqlite3.connect(db_name, isolation_level=None)
+    try:
+        with open(csv_file, "r", encoding="utf-8", newline="") as file:
+            reader = csv.reader(file)
+            header = next(reader)
+            chunks = _chunks(reader, chunk_size, len(header))
+            first = next(chunks, [])
+
+            types = []
+            for i, name in enumerate(header):
+                column = spec.column(name)
+                types.append(column.type if column else _infer_type([row[i] or "" for row in first]))
+
+            definitions = [f"{_quote(name)} {declared}" for name, declared in zip(header, types)]
+            if primary_key:
+                if primary_key not in header:
+                    raise ValueError(f"Primary key '{primary_key}' is not a column of '{csv_file}'")
+                definitions.append(f"PRIMARY KEY ({_quote(primary_key)})")
+
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f"DROP TABLE IF EXISTS {_quote(table_name)}")
+            conn.execute(f"CREATE TABLE {_quote(table_name)} ({', '.join(definitions)})")
+
+            insert = f"INSERT INTO {_quote(table_name)} VALUES ({', '.join('?' * len(header))})"
+            for chunk in itertools.chain([first], chunks):
+                conn.executemany(insert, chunk)
+                rows += len(chunk)
+
+            # Building indexes after the inserts is much faster than maintaining them row by row
+            for columns in indexes:
+                missing = [column for column in columns if column not in header]
+                if missing:
+                    raise ValueError(f"Index columns {missing} are not columns of '{table_name}'")
+                index_name = _quote(f"idx_{table_name}_{'_'.join(columns)}")
+                conn.execute(f"CREATE INDEX {index_name} ON {_quote(table_name)} "
+                             f"({', '.join(_quote(column) for column in columns)})")
+            loaded = time.perf_counter()
+
+            summaries = _rebuild_summaries(conn, [table_name], load_summary_config(summary_config)) \
+                if summary_config else {}
+            conn.execute("COMMIT")
+        summarized = time.perf_counter()
+
+        for name in [table_name, *summaries]:
+            conn.execute(f"ANALYZE {_quote(name)}")
+        journal_mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0] if wal else None
+        bump_data_version(conn)
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "table": table_name,
+        "rows": rows,
+        "columns": dict(zip(header, types)),
+        "primary_key": primary_key,
+        "indexes": [list(columns) for columns in indexes],
+        "journal_mode": journal_mode,
+        "summary_tables": summaries,
+        "load_s": round(loaded - start, 3),
+        "summary_s": round(summarized - loaded, 3),
+        "total_s": round(elapsed, 3),
+        "rows_per_s": round(rows / elapsed) if elapsed else rows,
+    }
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="SQLite DB Utility: Create DB or add tables from CSV files."
@@ -54,12 +354,57 @@ def main():
     add_parser.add_argument("csv_file", help="Path to the CSV file")
     add_parser.add_argument("db_name", help="Path to the SQLite database")
     add_parser.add_argument("--table", help="Optional table name (defaults to CSV filename)", default=None)
+    add_parser.add_argument("--stream", action="store_true",
+                            help="Chunked streaming ingest with typed columns, primary key, indexes, ANALYZE and WAL")
+    add_parser.add_argument("--chunk-size", type=int, default=50000, help="Rows per executemany batch (--stream)")
+    add_parser.add_argument("--primary-key", default=None, help="Primary key column (--stream, defaults to the schema's)")
+    add_parser.add_argument("--index", action="append", default=None,
+                            help="Index to create, comma-separated columns; repeatable (--stream)")
+    add_parser.add_argument("--index-config", default=None, help="YAML file of indexes per table (--stream)")
+    add_parser.add_argument("--no-wal", action="store_true", help="Keep the current journal mode (--stream)")
+    add_parser.add_argument("--no-summaries", action="store_true",
+                            help="Do not rebuild the summary tables built from this table (--stream)")
+
+    # Subcommand: refresh-summaries
+    summary_parser = subparsers.add_parser("refresh-summaries", help="Rebuild the precomputed summary tables")
+    summary_parser.add_argument("db_name", help="Path to the SQLite database")
+    summary_parser.add_argument("--config", default=SUMMARY_TABLES_FILE, help="Summary table config (YAML)")
 
     args = parser.parse_args()
 
     if args.command == "create-db":
         create_db(args.db_name)
 
+    elif args.command == "add-table" and args.stream:
+        table_name = args.table or os.path.splitext(os.path.basename(args.csv_file))[0]
+        indexes = None
+        if args.index_config:
+            indexes = load_index_config(args.index_config).get(table_name, [])
+        if args.index:
+            indexes = (indexes or []) + [tuple(index.split(",")) for index in args.index]
+
+        stats = ingest_csv(args.csv_file, args.db_name, table_name, chunk_size=args.chunk_size,
+                           primary_key=args.primary_key, indexes=indexes, wal=not args.no_wal,
+                           summary_config=None if args.no_summaries else SUMMARY_TABLES_FILE)
+        print(f"Table '{stats['table']}' loaded into '{args.db_name}': {stats['rows']} rows "
+              f"in {stats['total_s']}s ({stats['rows_per_s']} rows/s)")
+        print(f"Primary key: {stats['primary_key']}  Indexes: {stats['indexes']}  "
+              f"Journal mode: {stats['journal_mode']}")
+        for name, count in stats["summary_tables"].items():
+            print(f"Summary table '{name}' refreshed: {count} rows")
+
+    elif args.command == "refresh-summaries":
+        if not os.path.exists(args.db_name):
+            raise FileNotFoundError(f"Database '{args.db_name}' not found. Please create it first!")
+        conn = sqlite3.connect(args.db_name, isolation_level=None)
+        try:
+            summaries = refresh_summary_tables(conn, config_path=args.config)
+            bump_data_version(conn)
+        finally:
+            conn.close()
+        for name, count in summaries.items():
+            print(f"Summary table '{name}' refreshed: {count} rows")
+
     elif args.command == "add-table":
         add_table(args.csv_file, args.db_name, args.table)
 
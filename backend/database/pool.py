@@ -0,0 +1,186 @@
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# The progress handler runs every N SQLite VM instructions to enforce query timeouts
+PROGRESS_HANDLER_INSTRUCTIONS = 1000
+
+
+class PoolTimeoutError(Exception):
+    """No pooled connection became available in time"""
+
+
+class _PooledConnection:
+    """A read-only connection plus the deadline and instruction budget its progress handler enforces"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.deadline: Optional[float] = None
+        # Progress handler calls left before the checkout runs out of VM instructions
+        self.ticks_left: Optional[int] = None
+        conn.set_progress_handler(self._check_budget, PROGRESS_HANDLER_INSTRUCTIONS)
+
+    def _check_budget(self) -> int:
+        # Non-zero return value interrupts the running statement
+        if self.ticks_left is not None:
+            self.ticks_left -= 1
+            if self.ticks_left < 0:
+                return 1
+        return int(self.deadline is not None and time.monotonic() > self.deadline)
+
+
+class ConnectionPool:
+    """
+    Checkout/checkin pool of read-only SQLite connections (mode=ro URI).
+    Connections are opened lazily up to `size`; each statement run through a
+    checked-out connection is interrupted once it exceeds `query_timeout_ms`, or
+    once the checkout has run `max_instructions` SQLite VM instructions (a
+    budget that, unlike wall time, does not stretch when the machine is loaded).
+    Async waiters park on futures rather than threads, so a full pool never
+    starves the executor that runs the queries.
+
+    The pool never writes to the database file, not even its journal mode:
+    db_tool switches the database to WAL when it loads data, so readers run
+    alongside later ingests.
+    """
+
+    def __init__(self, db_path, size: int = 8, acquire_timeout_s: float = 10.0,
+                 query_timeout_ms: int = 5000, max_instructions: int = 0, cache_size_kb: int = 16384,
+                 mmap_size: int = 256 * 1024 * 1024):
+        self.db_path = Path(db_path)
+        self.size = size
+        self.acquire_timeout_s = acquire_timeout_s
+        self.query_timeout_ms = query_timeout_ms
+        self.max_instructions = max_instructions
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self._idle: List[_PooledConnection] = []
+        self._opened = 0
+        self._cond = threading.Condition()
+        self._async_waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = deque()
+
+    def _open(self) -> _PooledConnection:
+        conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False)
+        # Plain tuples: results are cached and sent on as tuples, no per-row conversion
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute("PRAGMA query_only = ON")
+        return _PooledConnection(conn)
+
+    def _take_locked(self) -> Optional[_PooledConnection]:
+        """An idle connection, a newly opened one while below size, or None"""
+        if self._idle:
+            return self._idle.pop()
+        if self._opened < self.size:
+            pooled = self._open()
+            self._opened += 1
+            return pooled
+        return None
+
+    def _timeout_error(self, timeout: float) -> PoolTimeoutError:
+        return PoolTimeoutError(f"No database connection available within {timeout}s")
+
+    def _checkout(self, timeout: Optional[float] = None) -> _PooledConnection:
+        timeout = self.acquire_timeout_s if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                pooled = self._take_locked()
+                if pooled is not None:
+                    return pooled
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise self._timeout_error(timeout)
+                self._cond.wait(remaining)
+
+    async def _acheckout(self, timeout: Optional[float] = None) -> _PooledConnection:
+        timeout = self.acquire_timeout_s if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            pooled = self._take_locked()
+            if pooled is not None:
+                return pooled
+            waiter = (loop, loop.create_future())
+            self._async_waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter[1], timeout)
+        except asyncio.TimeoutError:
+            raise self._timeout_error(timeout)
+        finally:
+            with self._cond:
+                if waiter in self._async_waiters:
+                    self._async_waiters.remove(waiter)
+
+    def _hand_over(self, future: asyncio.Future, pooled: _PooledConnection):
+        # Runs on the waiter's loop; a waiter that gave up returns the connection to the pool
+        if future.done():
+            self._checkin(pooled)
+        else:
+            future.set_result(pooled)
+
+    def _checkin(self, pooled: _PooledConnection):
+        pooled.deadline = None
+        pooled.ticks_left = None
+        with self._cond:
+            while self._async_waiters:
+                loop, future = self._async_waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future, pooled)
+                    return
+                except RuntimeError:
+                    # Waiter's event loop is closed
+                    continue
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def _arm(self, pooled: _PooledConnection, timeout_ms: Optional[int]):
+        timeout_ms = self.query_timeout_ms if timeout_ms is None else timeout_ms
+        pooled.deadline = time.monotonic() + timeout_ms / 1000 if timeout_ms else None
+        pooled.ticks_left = self.max_instructions // PROGRESS_HANDLER_INSTRUCTIONS if self.max_instructions else None
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None, query_timeout_ms: Optional[int] = None) -> Iterator[sqlite3.Connection]:
+        """Checks out a connection for the duration of the block"""
+        pooled = self._checkout(timeout)
+        self._arm(pooled, query_timeout_ms)
+        try:
+            yield pooled.conn
+        finally:
+            self._checkin(pooled)
+
+    @asynccontextmanager
+    async def acquire_async(self, timeout: Optional[float] = None,
+                            query_timeout_ms: Optional[int] = None) -> AsyncIterator[sqlite3.Connection]:
+        """Like acquire, but waits for a free connection without blocking the event loop"""
+        pooled = await self._acheckout(timeout)
+        self._arm(pooled, query_timeout_ms)
+        try:
+            yield pooled.conn
+        finally:
+            self._checkin(pooled)
+
+    def close(self):
+        """Closes idle connections; checked-out ones are closed by the garbage collector"""
+        with self._cond:
+            for pooled in self._idle:
+                pooled.conn.close()
+            self._opened -= len(self._idle)
+            self._idle.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "size": self.size,
+                "opened": self._opened,
+                "idle": len(self._idle),
+                "async_waiters": len(self._async_waiters),
+            }
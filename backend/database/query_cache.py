@@ -0,0 +1,117 @@
+import re
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+# Splits SQL into quoted literals/identifiers (odd indexes) and the rest (even indexes)
+_QUOTED = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")""")
+
+# Cached rows are stored compactly as (column names, row tuples)
+CachedRows = Tuple[Tuple[str, ...], List[tuple]]
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Canonical form of a statement for cache keys: collapses whitespace and
+    lowercases everything outside string literals, drops the trailing semicolon.
+    """
+    parts = _QUOTED.split(query.strip().rstrip(";").strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = " ".join(parts[i].split()).lower()
+    return "".join(parts)
+
+
+def is_read_only(query: str) -> bool:
+    first_word = normalize_sql(query).split(" ", 1)[0]
+    return first_word in ("select", "with")
+
+
+def estimate_size(columns: Tuple[str, ...], rows: List[tuple]) -> int:
+    """Approximate memory footprint of a cached result, in bytes"""
+    size = sys.getsizeof(rows) + sum(sys.getsizeof(c) for c in columns)
+    for row in rows:
+        size += sys.getsizeof(row)
+        for value in row:
+            size += sys.getsizeof(value)
+    return size
+
+
+class QueryResultCache:
+    """
+    Bounded LRU cache of query results keyed on (normalized SQL, params).
+    Bounded both by entry count and approximate bytes. The whole cache is
+    dropped when the data version it was filled under changes.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[CachedRows, int]]" = OrderedDict()
+        self._bytes = 0
+        self._data_version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(query: str, params: Optional[tuple]) -> Hashable:
+        return normalize_sql(query), tuple(params) if params else ()
+
+    def check_version(self, data_version: Hashable):
+        """Drops every entry if the underlying data changed since they were cached"""
+        with self._lock:
+            if data_version != self._data_version:
+                if self._entries:
+                    self.invalidations += 1
+                self._clear_locked()
+                self._data_version = data_version
+
+    def get(self, key: Hashable) -> Optional[CachedRows]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, columns: Tuple[str, ...], rows: List[tuple]):
+        size = estimate_size(columns, rows)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            self._entries[key] = ((columns, rows), size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self):
+        with self._lock:
+            if self._entries:
+                self.invalidations += 1
+            self._clear_locked()
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
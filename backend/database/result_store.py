@@ -0,0 +1,75 @@
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from database.query_cache import estimate_size
+
+logger = logging.getLogger(__name__)
+
+# Rows measured to estimate the size of a stored result
+SIZE_SAMPLE_ROWS = 200
+
+
+def estimate_result_size(columns: Tuple[str, ...], rows: List[tuple]) -> int:
+    """Approximate bytes of a result, extrapolated from its first rows (results run to 100k rows)"""
+    sample = rows[:SIZE_SAMPLE_ROWS]
+    if not sample:
+        return estimate_size(columns, rows)
+    return estimate_size(columns, sample) * len(rows) // len(sample)
+
+
+class ResultStore:
+    """
+    Server-side store of full query results that were truncated before reaching the LLM.
+    Results are addressed by an opaque handle and expire after `ttl_s`, or when
+    more than `max_entries` results or `max_bytes` approximate bytes are stored
+    (least recently used first). A result larger than `max_bytes` is not stored.
+    """
+
+    def __init__(self, max_entries: int = 128, ttl_s: float = 600.0, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._results: "OrderedDict[str, Tuple[float, Tuple[str, ...], List[tuple], int]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def put(self, columns: Tuple[str, ...], rows: List[tuple]) -> Optional[str]:
+        """Stores a result and returns its handle, or None when it alone exceeds max_bytes"""
+        size = estimate_result_size(columns, rows)
+        if size > self.max_bytes:
+            logger.warning("Result of %d rows (~%d bytes) exceeds the result store budget, not stored",
+                           len(rows), size)
+            return None
+        handle = f"res_{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            self._results[handle] = (time.monotonic() + self.ttl_s, columns, rows, size)
+            self._bytes += size
+            while len(self._results) > self.max_entries or self._bytes > self.max_bytes:
+                self._bytes -= self._results.popitem(last=False)[1][3]
+                self.evictions += 1
+        return handle
+
+    def get(self, handle: str) -> Optional[Tuple[Tuple[str, ...], List[tuple]]]:
+        with self._lock:
+            entry = self._results.get(handle)
+            if entry is None:
+                return None
+            expires_at, columns, rows, size = entry
+            if time.monotonic() > expires_at:
+                del self._results[handle]
+                self._bytes -= size
+                return None
+            self._results.move_to_end(handle)
+            return columns, rows
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._results), "bytes": self._bytes, "evictions": self.evictions}
@@ -0,0 +1,74 @@
+-- Intended schema of the insurance database.
+-- db_tool takes column types, primary keys and indexes from here when it loads a table.
+-- The agents' schema prompts are generated from the live database; the comment lines
+-- right above a CREATE TABLE describe the table and column comments annotate columns there.
+
+-- Policies: policy counts, premium revenue and coverage amounts, customer policy details, policy status
+-- and dates, agent and regional performance, and aggregated claim statistics per policy.
+CREATE TABLE insurance_policies (
+    Policy_ID TEXT PRIMARY KEY,
+    Customer_ID TEXT NOT NULL,
+    Customer_Name TEXT NOT NULL,
+    Policy_Type TEXT NOT NULL,           -- 'Auto Insurance', 'Health Insurance', 'Home Insurance', 'Life Insurance'
+    Coverage_Amount REAL,
+    Premium_Amount REAL,
+    Start_Date DATE NOT NULL,
+    End_Date DATE NOT NULL,
+    Status TEXT,                         -- 'Active', 'Expired', 'Cancelled'
+    Agent_ID TEXT,
+    Region TEXT,                         -- 'North', 'South', 'East', 'West'
+    Payment_Frequency TEXT,              -- 'Monthly', 'Quarterly', 'Annual'
+    Claim_Count INTEGER DEFAULT 0,
+    Last_Claim_Date DATE
+);
+
+-- Claims: individual claim details, claimed vs approved amounts and approval/denial rates, processing
+-- times, adjuster workload and performance, claim status and history. Join insurance_policies for policy
+-- type, region, agent, coverage or premium context.
+CREATE TABLE insurance_claims (
+    Claim_ID TEXT PRIMARY KEY,
+    Policy_ID TEXT NOT NULL,             -- Links to insurance_policies.Policy_ID
+    Customer_ID TEXT NOT NULL,           -- Links to insurance_policies.Customer_ID
+    Claim_Date DATE NOT NULL,
+    Claim_Type TEXT NOT NULL,            -- Matches Policy_Type values
+    Claim_Amount REAL NOT NULL,          -- Original claim amount
+    Approved_Amount REAL,                -- Amount actually approved
+    Status TEXT NOT NULL,                -- 'Approved', 'Denied', 'Processing', 'Pending'
+    Processing_Days INTEGER,
+    Adjuster_ID TEXT,
+    Description TEXT
+);
+
+-- Precomputed policy aggregates by region, policy type and status (rebuilt whenever the data is loaded,
+-- much faster than aggregating insurance_policies). Re-aggregate the measures with SUM(...) and compute
+-- averages as SUM(total) * 1.0 / SUM(count), never AVG(...) over summary rows. Use insurance_policies
+-- for individual policies, other columns or filters these columns cannot express.
+-- Example, active policies per region:
+-- SELECT Region, SUM(Policy_Count) FROM summary_policies WHERE Status = 'Active' GROUP BY Region
+CREATE TABLE summary_policies (
+    Region TEXT,                         -- insurance_policies.Region
+    Policy_Type TEXT,                    -- insurance_policies.Policy_Type
+    Status TEXT,                         -- insurance_policies.Status
+    Policy_Count INTEGER,                -- Number of policies
+    Total_Premium REAL,                  -- SUM(Premium_Amount)
+    Total_Coverage REAL,                 -- SUM(Coverage_Amount)
+    Total_Claim_Count INTEGER            -- SUM(Claim_Count)
+);
+
+-- Precomputed claim aggregates by region of the claim's policy, claim type, claim status and month
+-- (rebuilt whenever the data is loaded, much faster than aggregating insurance_claims). Re-aggregate the
+-- measures with SUM(...); approval rates and average processing times are SUM(total) * 1.0 / SUM(count),
+-- never AVG(...) over summary rows. Years: substr(Claim_Month, 1, 4). Use insurance_claims for
+-- individual claims, other columns or filters these columns cannot express.
+-- Example, approval rate by claim type:
+-- SELECT Claim_Type, SUM(CASE WHEN Status = 'Approved' THEN Claim_Count ELSE 0 END) * 100.0 / SUM(Claim_Count) FROM summary_claims GROUP BY Claim_Type
+CREATE TABLE summary_claims (
+    Region TEXT,                         -- Region of the claim's policy
+    Claim_Type TEXT,                     -- insurance_claims.Claim_Type
+    Status TEXT,                         -- insurance_claims.Status (claim status)
+    Claim_Month TEXT,                    -- 'YYYY-MM' of Claim_Date
+    Claim_Count INTEGER,                 -- Number of claims
+    Total_Claim_Amount REAL,             -- SUM(Claim_Amount)
+    Total_Approved_Amount REAL,          -- SUM(Approved_Amount)
+    Total_Processing_Days INTEGER        -- SUM(Processing_Days)
+);
@@ -0,0 +1,230 @@
+import re
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from database.query_cache import normalize_sql
+
+# Authorizer actions a read-only query may perform
+READ_ONLY_ACTIONS = frozenset({
+    sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE,
+})
+DENIED_FUNCTIONS = frozenset({"load_extension"})
+
+_ACTION_NAMES = {
+    getattr(sqlite3, f"SQLITE_{name}"): name
+    for name in (
+        "CREATE_INDEX", "CREATE_TABLE", "CREATE_TEMP_INDEX", "CREATE_TEMP_TABLE", "CREATE_TEMP_TRIGGER",
+        "CREATE_TEMP_VIEW", "CREATE_TRIGGER", "CREATE_VIEW", "DELETE", "DROP_INDEX", "DROP_TABLE",
+        "DROP_TEMP_INDEX", "DROP_TEMP_TABLE", "DROP_TEMP_TRIGGER", "DROP_TEMP_VIEW", "DROP_TRIGGER",
+        "DROP_VIEW", "INSERT", "PRAGMA", "READ", "SELECT", "TRANSACTION", "UPDATE", "ATTACH", "DETACH",
+        "ALTER_TABLE", "REINDEX", "ANALYZE", "CREATE_VTABLE", "DROP_VTABLE", "FUNCTION", "SAVEPOINT",
+        "RECURSIVE",
+    )
+    if hasattr(sqlite3, f"SQLITE_{name}")
+}
+
+# `FROM t`, `JOIN t AS a`, `, t a`: maps plan aliases back to tables
+_TABLE_REFERENCE = re.compile(r'(?:\bfrom|\bjoin|,)\s+"?(\w+)"?(?:\s+(?:as\s+)?"?(\w+)"?)?')
+_NOT_ALIASES = frozenset({
+    "where", "join", "on", "using", "left", "right", "full", "inner", "outer", "cross", "natural",
+    "group", "order", "limit", "having", "union", "except", "intersect", "window", "as",
+})
+
+SCAN_ACTIONS = ("reject", "warn", "off")
+
+
+class QueryRejectedError(Exception):
+    """
+    A query the guard refused or stopped. `code` is stable and machine-readable,
+    `hint` tells the query agent how to rewrite the query.
+    """
+
+    def __init__(self, code: str, message: str, hint: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.hint = hint
+        self.details = details or {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"code": self.code, "message": self.message, "hint": self.hint, "details": self.details}
+
+
+class SqlGuard:
+    """
+    Checks LLM-written SQL before and while it runs on a pooled read connection:
+
+    - an authorizer that only allows reads (SELECT, column reads, functions,
+      recursive CTEs), so writes, PRAGMA, ATTACH and the like fail at prepare time
+    - an EXPLAIN QUERY PLAN pre-check that estimates the rows visited by nested
+      scans and flags or rejects plans with an unindexed full scan above
+      `max_scan_rows` (a cartesian join multiplies the table sizes)
+    - a result row limit, enforced while fetching
+
+    Time and instruction budgets are enforced by the pool's progress handler;
+    `rejection` turns the resulting interrupt into a QueryRejectedError.
+    """
+
+    def __init__(self, max_scan_rows: int = 20_000_000, scan_action: str = "reject",
+                 max_result_rows: int = 100_000):
+        if scan_action not in SCAN_ACTIONS:
+            raise ValueError(f"scan_action must be one of {SCAN_ACTIONS}, got {scan_action!r}")
+        self.max_scan_rows = max_scan_rows
+        self.scan_action = scan_action
+        self.max_result_rows = max_result_rows
+        self._table_rows: Dict[str, int] = {}
+        self._table_rows_version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self.rejections: Dict[str, int] = {}
+        self.flagged = 0
+
+    @staticmethod
+    def authorizer(denied: List[Tuple[str, Optional[str]]]) -> Callable[..., int]:
+        """Read-only authorizer callback; denied actions are appended to `denied` for the error message"""
+        def authorize(action: int, arg1: Optional[str], arg2: Optional[str], db_name: Optional[str],
+                      trigger: Optional[str]) -> int:
+            if action in READ_ONLY_ACTIONS:
+                if action == sqlite3.SQLITE_FUNCTION and arg2 and arg2.lower() in DENIED_FUNCTIONS:
+                    denied.append(("FUNCTION", arg2))
+                    return sqlite3.SQLITE_DENY
+                return sqlite3.SQLITE_OK
+            denied.append((_ACTION_NAMES.get(action, str(action)), arg1))
+            return sqlite3.SQLITE_DENY
+        return authorize
+
+    def table_rows(self, conn: sqlite3.Connection, version: Hashable) -> Dict[str, int]:
+        """
+        Row estimates per table: sqlite_stat1 when ANALYZE has run, otherwise
+        max(rowid), which is a single index seek. Cached per data version.
+        """
+        with self._lock:
+            if self._table_rows_version == version:
+                return self._table_rows
+
+        tables = [name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        estimates: Dict[str, int] = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            for table, rows in conn.execute(
+                    "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"):
+                estimates[table] = rows or 0
+        for table in tables:
+            if table in estimates:
+                continue
+            quoted = '"' + table.replace('"', '""') + '"'
+            try:
+                estimates[table] = conn.execute(f"SELECT MAX(rowid) FROM {quoted}").fetchone()[0] or 0
+            except sqlite3.OperationalError:
+                # WITHOUT ROWID table
+                estimates[table] = conn.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0]
+
+        estimates = {table.lower(): rows for table, rows in estimates.items()}
+        with self._lock:
+            self._table_rows, self._table_rows_version = estimates, version
+        return estimates
+
+    @staticmethod
+    def _aliases(query: str, table_rows: Dict[str, int]) -> Dict[str, str]:
+        """Plan name (alias or table) -> table, for the tables the query names"""
+        aliases = {}
+        for table, alias in _TABLE_REFERENCE.findall(normalize_sql(query)):
+            if table in table_rows:
+                aliases[table] = table
+                if alias and alias not in _NOT_ALIASES:
+                    aliases[alias] = table
+        return aliases
+
+    def check_plan(self, conn: sqlite3.Connection, query: str, params: Optional[tuple],
+                   table_rows: Dict[str, int]) -> Dict[str, Any]:
+        """
+        Runs EXPLAIN QUERY PLAN (under the read-only authorizer, so this is also
+        where disallowed statements fail) and estimates the rows the plan visits.
+        Raises QueryRejectedError when the estimate is over budget and the scan
+        action is "reject"; otherwise returns the plan summary for the metadata.
+        """
+        plan = conn.execute(f"EXPLAIN QUERY PLAN {query}", params or ()).fetchall()
+        if self.scan_action == "off":
+            return {}
+
+        aliases = self._aliases(query, table_rows)
+        # Consecutive steps under the same parent are nested loops: their row counts multiply
+        loops: Dict[int, int] = {}
+        full_scans = []
+        for _, parent, _, detail in plan:
+            if not detail.startswith("SCAN "):
+                continue
+            name = detail[5:].split(" ", 1)[0].strip('"').lower()
+            table = aliases.get(name)
+            if table is None:
+                # Subquery, CTE or constant row: bounded by the scans inside it
+                continue
+            loops[parent] = loops.get(parent, 1) * max(table_rows.get(table, 0), 1)
+            if " USING " not in detail:
+                full_scans.append(table)
+
+        estimated_rows = sum(loops.values())
+        summary = {"estimated_rows": estimated_rows, "full_scans": full_scans}
+        if not full_scans or estimated_rows <= self.max_scan_rows:
+            return summary
+
+        if self.scan_action == "reject":
+            raise self._reject(
+                "full_scan_too_large",
+                f"Query plan scans about {estimated_rows:,} rows without an index "
+                f"(limit {self.max_scan_rows:,}); full scans of: {', '.join(full_scans)}",
+                "Join tables on their key columns (e.g. Policy_ID) instead of a cross join, "
+                "and add WHERE filters or aggregate so fewer rows are visited.",
+                {"estimated_rows": estimated_rows, "max_scan_rows": self.max_scan_rows,
+                 "full_scans": full_scans, "plan": [row[3] for row in plan]},
+            )
+        with self._lock:
+            self.flagged += 1
+        summary["flagged"] = True
+        return summary
+
+    def fetch_rows(self, cursor: sqlite3.Cursor) -> List[tuple]:
+        """Fetches the result, stopping (and rejecting) once it passes max_result_rows"""
+        if not self.max_result_rows:
+            return cursor.fetchall()
+        rows = cursor.fetchmany(self.max_result_rows + 1)
+        if len(rows) > self.max_result_rows:
+            raise self._reject(
+                "too_many_rows",
+                f"Query returns more than {self.max_result_rows:,} rows",
+                "Aggregate with GROUP BY, add WHERE filters, or add a LIMIT clause.",
+                {"max_result_rows": self.max_result_rows},
+            )
+        return rows
+
+    def rejection(self, error: sqlite3.Error, denied: List[Tuple[str, Optional[str]]], elapsed_ms: float,
+                  timeout_ms: int, max_instructions: int) -> Optional[QueryRejectedError]:
+        """Structured error for a failure caused by the guard or the pool's budgets, None for plain SQL errors"""
+        if denied:
+            actions = sorted({f"{action} {arg}" if arg else action for action, arg in denied})
+            return self._reject(
+                "read_only_violation",
+                f"Query is not allowed, only read-only SELECT statements can run (denied: {', '.join(actions)})",
+                "Rewrite the request as a single SELECT (or WITH ... SELECT) statement.",
+                {"denied": actions},
+            )
+        if isinstance(error, sqlite3.OperationalError) and str(error) == "interrupted":
+            timed_out = bool(timeout_ms) and elapsed_ms >= timeout_ms
+            limit = f"time limit of {timeout_ms} ms" if timed_out else f"budget of {max_instructions:,} instructions"
+            return self._reject(
+                "query_timeout" if timed_out else "query_too_expensive",
+                f"Query was stopped after exceeding its {limit}",
+                "Avoid cross joins and correlated subqueries, join on key columns, "
+                "and filter or aggregate earlier in the query.",
+                {"elapsed_ms": round(elapsed_ms, 1), "timeout_ms": timeout_ms, "max_instructions": max_instructions},
+            )
+        return None
+
+    def _reject(self, code: str, message: str, hint: str, details: Dict[str, Any]) -> QueryRejectedError:
+        with self._lock:
+            self.rejections[code] = self.rejections.get(code, 0) + 1
+        return QueryRejectedError(code, message, hint, details)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"rejections": dict(self.rejections), "flagged": self.flagged}
@@ -1,13 +1,20 @@
 import os
+import asyncio
 import logging
-from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from agents.call_policy import policy_stats
+from agents.llm_scheduler import llm_scheduler
+from agents.registry import warm_up
 from core.settings import settings
+from core.tracing import tracer
 from routers import chatbot_router
+from services.chatbot_service import chatbot_service
+from services.session_store import run_eviction
 from utils.logging_utils import boxed_log
 
 logging.basicConfig(
@@ -21,11 +28,16 @@ async def lifespan(app: FastAPI) -> AsyncGenerator:
     try:
         os.environ["GOOGLE_API_KEY"] = settings.GOOGLE_API_KEY
         os.environ["GOOGLE_GENAI_USE_VERTEXAI"] = str(settings.GOOGLE_GENAI_USE_VERTEXAI)
+        if settings.GRAPH_WARMUP:
+            await warm_up()
+        eviction_task = asyncio.create_task(
+            run_eviction(chatbot_service.sessions, settings.SESSION_EVICTION_INTERVAL_S))
         boxed_log(f"{settings.APP_NAME} started successfully!!!", logger, level="info")
         yield
+        eviction_task.cancel()
         boxed_log(f"{settings.APP_NAME} is shutting down...", logger, level="info")
     except Exception as e:
-        logger.error(f"Failed to start application : {e}")
+        logger.error("Failed to start application : %s", e)
         raise
 
 app = FastAPI(
@@ -43,8 +55,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Ties every span of a request to its X-Request-ID (generated when missing) and echoes it back"""
+    with tracer.request(request.headers.get("X-Request-ID"), kind="http",
+                        name=f"{request.method} {request.url.path}") as context:
+        response = await call_next(request)
+    response.headers["X-Request-ID"] = context.request_id
+    return response
+
 app.include_router(chatbot_router.router, prefix="/api")
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Span latency histograms, LLM call policy counters and LLM queue metrics (Prometheus text format)"""
+    return PlainTextResponse(tracer.histograms.prometheus() + policy_stats.prometheus() + llm_scheduler.prometheus(),
+                             media_type="text/plain; version=0.0.4")
+
 @app.get("/", include_in_schema=False)
 def root():
     return RedirectResponse(url="/docs")
\ No newline at end of file
@@ -1,3 +1,4 @@
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 
 class ChatbotAgentRequest(BaseModel):
@@ -5,5 +6,19 @@ class ChatbotAgentRequest(BaseModel):
     user_id: str = Field(..., description="Unique user identifier", example="user_001")
     input_query: str = Field(..., description="User's input text for the chatbot", example="Hello, how are you?")
 
+class LLMUsage(BaseModel):
+    calls: int = Field(..., description="LLM calls made for the message, across all agents")
+    input_tokens: int = Field(..., description="Prompt tokens across all LLM calls")
+    output_tokens: int = Field(..., description="Generated tokens across all LLM calls")
+    total_tokens: int = Field(..., description="Input plus output tokens")
+    estimated_calls: int = Field(0, description="Calls whose token counts were estimated from text (model reported none)")
+    by_model: Dict[str, Dict[str, int]] = Field(default_factory=dict, description="calls, input_tokens and output_tokens per model id")
+    budget_stop: Optional[str] = Field(None, description="Why the per-request usage budget stopped the agents early, if it did")
+
 class ChatbotAgentResponse(BaseModel):
     response: str = Field(..., description="Chatbot's generated reply", example="I'm doing great! How can I help you today?")
+    usage: Optional[LLMUsage] = Field(None, description="LLM calls and tokens used for this message")
+
+class ChatbotBatchRequest(BaseModel):
+    items: List[ChatbotAgentRequest] = Field(..., description="Messages to process, each with its own session", min_length=1)
+    concurrency: Optional[int] = Field(None, description="Maximum items processed at once (capped by the server)", ge=1, example=8)
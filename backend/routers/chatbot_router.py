@@ -1,5 +1,13 @@
+import json
+from typing import Optional
 from fastapi import APIRouter, HTTPException
-from models.chatbot_models import ChatbotAgentRequest, ChatbotAgentResponse
+from fastapi.responses import StreamingResponse
+from core.settings import settings
+from core.tracing import tracer
+from agents.llm_scheduler import SchedulerRejected, llm_scheduler
+from agents.profiles.query_agent.tools import result_store
+from database.database import db
+from models.chatbot_models import ChatbotAgentRequest, ChatbotAgentResponse, ChatbotBatchRequest
 from services.chatbot_service import chatbot_service
 import logging
 
@@ -13,22 +21,130 @@ async def chat(request: ChatbotAgentRequest):
     Process chatbot message with session memory
     """
     try:
-        response = chatbot_service.process_message(
+        response, usage = await chatbot_service.process_message_with_usage(
             session_id=request.session_id,
             user_id=request.user_id,
             user_input=request.input_query
         )
         
-        return ChatbotAgentResponse(response=response)
-    
+        return ChatbotAgentResponse(response=response, usage=usage)
+
+    except SchedulerRejected as e:
+        raise _overloaded(e)
     except Exception as e:
-        logger.error(f"Chat error: {str(e)}", exc_info=True)
+        logger.error("Chat error: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Error processing message: {str(e)}")
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatbotAgentRequest):
+    """
+    Process chatbot message with session memory, streaming Server-Sent Events:
+    progress (node transitions), token (answer text), done (full response) or error
+    """
+    # Rejected before the response starts, so the client gets a status code
+    try:
+        llm_scheduler.admit()
+    except SchedulerRejected as e:
+        raise _overloaded(e)
+
+    async def event_stream():
+        try:
+            async for event in chatbot_service.stream_message(
+                session_id=request.session_id,
+                user_id=request.user_id,
+                user_input=request.input_query
+            ):
+                yield _format_sse(event["event"], event["data"])
+        except Exception as e:
+            logger.error("Chat stream error: %s", e, exc_info=True)
+            yield _format_sse("error", {"detail": f"Error processing message: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.post("/chat/batch")
+async def chat_batch(request: ChatbotBatchRequest):
+    """
+    Process many chatbot messages concurrently, streaming NDJSON:
+    one line per item as it finishes (ok/response or error), then a summary line
+    """
+    if len(request.items) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch too large: at most {settings.BATCH_MAX_ITEMS} items")
+
+    concurrency = min(request.concurrency or settings.BATCH_DEFAULT_CONCURRENCY, settings.BATCH_MAX_CONCURRENCY)
+    items = [(item.session_id, item.user_id, item.input_query) for item in request.items]
+
+    async def result_lines():
+        async for result in chatbot_service.process_batch(items, concurrency):
+            yield json.dumps(result, default=str) + "\n"
+
+    return StreamingResponse(result_lines(), media_type="application/x-ndjson")
+
+def _overloaded(error: SchedulerRejected) -> HTTPException:
+    """429 (queue full) or 503 (no LLM slot in time), with a Retry-After estimate"""
+    logger.warning("Request rejected: %s", error)
+    return HTTPException(status_code=error.status_code, detail=str(error),
+                         headers={"Retry-After": str(error.retry_after)})
+
+def _format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
 @router.delete("/session/{session_id}")
 async def clear_session(session_id: str):
     """
     Clear session history
     """
-    chatbot_service.clear_session(session_id)
-    return {"message": f"Session {session_id} cleared"}
\ No newline at end of file
+    await chatbot_service.clear_session(session_id)
+    return {"message": f"Session {session_id} cleared"}
+
+@router.get("/sessions/stats")
+async def session_stats():
+    """
+    Session store usage: live sessions, approximate bytes and evictions
+    """
+    return chatbot_service.session_stats()
+
+@router.get("/database/stats")
+async def database_stats():
+    """
+    Database usage: connection pool, query result cache hits/misses, SQL guard rejections
+    and the full results kept for fetch_result_page
+    """
+    return {**db.stats(), "result_store": result_store.stats()}
+
+@router.get("/usage/session/{session_id}")
+async def session_usage(session_id: str):
+    """
+    LLM calls and tokens used by a session so far, in total and per model
+    """
+    usage = chatbot_service.usage_for_session(session_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for session {session_id}")
+    return usage
+
+@router.get("/usage/user/{user_id}")
+async def user_usage(user_id: str):
+    """
+    LLM calls and tokens used by a user across sessions, in total and per model
+    """
+    usage = chatbot_service.usage_for_user(user_id)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for user {user_id}")
+    return usage
+
+@router.get("/traces")
+async def traces(request_id: Optional[str] = None, session_id: Optional[str] = None, limit: int = 200):
+    """
+    Recent tracing spans (graph nodes, LLM calls, tools, SQL), optionally for one request or session.
+    Spans hold SQL text and session ids: only served when TRACES_ENDPOINT_ENABLED is set
+    """
+    if not settings.TRACES_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    buffer = tracer.buffer
+    if buffer is None:
+        raise HTTPException(status_code=404, detail="Span buffer is not enabled")
+    spans = buffer.spans(request_id=request_id, session_id=session_id, limit=limit)
+    return {"spans": [span.to_dict() for span in spans], "latency": tracer.histograms.snapshot()}
@@ -1,57 +1,292 @@
+import time
+import asyncio
 import logging
-from typing import Dict
-from langchain_core.messages import HumanMessage, AIMessage
-from agents.graph import graph
-from agents.graph1 import graph as graph1
+from typing import Any, AsyncIterator, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
+from agents.events import answer_token, progress_from_event
+from agents.llm_scheduler import BATCH, INTERACTIVE, SchedulerRejected, llm_scheduler
+from agents.registry import get_graph
+from agents.tracing import tracing_config
+from agents.usage import TurnUsage, UsageBudgetExceeded, UsageCallbackHandler, budget_answer, usage_scope
 from agents.state import AgentState
+from core.settings import settings
+from core.tracing import tracer
+from services.history_compaction import HistoryCompactor, strip_tool_chatter
+from services.session_locks import SessionLocks
+from services.session_store import InMemorySessionStore, SessionStore, call_store
+from services.usage_ledger import UsageLedger
 from utils.logging_utils import boxed_log
+from utils.message_utils import message_text
+from utils.stats_utils import percentile
 
 logger = logging.getLogger(__name__)
 
+class TurnResult(NamedTuple):
+    response: str
+    usage: Dict[str, Any]  # TurnUsage.to_dict()
+
 class ChatbotService:
-    def __init__(self):
-        # In-memory session storage: {session_id: [messages]}
-        self.sessions: Dict[str, list] = {}
+    def __init__(self, sessions: SessionStore = None):
+        # Session histories, bounded by count, idle TTL and approximate bytes
+        if sessions is None and settings.SESSION_STORE_BACKEND == "sqlite":
+            from services.sqlite_session_store import SqliteSessionStore
+            sessions = SqliteSessionStore(
+                path=settings.SESSION_SQLITE_PATH,
+                max_sessions=settings.SESSION_MAX_COUNT,
+                ttl_s=settings.SESSION_TTL_S,
+                max_session_bytes=settings.SESSION_MAX_BYTES,
+                max_total_bytes=settings.SESSION_STORE_MAX_BYTES,
+                cache_sessions=settings.SESSION_SQLITE_CACHE_SESSIONS,
+            )
+        elif sessions is None:
+            sessions = InMemorySessionStore(
+                max_sessions=settings.SESSION_MAX_COUNT,
+                ttl_s=settings.SESSION_TTL_S,
+                max_session_bytes=settings.SESSION_MAX_BYTES,
+                max_total_bytes=settings.SESSION_STORE_MAX_BYTES,
+            )
+        self.sessions: SessionStore = sessions
+
+        # Shrinks the history sent to the graph (None sends and stores full histories)
+        self.compactor: Optional[HistoryCompactor] = HistoryCompactor(
+            token_budget=settings.HISTORY_TOKEN_BUDGET,
+            summary_max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+        ) if settings.HISTORY_COMPACTION_ENABLED else None
+
+        # Turns of one session run in order; identical in-flight requests share one run
+        self.session_locks = SessionLocks()
+        self._in_flight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._waiters: Dict[Tuple[str, str, str], int] = {}
+        self.coalesced_requests = 0
+
+        # LLM usage totals per session and per user
+        self.usage_ledger = UsageLedger(max_keys=settings.USAGE_LEDGER_MAX_KEYS)
     
-    def process_message(self, session_id: str, user_id: str, user_input: str) -> str:
+    async def process_message(self, session_id: str, user_id: str, user_input: str) -> str:
         """Process user message and return response"""
+        return (await self.process_message_with_usage(session_id, user_id, user_input)).response
+
+    async def process_message_with_usage(self, session_id: str, user_id: str, user_input: str,
+                                         priority: int = INTERACTIVE,
+                                         cancel_if_abandoned: bool = False) -> TurnResult:
+        """
+        Process user message and return the response with the turn's LLM usage.
+        A retry of a message that is still being processed for the same session
+        waits for the running turn instead of starting another one.
+        New turns are rejected with SchedulerRejected while the LLM queues are full.
+        With cancel_if_abandoned, cancelling the caller also cancels the turn
+        unless another caller is still waiting for it.
+        """
+        key = (session_id, user_id, user_input)
+        turn = self._in_flight.get(key)
+        if turn is None:
+            llm_scheduler.admit(priority)
+            turn = asyncio.create_task(self._run_turn(session_id, user_id, user_input, priority))
+            self._in_flight[key] = turn
+            turn.add_done_callback(lambda task: self._turn_done(key, task))
+        else:
+            self.coalesced_requests += 1
+            logger.info("COALESCED REQUEST | Session: %s | joined the in-flight turn", session_id)
+
+        # Shielded: a caller that disconnects does not cancel the turn for the others
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(turn)
+        except asyncio.CancelledError:
+            if cancel_if_abandoned and self._waiters[key] == 1:
+                turn.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+    async def _run_turn(self, session_id: str, user_id: str, user_input: str,
+                        priority: int = INTERACTIVE) -> TurnResult:
+        with tracer.request(session_id=session_id, user_id=user_id), llm_scheduler.priority(priority):
+            async with self.session_locks.hold(session_id):
+                initial_state, history = await self._start_turn(session_id, user_id, user_input)
+                usage = self._new_usage()
+
+                # Run graph
+                with usage_scope(usage):
+                    try:
+                        result = await get_graph().ainvoke(initial_state, config=self._turn_config(usage))
+                    except UsageBudgetExceeded as e:
+                        result = self._budget_result(initial_state, e)
+
+                response_text = await self._finish_turn(session_id, history, initial_state, result)
+                return TurnResult(response_text, self._record_usage(session_id, user_id, usage))
+
+    @staticmethod
+    def _new_usage() -> TurnUsage:
+        return TurnUsage(max_calls=settings.LLM_MAX_CALLS_PER_REQUEST, max_tokens=settings.LLM_MAX_TOKENS_PER_REQUEST)
+
+    @staticmethod
+    def _turn_config(usage: TurnUsage) -> Dict[str, Any]:
+        """Graph run config: tracing callbacks plus the turn's usage accounting"""
+        config = tracing_config()
+        return {**config, "callbacks": [*config.get("callbacks", []), UsageCallbackHandler(usage)]}
+
+    @staticmethod
+    def _budget_result(initial_state: AgentState, error: UsageBudgetExceeded) -> Dict[str, Any]:
+        """Final state of a turn stopped by its usage budget outside an agent loop"""
+        return {"messages": [*initial_state["messages"], AIMessage(content=budget_answer(error.reason))]}
+
+    def _record_usage(self, session_id: str, user_id: str, usage: TurnUsage) -> Dict[str, Any]:
+        turn_usage = usage.to_dict()
+        self.usage_ledger.record(session_id, user_id, turn_usage)
+        logger.info("TURN USAGE | Session: %s | calls=%d tokens=%d%s", session_id, turn_usage["calls"],
+                    turn_usage["total_tokens"],
+                    f" | budget stop: {turn_usage['budget_stop']}" if turn_usage["budget_stop"] else "")
+        return turn_usage
+
+    def _turn_done(self, key: Tuple[str, str, str], task: asyncio.Task):
+        self._in_flight.pop(key, None)
+        # Mark the exception retrieved when every caller went away before the turn failed
+        if not task.cancelled():
+            task.exception()
+
+    async def stream_message(self, session_id: str, user_id: str, user_input: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process user message and yield events as they happen:
+        progress (node transitions), token (final answer text) and done (full response and usage).
+        Session history is updated once the graph run finishes; the turn waits for
+        earlier turns of the same session.
+        """
+        with tracer.request(session_id=session_id, name="chat_stream", user_id=user_id):
+            async with self.session_locks.hold(session_id):
+                initial_state, history = await self._start_turn(session_id, user_id, user_input)
+                usage = self._new_usage()
+
+                result = None
+                with usage_scope(usage):
+                    try:
+                        async for event in get_graph().astream_events(initial_state, config=self._turn_config(usage),
+                                                                      version="v2"):
+                            token = answer_token(event)
+                            if token:
+                                yield {"event": "token", "data": {"text": token}}
+                                continue
+
+                            progress = progress_from_event(event)
+                            if progress:
+                                yield {"event": "progress", "data": progress}
+                            elif event["event"] == "on_chain_end" and not event["parent_ids"]:
+                                # End of the top-level graph run carries the final state
+                                result = event["data"]["output"]
+                    except UsageBudgetExceeded as e:
+                        result = self._budget_result(initial_state, e)
+
+                response_text = await self._finish_turn(session_id, history, initial_state, result or {})
+                turn_usage = self._record_usage(session_id, user_id, usage)
+        yield {"event": "done", "data": {"response": response_text, "usage": turn_usage}}
+
+    async def process_batch(self, items: Sequence[Tuple[str, str, str]], concurrency: int) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process many (session_id, user_id, user_input) items, at most `concurrency` at a time.
+        Yields one result per item in completion order (failures are reported per item),
+        then a summary with throughput and p50/p95 latency.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        pending = iter(enumerate(items))
+        latencies: List[float] = []
+        failed = 0
+
+        async def worker():
+            # Workers share the iterator, so at most `concurrency` items are in flight
+            for index, (session_id, user_id, user_input) in pending:
+                start = time.perf_counter()
+                try:
+                    response, usage = await self.process_message_with_usage(session_id, user_id, user_input,
+                                                                            priority=BATCH,
+                                                                            cancel_if_abandoned=True)
+                    result = {"index": index, "session_id": session_id, "ok": True, "response": response,
+                              "usage": usage}
+                except SchedulerRejected as e:
+                    logger.warning("Batch item %d (session %s) rejected: %s", index, session_id, e)
+                    result = {"index": index, "session_id": session_id, "ok": False, "error": str(e),
+                              "retry_after": e.retry_after}
+                except Exception as e:
+                    logger.error("Batch item %d (session %s) failed: %s", index, session_id, e)
+                    result = {"index": index, "session_id": session_id, "ok": False, "error": str(e)}
+                result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+                await results.put(result)
+
+        start = time.perf_counter()
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(concurrency, len(items))))]
+        try:
+            for _ in range(len(items)):
+                result = await results.get()
+                latencies.append(result["latency_ms"])
+                failed += not result["ok"]
+                yield result
+        finally:
+            # Client went away or the batch is done: stop the workers, which also
+            # cancels their in-flight turns unless a /chat caller shares them
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        elapsed = time.perf_counter() - start
+        yield {"summary": {
+            "items": len(items),
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "concurrency": concurrency,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_per_s": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+        }}
+
+    async def _start_turn(self, session_id: str, user_id: str,
+                          user_input: str) -> Tuple[AgentState, List[BaseMessage]]:
+        """
+        Append the user message to the session history and build the graph input state.
+        Returns the input state (with the compacted history) and the session history;
+        the history is stored by _finish_turn, once the turn has produced its messages.
+        """
         
         # Get or create session history
-        if session_id not in self.sessions:
-            self.sessions[session_id] = []
-            logger.info(f"NEW SESSION | Session: {session_id} | User: {user_id}")
+        history = await call_store(self.sessions, self.sessions.get, session_id)
+        if history is None:
+            history = []
+            logger.info("NEW SESSION | Session: %s | User: %s", session_id, user_id)
         else:
-            logger.info(f"CONTINUING SESSION | Session: {session_id} | User: {user_id}")
+            logger.info("CONTINUING SESSION | Session: %s | User: %s", session_id, user_id)
     
-        logger.info(f"USER: {user_input}")
+        logger.info("USER: %s", user_input)
 
         # Add user message to history
-        self.sessions[session_id].append(HumanMessage(content=user_input))
+        history.append(HumanMessage(content=user_input))
 
         # Show chat history if this is a continuing conversation
-        if len(self.sessions[session_id]) > 1:
+        if len(history) > 1 and logger.isEnabledFor(logging.DEBUG):
             logger.debug("Chat History:")
             msg_number = 1
-            for msg in self.sessions[session_id][:-1]: 
+            for msg in history[:-1]: 
                 if isinstance(msg, HumanMessage):
-                    logger.debug(f"  [{msg_number}] USER: {msg.content}")
+                    logger.debug("  [%d] USER: %s", msg_number, msg.content)
                     msg_number += 1
                 elif isinstance(msg, AIMessage):
                     if isinstance(msg.content, str) and msg.content.strip():
                         preview = msg.content[:15] + "..." if len(msg.content) > 15 else msg.content
-                        logger.debug(f"  [{msg_number}] AI: {preview}")
+                        logger.debug("  [%d] AI: %s", msg_number, preview)
                         msg_number += 1
 
         # Create initial state
         initial_state: AgentState = {
-            "messages": self.sessions[session_id],
+            "messages": self.compactor.compact(history) if self.compactor else history,
             "session_id": session_id,
             "user_id": user_id,
             "next_agent": ""
         }
-        
-        # Run graph
-        result = graph1.invoke(initial_state)
+        return initial_state, history
+
+    async def _finish_turn(self, session_id: str, history: List[BaseMessage], initial_state: AgentState,
+                     result: Dict[str, Any]) -> str:
+        """Store the new turn in the session and return the response text"""
         
         # Extract response - get the last message
         messages = result.get("messages", [])
@@ -61,32 +296,38 @@ class ChatbotService:
         ai_message = messages[-1]
         
         # Extract text content
-        if hasattr(ai_message, 'content'):
-            content = ai_message.content
-            if isinstance(content, list):
-                # Some message formats return a list of message parts
-                text_parts = []
-                for part in content:
-                    if isinstance(part, dict) and 'text' in part:
-                        text_parts.append(part['text'])
-                    else:
-                        text_parts.append(str(part))
-                response_text = "\n".join(text_parts)
-            else:
-                response_text = str(content)
-        else:
-            response_text = str(ai_message)
+        response_text = message_text(ai_message)
         
-        # Update session - store all messages
-        self.sessions[session_id] = list(messages)
-        logger.debug(f"Session {session_id} updated with messages.")
+        # Update session - store the history plus the messages this run added
+        stored = history + list(messages[len(initial_state["messages"]):])
+        if self.compactor:
+            stored = strip_tool_chatter(stored)
+        await call_store(self.sessions, self.sessions.put, session_id, stored)
+        logger.debug("Session %s updated with messages.", session_id)
         
         return response_text
     
-    def clear_session(self, session_id: str):
+    async def clear_session(self, session_id: str):
         """Clear session history"""
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        await call_store(self.sessions, self.sessions.delete, session_id)
+
+    def session_stats(self) -> Dict[str, Any]:
+        """Session store usage (live sessions, approximate bytes, evictions) and turn counters"""
+        return {
+            **self.sessions.stats(),
+            "in_flight_turns": len(self._in_flight),
+            "busy_sessions": len(self.session_locks),
+            "coalesced_requests": self.coalesced_requests,
+            "usage_ledger": self.usage_ledger.stats(),
+        }
+
+    def usage_for_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """LLM usage totals of a session (None if it has no recorded turns)"""
+        return self.usage_ledger.session(session_id)
+
+    def usage_for_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """LLM usage totals of a user across sessions (None if it has no recorded turns)"""
+        return self.usage_ledger.user(user_id)
 
 # Singleton instance
 chatbot_service = ChatbotService()
\ No newline at end of file
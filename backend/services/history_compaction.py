@@ -0,0 +1,142 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from utils.message_utils import content_text, estimate_tokens, message_tokens
+
+logger = logging.getLogger(__name__)
+
+# Name of the short AIMessage that stands in for a collapsed query result
+REFERENCE_NAME = "query_result_reference"
+SUMMARY_HEADER = "Summary of the earlier conversation (oldest first):"
+
+
+def _query_envelope(text: str) -> Optional[Dict[str, Any]]:
+    """The query agent's JSON envelope ({question, sql_query, output}), if text is one"""
+    if not text.lstrip().startswith("{"):
+        return None
+    try:
+        envelope = json.loads(text)
+    except ValueError:
+        return None
+    return envelope if isinstance(envelope, dict) and "sql_query" in envelope else None
+
+
+def _reference(envelope: Dict[str, Any]) -> str:
+    output = envelope.get("output")
+    if isinstance(output, str):
+        try:
+            output = json.loads(output)
+        except ValueError:
+            pass
+    if isinstance(output, dict) and "record_count" in output:
+        rows = f"{output['record_count']} rows"
+    elif output == "No data found":
+        rows = "no rows"
+    else:
+        rows = "result omitted"
+    return f"[query result: {envelope['sql_query']} -> {rows}]"
+
+
+def split_turns(messages: List[BaseMessage]) -> List[List[BaseMessage]]:
+    """Groups messages into turns, each starting at a HumanMessage (leading messages form their own group)"""
+    turns: List[List[BaseMessage]] = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def strip_tool_chatter(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """
+    Keeps the user message and final AI answer of every turn. Tool calls and
+    tool results are dropped; query results are collapsed into a one-line
+    reference (SQL and row count) placed before the answer.
+    """
+    compacted: List[BaseMessage] = []
+    for turn in split_turns(messages):
+        human = turn[0] if isinstance(turn[0], HumanMessage) else None
+        references: List[str] = []
+        answer: Optional[AIMessage] = None
+
+        for message in turn:
+            if isinstance(message, AIMessage) and message.name == REFERENCE_NAME:
+                references.append(content_text(message.content))
+                continue
+            if isinstance(message, (ToolMessage, AIMessage)):
+                envelope = _query_envelope(content_text(message.content))
+                if envelope is not None:
+                    references.append(_reference(envelope))
+                elif isinstance(message, AIMessage) and not message.tool_calls and content_text(message.content).strip():
+                    answer = message
+
+        if human is not None:
+            compacted.append(human)
+        if references:
+            compacted.append(AIMessage(content="\n".join(references), name=REFERENCE_NAME))
+        if answer is not None:
+            compacted.append(AIMessage(content=content_text(answer.content)))
+    return compacted
+
+
+def _clip(text: str, max_chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3] + "..."
+
+
+def extractive_summary(turns: List[List[BaseMessage]], max_tokens: int) -> str:
+    """
+    One line per turn with the clipped question and answer. Oldest lines are
+    dropped first when the summary exceeds max_tokens.
+    """
+    lines = []
+    for turn in turns:
+        question = next((content_text(m.content) for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next((content_text(m.content) for m in reversed(turn)
+                       if isinstance(m, AIMessage) and m.name != REFERENCE_NAME), "")
+        lines.append(f"- User: {_clip(question, 120)} | Assistant: {_clip(answer, 160)}")
+
+    dropped = 0
+    while lines and estimate_tokens(SUMMARY_HEADER + "\n" + "\n".join(lines)) > max_tokens:
+        lines.pop(0)
+        dropped += 1
+    if dropped:
+        lines.insert(0, f"- ({dropped} earlier turns omitted)")
+    return SUMMARY_HEADER + "\n" + "\n".join(lines)
+
+
+class HistoryCompactor:
+    """
+    Shrinks a session history before a graph run: tool chatter is stripped and
+    the oldest turns that do not fit in token_budget are replaced by a short
+    summary SystemMessage (Gemini appends it to the system instruction).
+    The current turn is always kept verbatim.
+    """
+
+    def __init__(self, token_budget: int = 2000, summary_max_tokens: int = 400):
+        self.token_budget = token_budget
+        self.summary_max_tokens = summary_max_tokens
+
+    def compact(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        turns = split_turns(strip_tool_chatter(messages))
+        if not turns:
+            return []
+
+        kept = [turns[-1]]
+        used = sum(message_tokens(m) for m in turns[-1])
+        for turn in reversed(turns[:-1]):
+            tokens = sum(message_tokens(m) for m in turn)
+            if used + tokens > self.token_budget:
+                break
+            kept.insert(0, turn)
+            used += tokens
+
+        older = turns[:len(turns) - len(kept)]
+        compacted = [message for turn in kept for message in turn]
+        if older:
+            logger.debug("History compaction summarized %d turns, kept %d", len(older), len(kept))
+            compacted.insert(0, SystemMessage(content=extractive_summary(older, self.summary_max_tokens)))
+        return compacted
@@ -0,0 +1,37 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List
+
+
+class SessionLocks:
+    """
+    One asyncio.Lock per session id, so turns of a session run one at a time in
+    arrival order (asyncio locks are FIFO) while other sessions run in parallel.
+    Locks are created on demand and dropped when nobody holds or waits for them.
+    """
+
+    def __init__(self):
+        # session_id -> [lock, holders + waiters]
+        self._locks: Dict[str, List] = {}
+
+    @asynccontextmanager
+    async def hold(self, session_id: str) -> AsyncIterator[None]:
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    def waiting(self, session_id: str) -> int:
+        """Turns of the session that are running or queued"""
+        entry = self._locks.get(session_id)
+        return entry[1] if entry else 0
+
+    def __len__(self) -> int:
+        return len(self._locks)
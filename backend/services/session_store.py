@@ -0,0 +1,214 @@
+import sys
+import json
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Protocol, TypeVar
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Rough overhead of a message object with its ids and metadata dicts, and of each
+# parsed tool call dict (measured with tracemalloc on langchain-core 1.0)
+MESSAGE_OVERHEAD_BYTES = 800
+TOOL_CALL_OVERHEAD_BYTES = 600
+
+
+def estimate_message_size(message: BaseMessage) -> int:
+    """Approximate memory footprint of a message: content, tool calls and a fixed overhead"""
+    content = message.content
+    if isinstance(content, str):
+        size = sys.getsizeof(content)
+    else:
+        size = len(json.dumps(content, default=str))
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        size += len(json.dumps(tool_calls, default=str)) + TOOL_CALL_OVERHEAD_BYTES * len(tool_calls)
+    return size + MESSAGE_OVERHEAD_BYTES
+
+
+def trim_to_budget(messages: List[BaseMessage], sizes: List[int], max_bytes: int) -> int:
+    """
+    Number of leading messages to drop so the rest fits in max_bytes. Only whole
+    turns are dropped (the kept history starts at a HumanMessage, so tool calls
+    keep their results) and the latest turn is always kept.
+    """
+    total = sum(sizes)
+    if total <= max_bytes:
+        return 0
+
+    turn_starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    drop = 0
+    for start in turn_starts[1:]:
+        total -= sum(sizes[drop:start])
+        drop = start
+        if total <= max_bytes:
+            break
+    return drop
+
+
+@dataclass
+class _Session:
+    messages: List[BaseMessage]
+    sizes: List[int]
+    size: int
+    last_access: float
+
+
+class SessionStore(Protocol):
+    """
+    Session history backend: InMemorySessionStore (one process) or
+    SqliteSessionStore (shared by the workers on a host). A networked store
+    only has to implement these methods. Stores with blocking_io set (disk or
+    network I/O, lock waits) are called from a worker thread, never on the
+    event loop.
+    """
+
+    blocking_io: bool
+
+    def get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        ...
+
+    def put(self, session_id: str, messages: List[BaseMessage]):
+        ...
+
+    def delete(self, session_id: str):
+        ...
+
+    def evict_expired(self) -> int:
+        ...
+
+    def stats(self) -> Dict[str, Any]:
+        ...
+
+
+class InMemorySessionStore:
+    """
+    Process-local session histories, bounded by session count (least recently
+    used first), idle TTL, a per-session byte budget (oldest turns are dropped)
+    and a global byte budget (least recently used sessions are evicted).
+    Sizes are approximate, see estimate_message_size.
+    """
+
+    blocking_io = False
+
+    def __init__(self, max_sessions: int = 10000, ttl_s: float = 3600.0,
+                 max_session_bytes: int = 512 * 1024, max_total_bytes: int = 256 * 1024 * 1024):
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = {"ttl": 0, "count": 0, "memory": 0}
+        self.trimmed_messages = 0
+
+    def _expired(self, session: _Session, now: float) -> bool:
+        return self.ttl_s > 0 and now - session.last_access > self.ttl_s
+
+    def _remove_locked(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+
+    def get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        """A copy of the session history, or None for unknown or expired sessions"""
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self._expired(session, now):
+                self._remove_locked(session_id)
+                self.evictions["ttl"] += 1
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            return list(session.messages)
+
+    def put(self, session_id: str, messages: List[BaseMessage]):
+        messages = list(messages)
+        sizes = [estimate_message_size(message) for message in messages]
+        drop = trim_to_budget(messages, sizes, self.max_session_bytes)
+        if drop:
+            messages, sizes = messages[drop:], sizes[drop:]
+        session = _Session(messages=messages, sizes=sizes, size=sum(sizes), last_access=time.monotonic())
+
+        with self._lock:
+            self.trimmed_messages += drop
+            if session_id in self._sessions:
+                self._remove_locked(session_id)
+            self._sessions[session_id] = session
+            self._bytes += session.size
+
+            while len(self._sessions) > self.max_sessions:
+                self._remove_locked(next(iter(self._sessions)))
+                self.evictions["count"] += 1
+            # Never evict the session that was just written
+            while self._bytes > self.max_total_bytes and len(self._sessions) > 1:
+                self._remove_locked(next(iter(self._sessions)))
+                self.evictions["memory"] += 1
+
+    def delete(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._remove_locked(session_id)
+
+    def evict_expired(self) -> int:
+        """Drops idle sessions past the TTL, returns how many were evicted"""
+        if self.ttl_s <= 0:
+            return 0
+        now = time.monotonic()
+        evicted = 0
+        with self._lock:
+            # Least recently used first: stop at the first live session
+            while self._sessions:
+                session_id, session = next(iter(self._sessions.items()))
+                if not self._expired(session, now):
+                    break
+                self._remove_locked(session_id)
+                evicted += 1
+            self.evictions["ttl"] += evicted
+        return evicted
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "max_sessions": self.max_sessions,
+                "max_total_bytes": self.max_total_bytes,
+                "evictions": dict(self.evictions),
+                "trimmed_messages": self.trimmed_messages,
+            }
+
+
+async def call_store(store: SessionStore, method: Callable[..., T], *args: Any) -> T:
+    """Runs a store method, in a worker thread when the store does blocking I/O"""
+    if store.blocking_io:
+        return await asyncio.to_thread(method, *args)
+    return method(*args)
+
+
+async def run_eviction(store: SessionStore, interval_s: float):
+    """Background task: periodically drops expired sessions until cancelled"""
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            evicted = await call_store(store, store.evict_expired)
+            if evicted:
+                logger.info("Session store evicted %d idle sessions", evicted)
+        except Exception as e:
+            logger.error("Session eviction failed: %s", e)
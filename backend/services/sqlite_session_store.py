@@ -0,0 +1,309 @@
+import json
+import time
+import zlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from langchain_core.messages import BaseMessage, messages_from_dict
+
+from services.session_store import trim_to_budget
+
+logger = logging.getLogger(__name__)
+
+# Encoded messages at least this long are stored zlib-compressed
+COMPRESS_MIN_BYTES = 512
+# Fields that are not needed to replay a history (provider metadata, run ids)
+_UNSTORED_FIELDS = {"type", "id", "response_metadata", "usage_metadata"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    generation INTEGER NOT NULL,  -- bumped when the history is rewritten instead of appended to
+    version INTEGER NOT NULL,     -- bumped on every write
+    first_seq INTEGER NOT NULL,   -- seq of the oldest kept message (older turns were trimmed)
+    next_seq INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions (updated_at);
+CREATE TABLE IF NOT EXISTS session_messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data BLOB NOT NULL,           -- compact JSON [type, fields], zlib-compressed when long
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def encode_message(message: BaseMessage) -> bytes:
+    """Compact JSON of a message: its type and the fields that differ from their defaults"""
+    fields = message.model_dump(exclude_defaults=True, exclude=_UNSTORED_FIELDS)
+    data = json.dumps([message.type, fields], separators=(",", ":"), ensure_ascii=False,
+                      default=str).encode("utf-8")
+    return b"z" + zlib.compress(data) if len(data) >= COMPRESS_MIN_BYTES else data
+
+
+def decode_message(data: bytes) -> BaseMessage:
+    if data[:1] == b"z":
+        data = zlib.decompress(data[1:])
+    message_type, fields = json.loads(data)
+    return messages_from_dict([{"type": message_type, "data": fields}])[0]
+
+
+@dataclass
+class _Cached:
+    """This process's copy of a stored session, valid while generation and version match the row"""
+    generation: int
+    version: int
+    first_seq: int
+    messages: List[BaseMessage]
+    encoded: List[bytes]
+
+
+class SqliteSessionStore:
+    """
+    Session histories in a SQLite database (WAL mode) shared by every worker
+    process on the host, one row per message.
+
+    Each process keeps a bounded cache of the sessions it has seen, checked
+    against the row's generation/version on every get, so a turn only reads
+    the messages other workers appended since and only writes the messages it
+    added. Writes run in IMMEDIATE transactions; when another worker wrote the
+    session in between, appended messages are merged on top of its write, a
+    rewritten history (compaction changed older messages) replaces it.
+
+    TTL is measured from the last write. The session count and total byte
+    bounds are enforced by evict_expired (run periodically by run_eviction),
+    the per-session byte budget on every write. Sizes are encoded bytes.
+    """
+
+    blocking_io = True
+
+    def __init__(self, path: str = "database/sessions.db", max_sessions: int = 10000, ttl_s: float = 3600.0,
+                 max_session_bytes: int = 512 * 1024, max_total_bytes: int = 256 * 1024 * 1024,
+                 cache_sessions: int = 1000, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_s = ttl_s
+        self.max_session_bytes = max_session_bytes
+        self.max_total_bytes = max_total_bytes
+        self.cache_sessions = cache_sessions
+        self._cache: "OrderedDict[str, _Cached]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = {"ttl": 0, "count": 0, "memory": 0}
+        self.trimmed_messages = 0
+        self.counters = {"cache_hits": 0, "delta_loads": 0, "full_loads": 0, "appends": 0,
+                         "rewrites": 0, "merged_writes": 0, "rows_read": 0, "rows_written": 0}
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: transactions are explicit (see _transaction)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout_ms)}")
+        mode = self._conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            logger.warning("Session store %s is not in WAL mode (%s): workers will block each other", path, mode)
+        self._conn.execute("PRAGMA synchronous = NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self, write: bool = False) -> Iterator[sqlite3.Connection]:
+        """A read snapshot, or a write transaction holding the write lock from the start"""
+        self._conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _expired(self, updated_at: float, now: float) -> bool:
+        return self.ttl_s > 0 and now - updated_at > self.ttl_s
+
+    def _remember(self, session_id: str, cached: _Cached):
+        self._cache[session_id] = cached
+        self._cache.move_to_end(session_id)
+        while len(self._cache) > self.cache_sessions:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _delete_locked(conn: sqlite3.Connection, session_id: str):
+        conn.execute("DELETE FROM session_messages WHERE session_id = ?", (session_id,))
+        conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def _load(self, conn: sqlite3.Connection, session_id: str, from_seq: int) -> Tuple[List[BaseMessage], List[bytes]]:
+        rows = conn.execute("SELECT data FROM session_messages WHERE session_id = ? AND seq >= ? ORDER BY seq",
+                            (session_id, from_seq)).fetchall()
+        self.counters["rows_read"] += len(rows)
+        encoded = [row[0] for row in rows]
+        return [decode_message(data) for data in encoded], encoded
+
+    def get(self, session_id: str) -> Optional[List[BaseMessage]]:
+        """A copy of the session history, or None for unknown or expired sessions"""
+        now = time.time()
+        with self._lock:
+            with self._transaction() as conn:
+                row = conn.execute("SELECT generation, version, first_seq, updated_at FROM sessions "
+                                   "WHERE session_id = ?", (session_id,)).fetchone()
+                if row is None or self._expired(row[3], now):
+                    self._cache.pop(session_id, None)
+                    return None
+                generation, version, first_seq, _ = row
+
+                cached = self._cache.get(session_id)
+                if cached is not None and cached.generation == generation and cached.version == version:
+                    self.counters["cache_hits"] += 1
+                elif cached is not None and cached.generation == generation and \
+                        cached.first_seq <= first_seq <= cached.first_seq + len(cached.messages):
+                    # Same history, other workers appended (and maybe trimmed): read only the new rows
+                    cached_next = cached.first_seq + len(cached.messages)
+                    drop = first_seq - cached.first_seq
+                    messages, encoded = self._load(conn, session_id, cached_next)
+                    cached = _Cached(generation, version, first_seq, cached.messages[drop:] + messages,
+                                     cached.encoded[drop:] + encoded)
+                    self.counters["delta_loads"] += 1
+                else:
+                    messages, encoded = self._load(conn, session_id, first_seq)
+                    cached = _Cached(generation, version, first_seq, messages, encoded)
+                    self.counters["full_loads"] += 1
+            self._remember(session_id, cached)
+            return list(cached.messages)
+
+    def put(self, session_id: str, messages: List[BaseMessage]):
+        messages = list(messages)
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(session_id)
+            # Messages equal to the cached ones are not encoded again (compared by value:
+            # strip_tool_chatter rebuilds the kept messages on every turn)
+            known = cached.messages if cached else []
+            encoded = [cached.encoded[i] if i < len(known) and (message is known[i] or message == known[i])
+                       else encode_message(message) for i, message in enumerate(messages)]
+            sizes = [len(data) for data in encoded]
+            drop = trim_to_budget(messages, sizes, self.max_session_bytes)
+            self.trimmed_messages += drop
+
+            with self._transaction(write=True) as conn:
+                row = conn.execute("SELECT generation, version, first_seq, next_seq, bytes FROM sessions "
+                                   "WHERE session_id = ?", (session_id,)).fetchone()
+                appends = cached is not None and encoded[:len(cached.encoded)] == cached.encoded
+                if row is not None and appends and row[0] == cached.generation:
+                    generation, version, first_seq, next_seq, stored_bytes = row
+                    new = encoded[len(cached.encoded):]
+                    if version != cached.version:
+                        # Another worker wrote this session since our read: add our messages after its
+                        self.counters["merged_writes"] += 1
+                        drop = 0
+                    self._insert(conn, session_id, next_seq, new)
+                    stored_bytes += sum(sizes[len(cached.encoded):])
+                    if drop:
+                        stored_bytes -= sum(sizes[:drop])
+                        conn.execute("DELETE FROM session_messages WHERE session_id = ? AND seq < ?",
+                                     (session_id, cached.first_seq + drop))
+                        first_seq = cached.first_seq + drop
+                    conn.execute("UPDATE sessions SET version = ?, first_seq = ?, next_seq = ?, bytes = ?, "
+                                 "updated_at = ? WHERE session_id = ?",
+                                 (version + 1, first_seq, next_seq + len(new), stored_bytes, now, session_id))
+                    self.counters["appends"] += 1
+                    merged = version != cached.version
+                    state = _Cached(generation, version + 1, first_seq, messages[drop:], encoded[drop:])
+                else:
+                    # New session, or a history that changed before its end: write it whole
+                    # A recreated session must not match caches of its deleted namesake
+                    generation = row[0] + 1 if row is not None else time.time_ns()
+                    kept = encoded[drop:]
+                    self._delete_locked(conn, session_id)
+                    self._insert(conn, session_id, 0, kept)
+                    conn.execute("INSERT INTO sessions (session_id, generation, version, first_seq, next_seq, "
+                                 "bytes, updated_at) VALUES (?, ?, 0, 0, ?, ?, ?)",
+                                 (session_id, generation, len(kept), sum(sizes[drop:]), now))
+                    self.counters["rewrites"] += 1
+                    merged = False
+                    state = _Cached(generation, 0, 0, messages[drop:], kept)
+
+            if merged:
+                # Reload on the next get: the stored history also holds the other worker's messages
+                self._cache.pop(session_id, None)
+            else:
+                self._remember(session_id, state)
+
+    def _insert(self, conn: sqlite3.Connection, session_id: str, first_seq: int, encoded: List[bytes]):
+        conn.executemany("INSERT INTO session_messages (session_id, seq, data) VALUES (?, ?, ?)",
+                         [(session_id, first_seq + i, data) for i, data in enumerate(encoded)])
+        self.counters["rows_written"] += len(encoded)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            with self._transaction(write=True) as conn:
+                self._delete_locked(conn, session_id)
+            self._cache.pop(session_id, None)
+
+    def evict_expired(self) -> int:
+        """
+        Drops sessions idle past the TTL, then the least recently written ones
+        beyond the session count and total byte bounds. Returns how many were evicted.
+        """
+        now = time.time()
+        with self._lock:
+            with self._transaction(write=True) as conn:
+                evicted = {"ttl": [], "count": [], "memory": []}
+                if self.ttl_s > 0:
+                    evicted["ttl"] = [row[0] for row in conn.execute(
+                        "SELECT session_id FROM sessions WHERE updated_at < ?", (now - self.ttl_s,))]
+                for session_id in evicted["ttl"]:
+                    self._delete_locked(conn, session_id)
+
+                count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                if count > self.max_sessions:
+                    evicted["count"] = [row[0] for row in conn.execute(
+                        "SELECT session_id FROM sessions ORDER BY updated_at LIMIT ?", (count - self.max_sessions,))]
+                for session_id in evicted["count"]:
+                    self._delete_locked(conn, session_id)
+
+                # Oldest sessions whose bytes, added to all newer ones, go over the budget
+                evicted["memory"] = [row[0] for row in conn.execute(
+                    "SELECT session_id FROM (SELECT session_id, SUM(bytes) OVER (ORDER BY updated_at DESC "
+                    "ROWS UNBOUNDED PRECEDING) AS newer_bytes FROM sessions) WHERE newer_bytes > ?",
+                    (self.max_total_bytes,))]
+                for session_id in evicted["memory"]:
+                    self._delete_locked(conn, session_id)
+
+            for reason, session_ids in evicted.items():
+                self.evictions[reason] += len(session_ids)
+                for session_id in session_ids:
+                    self._cache.pop(session_id, None)
+        return sum(len(session_ids) for session_ids in evicted.values())
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE session_id = ?", (session_id,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions, total_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM sessions").fetchone()
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "sessions": sessions,
+                "bytes": total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_total_bytes": self.max_total_bytes,
+                "evictions": dict(self.evictions),
+                "trimmed_messages": self.trimmed_messages,
+                "cached_sessions": len(self._cache),
+                **self.counters,
+            }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"turns": 0, "calls": 0, "input_tokens": 0, "output_tokens": 0, "total_tokens": 0,
+            "budget_stops": 0, "by_model": {}}
+
+
+class UsageLedger:
+    """
+    Running LLM usage totals per session and per user, fed one turn at a time.
+    Holds at most `max_keys` sessions and `max_keys` users; the least recently
+    updated ones are dropped first.
+    """
+
+    def __init__(self, max_keys: int = 10000):
+        self.max_keys = max_keys
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._users: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def record(self, session_id: str, user_id: str, usage: Dict[str, Any]):
+        """Adds one turn's usage (TurnUsage.to_dict()) to its session and user"""
+        with self._lock:
+            for table, key in ((self._sessions, session_id), (self._users, user_id)):
+                totals = table.pop(key, None) or _empty_totals()
+                table[key] = totals
+                totals["turns"] += 1
+                for field in ("calls", "input_tokens", "output_tokens", "total_tokens"):
+                    totals[field] += usage[field]
+                totals["budget_stops"] += usage["budget_stop"] is not None
+                for model, counts in usage["by_model"].items():
+                    model_totals = totals["by_model"].setdefault(model, {"calls": 0, "input_tokens": 0, "output_tokens": 0})
+                    for field, value in counts.items():
+                        model_totals[field] += value
+                while len(table) > self.max_keys:
+                    table.popitem(last=False)
+
+    def session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self._copy(self._sessions, session_id)
+
+    def user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return self._copy(self._users, user_id)
+
+    def _copy(self, table: "OrderedDict[str, Dict[str, Any]]", key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            totals = table.get(key)
+            if totals is None:
+                return None
+            return {**totals, "by_model": {model: dict(counts) for model, counts in totals["by_model"].items()}}
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"sessions": len(self._sessions), "users": len(self._users)}
@@ -1,27 +1,84 @@
 import logging
+from typing import Any, Callable, Optional, Union
 
-def boxed_log(message: str, logger: logging.Logger = None, level: str = "info"):
+# Default cap for values rendered into log lines
+DEFAULT_PREVIEW_CHARS = 2000
+
+
+def preview_text(value: Any, max_chars: int = DEFAULT_PREVIEW_CHARS) -> str:
+    """
+    str() of a value capped to max_chars. Lists and tuples are rendered item by item
+    and stop early, so previewing a huge result set never formats all of it.
+    """
+    if isinstance(value, (list, tuple)):
+        parts, length = [], 0
+        for i, item in enumerate(value):
+            if length > max_chars:
+                parts.append(f"... ({len(value) - i} more items)")
+                break
+            text = repr(item)
+            parts.append(text)
+            length += len(text) + 2
+        open_char, close_char = ("[", "]") if isinstance(value, list) else ("(", ")")
+        text = open_char + ", ".join(parts) + close_char
+    else:
+        text = str(value)
+
+    if len(text) > max_chars:
+        return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
+    return text
+
+
+class Preview:
+    """
+    Log argument rendered lazily with preview_text, e.g.
+    logger.info("Rows: %s", Preview(rows)) costs nothing when INFO is disabled.
+    """
+    __slots__ = ("value", "max_chars")
+
+    def __init__(self, value: Any, max_chars: int = DEFAULT_PREVIEW_CHARS):
+        self.value = value
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        return preview_text(self.value, self.max_chars)
+
+    __repr__ = __str__
+
+
+def boxed_log(message: Union[str, Callable[[], str]], logger: logging.Logger = None, level: str = "info",
+              *args: Any, max_chars: Optional[int] = DEFAULT_PREVIEW_CHARS):
     """
     Prints a message with a top and bottom border only.
+    Nothing is formatted unless the level is enabled: message may be a callable
+    or a %-format string with lazy args. The message is capped to max_chars.
     """
     if logger is None:
         logger = logging.getLogger(__name__)
 
+    levelno = logging.getLevelName(level.upper())
+    if not logger.isEnabledFor(levelno):
+        return
+
+    if callable(message):
+        message = message()
+    if args:
+        message = message % args
+    if max_chars is not None:
+        message = preview_text(message, max_chars)
+
     lines = message.split("\n")
     max_len = max(len(line) for line in lines)
-    
+
     # Top and bottom borders
     border = "═" * (max_len + 4)  # 2 spaces padding on each side
     top = f"╔{border}╗"
     bottom = f"╚{border}╝"
 
     # Build message with padding, no side borders
-    boxed_message = top + "\n"
-    for line in lines:
-        boxed_message += f"  {line.ljust(max_len)}  \n"
-    boxed_message += bottom
+    padded = [f"  {line.ljust(max_len)}  " for line in lines]
 
     # Start on a new line after the logger prefix
-    boxed_message = "\n" + boxed_message
+    boxed_message = "\n" + "\n".join([top, *padded, bottom])
 
-    getattr(logger, level.lower())(boxed_message)
+    logger.log(levelno, boxed_message)
@@ -0,0 +1,42 @@
+from typing import Any
+
+
+def content_text(content: Any) -> str:
+    """
+    Flattens LLM message content to plain text.
+    Gemini may return either a string or a list of content parts.
+    """
+    if isinstance(content, str):
+        return content
+
+    if isinstance(content, list):
+        text_parts = []
+        for part in content:
+            if isinstance(part, dict):
+                if "text" in part:
+                    text_parts.append(part["text"])
+            else:
+                text_parts.append(str(part))
+        return "\n".join(text_parts)
+
+    return str(content)
+
+
+def message_text(message: Any) -> str:
+    """Returns the text content of a LangChain message (or str() of anything else)."""
+    if hasattr(message, "content"):
+        return content_text(message.content)
+    return str(message)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (about 4 characters per token for English and SQL)"""
+    return (len(text) + 3) // 4
+
+
+def message_tokens(message: Any) -> int:
+    """Approximate prompt tokens of a message: its text plus any tool call arguments"""
+    tokens = estimate_tokens(message_text(message))
+    for call in getattr(message, "tool_calls", None) or ():
+        tokens += estimate_tokens(call["name"]) + estimate_tokens(str(call["args"]))
+    return tokens
@@ -0,0 +1,64 @@
+import asyncio
+import logging
+import threading
+from typing import Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    """
+    A value loaded from the database, reloaded whenever `version()` (e.g.
+    InsuranceDatabase.data_version) changes.
+
+    get() loads a stale value in the calling thread. aget() is for the event
+    loop: the first load runs in a worker thread, and after a version change
+    the previous value is served while a single background refresh runs.
+    """
+
+    def __init__(self, load: Callable[[], T], version: Callable[[], Hashable], name: str = "value"):
+        self._load = load
+        self._version_of = version
+        self.name = name
+        self._lock = threading.Lock()
+        self._version: Optional[Hashable] = None
+        self._value: Optional[T] = None
+        self._refresh: Optional[Tuple[asyncio.AbstractEventLoop, asyncio.Task]] = None
+
+    def get(self) -> T:
+        version = self._version_of()
+        with self._lock:
+            if self._version == version:
+                return self._value
+        return self._reload(version)
+
+    async def aget(self) -> T:
+        version = self._version_of()
+        with self._lock:
+            current, loaded, value = self._version == version, self._version is not None, self._value
+        if current:
+            return value
+        refresh = self._start_refresh(version)
+        return value if loaded else await asyncio.shield(refresh)
+
+    def _start_refresh(self, version: Hashable) -> asyncio.Task:
+        """The running background load of this loop, or a new one"""
+        loop = asyncio.get_running_loop()
+        if self._refresh is not None and self._refresh[0] is loop and not self._refresh[1].done():
+            return self._refresh[1]
+        task = loop.create_task(asyncio.to_thread(self._reload, version))
+        task.add_done_callback(self._refresh_done)
+        self._refresh = (loop, task)
+        return task
+
+    def _refresh_done(self, task: asyncio.Task):
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Refreshing the %s failed: %s", self.name, task.exception())
+
+    def _reload(self, version: Hashable) -> T:
+        value = self._load()
+        with self._lock:
+            self._version, self._value = version, value
+        return value